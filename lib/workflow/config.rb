@@ -12,6 +12,11 @@ module Workflow
         }
       end
 
+      # Number of worker processes abbreviating ISO4 titles, set with ISO4_JOBS in .env, defaults to 1 (in-process)
+      def iso4_jobs
+        [ENV.fetch('ISO4_JOBS', '1').to_i, 1].max
+      end
+
     end
   end
 end
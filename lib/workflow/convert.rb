@@ -3,22 +3,19 @@
 module Workflow
   class Convert
     class << self
-      # convert the anystyle JSON files in in_dir to TEI XML files in out_dir
+      # convert the anystyle JSON files in in_dir, which may be gzip- or zstd-compressed, to TEI XML files in out_dir.
+      # The progress of the conversion is written to the status file (see pylib/extraction_eval/progress.py).
       # @param [String] in_dir
       # @param [String] out_dir
       def anystyle_json_to_tei_xml(in_dir, out_dir, overwrite: false)
         json_to_tei = PyCall.import_module('json_to_tei_anystyle')
-        files = Dir.glob(File.join(in_dir, '*.json'))
-        files.each do |csl_file|
-          tei_file = File.join(out_dir, "#{File.basename(csl_file, '.json')}.xml")
-          next if File.exist?(tei_file) && !overwrite
+        progress = PyCall.import_module('progress').Progress.new(status_path: status_path)
+        json_to_tei.convert_directory(in_dir, out_dir, overwrite: overwrite, progress: progress)
+      end
 
-          begin
-            json_to_tei.anystyle_parser csl_file, tei_file
-          rescue StandardError => e
-            puts e.message.to_s
-          end
-        end
+      # the status file of the running conversion
+      def status_path
+        File.join(Path.tmp, 'conversion-status.json')
       end
 
       # convert the anystyle XML files in in_dir to CSL-JSON files in out_dir
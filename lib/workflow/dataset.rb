@@ -209,12 +209,8 @@ module Workflow
           end
         end
 
-        # iso4 abbreviations
-        if item.type == Format::CSL::ARTICLE_JOURNAL
-          add_journal_abbreviation(item) if item.journal_abbreviation.to_s.empty?
-        elsif @options.abbreviate_titles
-          add_title_abbreviations(item)
-        end
+        # iso4 abbreviations of the item and its references
+        add_abbreviations(item)
 
         # keywords generated from references
         if @options.generate_keywords && n.positive?
@@ -399,13 +395,6 @@ module Workflow
               # add missing type
               ref.type ||= vendor_ref.type || Format::CSL.guess_type(ref)
 
-              # iso4 abbreviations
-              if ref.type == Format::CSL::ARTICLE_JOURNAL
-                add_journal_abbreviation(ref) if ref.journal_abbreviation.to_s.empty?
-              else
-                add_title_abbreviations(ref)
-              end
-
               # validation is done by author / year exact match. this will produce some false positives/negatives
               author, year = ref.creator_year_title(downcase: true)
               next unless author == vendor_author && year == vendor_year
@@ -438,13 +427,6 @@ module Workflow
             # add missing type
             vendor_ref.type ||= Format::CSL::Item.guess_type(vendor_ref)
 
-            # iso4 abbreviations
-            if vendor_ref.type == Format::CSL::ARTICLE_JOURNAL
-              add_journal_abbreviation(vendor_ref) if vendor_ref.journal_abbreviation.to_s.empty?
-            else
-              add_title_abbreviations(vendor_ref)
-            end
-
             validated_references.append(vendor_ref)
             puts " - #{datasource.id}: Added #{vendor_author} (#{vendor_year}) " if @options.verbose
             num_vendor_added_refs += 1
@@ -582,7 +564,6 @@ module Workflow
         found_ref.custom.validated_by = ref.custom.validated_by
         found_ref.custom.original_data = ref
         ref = found_ref
-        add_journal_abbreviation(ref)
         break
       end
       puts "   - no reconciliation service available for type '#{ref.type}'" if !type_supported && @options.verbose
@@ -703,20 +684,28 @@ module Workflow
       end
     end
 
+    # Adds the ISO4 abbreviations to the item and its references: the journal abbreviation of journal articles, and the
+    # abbreviated title and container title of the other references and, if configured, of the item. All titles are
+    # abbreviated in one batch, so that the abbreviations missing from the cache are stored at once.
     # @param [Format::CSL::Item] item
-    def add_journal_abbreviation(item)
-      journal_name = item.container_title
-      disambiguation_langs = @options.abbr_disamb_langs
-      item.journal_abbreviation ||= Workflow::Utils.abbrev_iso4(journal_name, disambiguation_langs:)
-    end
-
-    # @param [Format::CSL::Item] item
-    def add_title_abbreviations(item)
-      disambiguation_langs = @options.abbr_disamb_langs
-      item.custom.iso4_title ||= Workflow::Utils.abbrev_iso4(item.title, disambiguation_langs:)
-      return if item.container_title.nil?
+    def add_abbreviations(item)
+      # [object, setter, title]
+      targets = []
+      [item, *item.x_references.to_a].each do |i|
+        if i.type == Format::CSL::ARTICLE_JOURNAL
+          targets.append([i, :journal_abbreviation=, i.container_title]) if i.journal_abbreviation.to_s.empty?
+        elsif !i.equal?(item) || @options.abbreviate_titles
+          targets.append([i.custom, :iso4_title=, i.title]) if i.custom.iso4_title.nil?
+          next if i.container_title.nil? || !i.custom.iso4_container_title.nil?
+
+          targets.append([i.custom, :iso4_container_title=, i.container_title])
+        end
+      end
+      return if targets.empty?
 
-      item.custom.iso4_container_title ||= Workflow::Utils.abbrev_iso4(item.container_title, disambiguation_langs:)
+      abbreviations = Workflow::Utils.abbrev_iso4_batch(targets.map(&:last),
+                                                        disambiguation_langs: @options.abbr_disamb_langs)
+      targets.zip(abbreviations).each { |(object, setter, _), abbreviation| object.public_send(setter, abbreviation) }
     end
 
     # This auto-generates an abstract and keywords and also adds a language if none has been set
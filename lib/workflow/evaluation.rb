@@ -1,6 +1,5 @@
 # frozen_string_literal: true
 
-require 'fileutils'
 require 'json'
 
 module Workflow
@@ -11,40 +10,38 @@ module Workflow
         'AnyStyle'
       end
 
-      def gold_dir
-        File.join(Path.tmp, 'gold')
+      def manifest_path
+        File.join(Path.tmp, 'evaluation-manifest.json')
       end
 
-      def output_dir
-        File.join(Path.tmp, 'output')
-      end
-
-      def output_dir_anystyle
-        File.join(output_dir, parser_name)
+      # the status file of the running evaluation (see pylib/extraction_eval/progress.py)
+      def status_path
+        File.join(Path.tmp, 'evaluation-status.json')
       end
 
       def create_eval_data
-        puts 'Generating gold TEI'
+        puts 'Generating gold JSON'
         Convert.anystyle_xml_to_anystyle_json Path.gold_anystyle_xml, Path.gold_anystyle_json, overwrite: true
         Convert.anystyle_xml_to_csl_json Path.gold_anystyle_xml, Path.gold_csl, overwrite: true
-        Convert.anystyle_json_to_tei_xml Path.gold_anystyle_json, Path.gold_tei, overwrite: true
-        puts 'Generating extraction output TEI'
-        Convert.anystyle_json_to_tei_xml Path.anystyle_json, Path.tei
-        puts 'Creating evaluation data'
-        FileUtils.mkdir_p gold_dir
-        FileUtils.mkdir_p output_dir_anystyle
-        gold_files = Dir.glob(File.join(Path.gold_tei, '*.xml'))
-        gold_files.each do |gold_file_path|
-          FileUtils.copy gold_file_path, gold_dir
-          FileUtils.copy File.join(Path.tei, File.basename(gold_file_path)), output_dir_anystyle
+        # the evaluation reads the AnyStyle JSON files in place, paired by a manifest
+        puts 'Creating evaluation manifest'
+        manifest = Dir.glob(File.join(Path.gold_anystyle_json, '*.json')).sort.map do |gold_file_path|
+          output_file_path = File.join(Path.anystyle_json, File.basename(gold_file_path))
+          {
+            gold: File.expand_path(gold_file_path),
+            outputs: File.exist?(output_file_path) ? { parser_name => File.expand_path(output_file_path) } : {}
+          }
         end
+        File.write manifest_path, JSON.pretty_generate(manifest)
       end
 
       def run
         puts 'Running evaluation'
         py_eval = PyCall.import_module('get_evaluation_metrics')
         # result = py_eval.get_parser_data([parser_dir], gold_dir, output_dir)
-        result = Utils.py_to_rb py_eval.get_parser_data([parser_name], gold_dir, output_dir, diagnostic: true)
+        progress = PyCall.import_module('progress').Progress.new(status_path: status_path)
+        result = Utils.py_to_rb py_eval.get_parser_data([parser_name], manifest_path, '',
+                                                        diagnostic: true, progress: progress)
         outfile = File.join(Path.export, "evaluation-stats-#{Workflow::Utils.timestamp}.json")
         File.write outfile, JSON.pretty_generate(result)
         puts "Results written to #{File.realpath outfile}"
@@ -13,19 +13,32 @@ module Workflow
       def abbrev_iso4(title, disambiguation_langs: [])
         return '' if title.nil?
 
-        if @ios4_cache.nil?
-          @ios4_cache = Cache.new('iso4_title_abbreviations', use_literal: true)
-          @ios4_cache_data = @ios4_cache.load || {}
+        iso4_abbreviator(disambiguation_langs).abbreviate(title, disambiguation_langs)
+      end
+
+      # Abbreviate a list of titles at once, see abbrev_iso4. Duplicates are abbreviated only once.
+      # @param [Array<String>] titles
+      # @return [Array<String>]
+      def abbrev_iso4_batch(titles, disambiguation_langs: [])
+        iso4_abbreviator(disambiguation_langs).abbreviate_batch(titles, disambiguation_langs).to_a
+      end
+
+      # The abbreviations are stored in an SQLite database by the python iso4_batch module. The entries of the JSON
+      # cache used before are imported once per run.
+      def iso4_abbreviator(disambiguation_langs)
+        if @iso4_abbreviator.nil?
+          iso4_batch = PyCall.import_module('iso4_batch')
+          # worker processes are spawned with a separate python interpreter, they cannot be forked from the ruby process
+          @iso4_abbreviator = iso4_batch.Abbreviator.new(File.join(Cache::CACHE_DIR, 'iso4_title_abbreviations.sqlite'),
+                                                         jobs: Workflow::Config.iso4_jobs)
+          @iso4_imported_langs = []
         end
-        if @ios4_cache_data.key? title
-          @ios4_cache_data[title]
-        else
-          @iso4 = PyCall.import_module('iso4') if @iso4.nil?
-          abbr_title = @iso4.abbreviate(title, disambiguation_langs:).split(' ')[..8].join(' ')
-          @ios4_cache_data[title] = abbr_title
-          @ios4_cache.save(@ios4_cache_data)
-          abbr_title
+        legacy_cache = Cache.cache_path('iso4_title_abbreviations', use_literal: true)
+        if File.exist?(legacy_cache) && !@iso4_imported_langs.include?(disambiguation_langs)
+          @iso4_abbreviator.import_json(legacy_cache, disambiguation_langs)
+          @iso4_imported_langs.append(disambiguation_langs)
         end
+        @iso4_abbreviator
       end
 
       def debug_message(str)
@@ -0,0 +1,162 @@
+from bisect import bisect_left, bisect_right
+import instrumentation
+from meta_eval import compare_single, eval_field, match_content
+
+
+# comparison of the author lists of an aligned gold standard / output reference pair, with the same counting
+# semantics as the nested loops over all pairs of names that get_single_data used before:
+#
+# - each output author is compared with the gold standard authors in order; name parts are only compared with parts
+#   of the same kind (forename with forename, surname with surname), exactly as compare_single compares them
+# - the first gold standard author for which no such comparison fails counts the number of successful comparisons
+#   as correct content, the remaining gold standard authors are not looked at
+# - if the output only has a persName string (ScienceParse, Scholarcy), each word is compared with each gold
+#   standard name part and the first gold standard author with less than three failures counts as one
+#
+# Instead of calling compare_single for every combination, every name is normalized once, verdicts are memoized,
+# and gold standard authors whose surname cannot be similar enough to the output surname are skipped by looking up
+# an index of normalized surnames by value and by length.
+
+# parsers whose gold standard name parts are split into words by compare_single
+split_parsers = ['ScienceParse', 'Scholarcy']
+
+# threshold that eval_field applies to surnames
+surname_delta = 0.85
+
+
+class AuthorAligner:
+
+    def __init__(self, parser_name):
+        self.parser_name = parser_name
+        self.split = parser_name in split_parsers
+        self._normalized = {}  # (value, type, split) -> normalized value
+        self._verdicts = {}  # (output value, gold standard value, type) -> bool
+        self._index = (None, None)  # gold standard metadata list and the surname index built for it
+
+    # the value of a name part as normalized by compare_single. Output values (the first argument of compare_single)
+    # are never split, gold standard values are split into words for the parsers in split_parsers.
+    def normalize(self, value, type, split=False):
+        key = (value, type, split)
+        try:
+            return self._normalized[key]
+        except KeyError:
+            pass
+        if split:
+            normalized = [match_content(el, value) for el in value.split(' ')]
+        else:
+            normalized = match_content(value, type)
+        self._normalized[key] = normalized
+        return normalized
+
+    # same result as compare_single(t1, t2, type, parser_name) for string values
+    def same(self, t1, t2, type):
+        key = (t1, t2, type)
+        verdict = self._verdicts.get(key)
+        if instrumentation.active is not None:
+            instrumentation.active.cache('author_verdicts', verdict is not None)
+        if verdict is None:
+            verdict = self._compare(t1, t2, type)
+            self._verdicts[key] = verdict
+        return verdict
+
+    def _compare(self, t1, t2, type):
+        instrumentation.count('author_compare')
+        # compare_single only splits the second value if it differs from the first one
+        split = self.split and type in ['forename', 'surname'] and t1 != t2
+        n1 = self.normalize(t1, type)
+        n2 = self.normalize(t2, type, split)
+        if type in ['forename', 'surname']:
+            if n1 == n2:
+                # identical names are always similar, except empty forenames which have no initial to compare
+                return not (type == 'forename' and len(n1) == 0)
+            if type == 'surname' and not _may_be_similar(len(n1), len(n2)):
+                return False
+        return eval_field({type: [n1]}, {type: [n2]}) == 0
+
+    # the number of correct content items contributed by the output author out_entry (['persName', parts]) when it is
+    # compared with the metadata gs_comp of the gold standard reference
+    def count_matches(self, out_entry, gs_comp):
+        parts = out_entry[1]
+        structured = isinstance(parts[0], list)
+        candidates = self._candidates(parts, gs_comp) if structured else None
+        for index, gs_entry in enumerate(gs_comp):
+            if gs_entry[0] == 'persName':
+                if structured:
+                    if candidates is not None and index not in candidates:
+                        continue  # a surname comparison fails for this author
+                    both = found = 0
+                    for item1 in parts:
+                        for item2 in gs_entry[1]:
+                            # verify if surname and forename belong to same author, else it is not counted
+                            if item1[0] == item2[0]:
+                                if self.same(item1[1], item2[1], item1[0]):
+                                    found += 1
+                                else:
+                                    both += 1
+                    if both == 0:
+                        return found
+                else:  # only persName defines an author: ScienceParse, Scholarcy
+                    both = 0
+                    for item1 in parts[0].split(' '):
+                        for item2 in gs_entry[1]:
+                            if not self.same(item1, item2[1], item2[0]):
+                                both += 1
+                    if both < 3:  # necessary since not known which are forename and surname, needed 4 tries
+                        return 1  # in this case it can't be found: the out data counts as 1
+            elif gs_entry[0] in ['surname', 'forename']:
+                if compare_single(gs_entry[1], out_entry[1], gs_entry[0], self.parser_name):
+                    return 1
+        return 0
+
+    # the indices of the gold standard authors in gs_comp that can match the structured output author: those without
+    # surname and those whose first surname may be similar to the first surname of the output author. Returns None if
+    # the output author has no surname, i.e. all authors are candidates.
+    def _candidates(self, parts, gs_comp):
+        surnames = [part[1] for part in parts if part[0] == 'surname']
+        if not surnames:
+            return None
+        surname = surnames[0]
+        normalized = self.normalize(surname, 'surname')
+        if self._index[0] is not gs_comp:
+            self._index = (gs_comp, self._surname_index(gs_comp))
+        by_value, by_length, lengths, others = self._index[1]
+        candidates = set(others)
+        candidates.update(by_value.get(_key(normalized), ()))
+        candidates.update(by_value.get(('raw', surname), ()))
+        size = len(normalized)
+        low = bisect_left(lengths, size * surname_delta - 1)
+        high = bisect_right(lengths, size / surname_delta + 1)
+        for length, index in by_length[low:high]:
+            if _may_be_similar(size, length):
+                candidates.add(index)
+        return candidates
+
+    # index the first surnames of the gold standard authors by normalized value, by raw value (compare_single does not
+    # split a gold standard value that is identical to the output value) and by length
+    def _surname_index(self, gs_comp):
+        by_value, by_length, others = {}, [], []
+        for index, gs_entry in enumerate(gs_comp):
+            if gs_entry[0] != 'persName':
+                continue
+            gs_surnames = [part[1] for part in gs_entry[1] if part[0] == 'surname']
+            if not gs_surnames or not isinstance(gs_surnames[0], str):
+                others.append(index)
+                continue
+            value = gs_surnames[0]
+            normalized = self.normalize(value, 'surname', self.split)
+            by_value.setdefault(_key(normalized), []).append(index)
+            by_value.setdefault(('raw', value), []).append(index)
+            by_length.append((len(normalized), index))
+        by_length.sort()
+        return by_value, by_length, [length for length, _ in by_length], others
+
+
+def _key(normalized):
+    return tuple(normalized) if isinstance(normalized, list) else normalized
+
+
+# whether two values of the given lengths can reach the surname threshold: the normalized Levenshtein similarity
+# is at most 1 - |a - b| / max(a, b), because at least |a - b| edits are needed
+def _may_be_similar(a, b):
+    longest = max(a, b)
+    return longest == 0 or 1 - abs(a - b) / longest >= surname_delta
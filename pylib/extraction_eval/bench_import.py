@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+
+
+# import-time benchmark for the extraction_eval modules: every module is imported in a fresh interpreter, the time
+# spent beyond the bare interpreter startup is compared to a budget, and the modules that load slow dependencies only
+# on first use are checked for not importing them eagerly. Exits with 1 if any check fails, so that it can be used
+# as a gate against startup regressions:
+#
+#   python bench_import.py [--budget 150] [--runs 5]
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# the modules loaded through PyCall by the ruby workflow or used as entry points, with the dependencies they must not
+# import eagerly
+modules = {
+    'get_evaluation_metrics': ['nltk', 'similarity', 'numpy', 'pandas', 'concurrent.futures'],
+    'meta_eval': ['nltk', 'similarity'],
+    'json_to_tei_anystyle': ['nltk', 'xml.etree.ElementTree'],
+    'evaluate': ['nltk', 'similarity', 'numpy', 'pandas'],
+    'merge': ['nltk', 'similarity', 'numpy', 'pandas']
+}
+
+default_budget = float(os.environ.get('EXTRACTION_EVAL_IMPORT_BUDGET_MS', 150))
+
+_probe = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+eager = [name for name in {forbidden!r} if name in sys.modules]
+print(elapsed, ','.join(eager))
+"""
+
+
+# import the module in a fresh interpreter and return the import time in milliseconds and the list of forbidden
+# dependencies that have been loaded
+def measure(module, forbidden):
+    result = subprocess.run([sys.executable, '-c', _probe.format(module=module, forbidden=forbidden)],
+                            cwd=here, capture_output=True, text=True, check=True)
+    elapsed, _, eager = result.stdout.strip().partition(' ')
+    return float(elapsed) * 1000, [name for name in eager.split(',') if name]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check the import time of the extraction_eval modules.")
+    parser.add_argument('--budget', type=float, default=default_budget,
+                        help=f"maximum import time per module in milliseconds (default: {default_budget:g})")
+    parser.add_argument('--runs', type=int, default=5, help="number of measurements per module, the best is used")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, forbidden in modules.items():
+        timings, eager = [], []
+        for _ in range(args.runs):
+            elapsed, eager = measure(module, forbidden)
+            timings.append(elapsed)
+        best = min(timings)
+        status = 'ok'
+        if best > args.budget:
+            status = f'over budget of {args.budget:g} ms'
+            failed = True
+        if eager:
+            status = f"imports {', '.join(eager)} eagerly"
+            failed = True
+        print(f"{module:<24} {best:8.1f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import os
+import threading
+
+
+# reading of gold standard and output files that are compressed or stored in archives, without extracting them first.
+#
+# - files compressed with gzip ('doc1.xml.gz') or zstd ('doc1.json.zst', requires the zstandard package) are
+#   decompressed while they are read
+# - a member of a tar archive (also compressed: '.tar.gz', '.tgz', '.tar.zst') or of a zip archive is addressed as
+#   '<archive>::<member>', e.g. 'batch-1.tar.gz::gold/doc1.xml', and read from the archive
+#
+# Archives are opened once per process and kept open. Members of compressed tar archives are read fastest in the
+# order in which they are stored, which is the order in which list_inputs returns them: reading an earlier member
+# decompresses the archive again from the beginning (see is_sequential).
+
+member_separator = '::'
+
+archive_suffixes = ['.tar', '.tar.gz', '.tgz', '.tar.zst', '.zip']
+compression_suffixes = ['.gz', '.zst']
+
+_archives = {}  # (process id, archive path) -> (open archive, lock)
+_archives_lock = threading.Lock()
+
+
+# whether path is a tar or zip archive file
+def is_archive(path):
+    return path.lower().endswith(tuple(archive_suffixes)) and os.path.isfile(path)
+
+
+# whether path is a compressed tar archive, whose members should be read in the order in which they are stored
+def is_sequential(path):
+    return path.lower().endswith(('.tar.gz', '.tgz', '.tar.zst')) and os.path.isfile(path)
+
+
+# whether path is a file that can be read as is, i.e. neither compressed nor the member of an archive
+def is_plain(path):
+    return member_separator not in path and not path.lower().endswith(tuple(compression_suffixes))
+
+
+# the file name without compression suffix and without the archive it is stored in, e.g.
+# 'batch.tar::gold/doc1.json.gz' -> 'doc1.json'
+def plain_name(path):
+    name = os.path.basename(path.rpartition(member_separator)[2])
+    for suffix in compression_suffixes:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+# the (name, path) tuples of the files in a directory (in the order of os.listdir) or of the members of an archive (in
+# the order in which they are stored). Directories inside archives are left out.
+def list_inputs(path) -> list:
+    if not is_archive(path):
+        return [(name, os.path.join(path, name)) for name in os.listdir(path)]
+    archive, lock = _open_archive(path)
+    with lock:
+        if path.lower().endswith('.zip'):
+            members = [info.filename for info in archive.infolist() if not info.is_dir()]
+        else:
+            members = [info.name for info in archive.getmembers() if info.isfile()]
+    return [(os.path.basename(member), path + member_separator + member) for member in members]
+
+
+# open a file, a compressed file or an archive member (see above) for reading, as a binary file object
+def open_input(path):
+    archive_path, separator, member = path.partition(member_separator)
+    if separator:
+        return _open_member(archive_path, member)
+    lower = path.lower()
+    if lower.endswith('.gz'):
+        import gzip
+        return gzip.open(path, 'rb')
+    if lower.endswith('.zst'):
+        return _zstd_reader(path)
+    return open(path, 'rb')
+
+
+# the content of a file, a compressed file or an archive member as bytes
+def read_input(path) -> bytes:
+    with open_input(path) as f:
+        return f.read()
+
+
+# the stored size of a file, a compressed file or an archive member in bytes, from the file system or the index of the
+# archive without reading the content. Compressed files report their compressed size.
+def input_size(path) -> int:
+    archive_path, separator, member = path.partition(member_separator)
+    if not separator:
+        return os.path.getsize(path)
+    archive, lock = _open_archive(archive_path)
+    with lock:
+        if archive_path.lower().endswith('.zip'):
+            return archive.getinfo(member).file_size
+        return archive.getmember(member).size
+
+
+# close the archives opened by the current process
+def close_archives():
+    with _archives_lock:
+        for (pid, _), (archive, _) in list(_archives.items()):
+            if pid == os.getpid():
+                archive.close()
+        _archives.clear()
+
+
+def _open_member(archive_path, member):
+    import io
+    archive, lock = _open_archive(archive_path)
+    # the archive is shared by the threads of the process, members are read completely while holding its lock
+    with lock:
+        if archive_path.lower().endswith('.zip'):
+            data = archive.read(member)
+        else:
+            f = archive.extractfile(member)
+            if f is None:
+                raise FileNotFoundError(f"'{member}' is not a file in '{archive_path}'.")
+            data = f.read()
+    return io.BytesIO(data)
+
+
+# the open archive of the current process and its lock. Worker processes forked from a process that has already opened
+# the archive open it again, since the position in an inherited file is shared with the parent.
+def _open_archive(path):
+    key = (os.getpid(), path)
+    with _archives_lock:
+        entry = _archives.get(key)
+        if entry is None:
+            if path.lower().endswith('.zip'):
+                import zipfile
+                archive = zipfile.ZipFile(path)
+            else:
+                import tarfile
+                if path.lower().endswith('.tar.zst'):
+                    archive = tarfile.open(fileobj=_ZstdSeekable(path), mode='r:')
+                else:
+                    archive = tarfile.open(path, 'r:*')
+            entry = _archives[key] = (archive, threading.Lock())
+    return entry
+
+
+def _zstd_reader(path):
+    try:
+        import zstandard
+    except ImportError as err:
+        raise ImportError("Reading zstd-compressed files requires the zstandard package.") from err
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+
+# a zstd-compressed file that can be read by tarfile: seeking forward decompresses and skips, seeking backward starts
+# decompressing from the beginning again
+class _ZstdSeekable:
+
+    def __init__(self, path):
+        self.path = path
+        self._reader = _zstd_reader(path)
+        self._position = 0
+
+    # read size bytes, or less only at the end of the file
+    def read(self, size=-1):
+        chunks, n = [], 0
+        while size is None or size < 0 or n < size:
+            chunk = self._reader.read(1 << 20 if size is None or size < 0 else min(size - n, 1 << 20))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            n += len(chunk)
+        self._position += n
+        return b''.join(chunks)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence != os.SEEK_SET:
+            raise OSError("Seeking from the end is not supported for zstd-compressed archives.")
+        if offset < self._position:
+            self._reader.close()
+            self._reader = _zstd_reader(self.path)
+            self._position = 0
+        while self._position < offset:
+            if not self.read(min(offset - self._position, 1 << 20)):
+                break
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self._reader.close()
@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# differential testing of two versions of the evaluation: a reference engine, e.g. the version that produced the
+# published scores, and a candidate engine, e.g. an optimized version, evaluate the same files side by side and their
+# results are compared exactly, e.g.
+#
+#   python diff_harness.py --reference v1.0 --synthetic 50 --gold data/gold --output data/output --out report.json
+#
+# An engine is a directory with the evaluation modules (get_evaluation_metrics.py, meta_eval.py, ...) or a git
+# revision, whose modules are extracted from the repository into a temporary directory. The candidate is the directory
+# of this file by default. Every engine runs in its own process, so that modules of the same name do not collide.
+#
+# For every file, the nine counters of get_single_data and the file-level diagnostics of create_json must be equal.
+# If both engines describe the aligned reference pairs (get_single_data(..., pairs)), the pairs of divergent files are
+# compared too. The files are paired once, by the candidate (see pairing.py), and passed to both engines; engines that
+# predate corpus_io need plain TEI files. The report contains the evaluation times of both engines and the speedup of
+# the candidate. Exit codes: 0 if the results are identical, 1 if they diverge or an engine fails, 2 on invalid
+# arguments.
+#
+# Both engines run with the same settings, which the report records: the hash seed of the engine processes
+# (PYTHONHASHSEED, 0 by default), since older engines compare fields in the iteration order of sets, and the numeric
+# comparison mode (see meta_eval.set_numeric_mode), by default the mode the reference engine uses by default, i.e.
+# 'string' for engines without typed comparison.
+
+# the counters returned by get_single_data, in order (see get_evaluation_metrics.value_keys)
+value_keys = ['ref_tot_gs', 'ref_tot_out', 'ref_tot_corr', 'meta_tot_gs', 'meta_tot_out', 'meta_tot_corr',
+              'text_tot_gs', 'text_tot_out', 'text_tot_corr']
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description="Compare the results of two versions of the evaluation.")
+    parser.add_argument('--reference', required=True,
+                        help="directory with the evaluation modules of the reference engine, or git revision")
+    parser.add_argument('--candidate', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="directory or git revision of the candidate engine (default: the directory of this file)")
+    parser.add_argument('--gold', help="directory of the TEI gold standard of a real corpus, or manifest file")
+    parser.add_argument('--output', help="directory with one subdirectory of TEI output per parser")
+    parser.add_argument('--parsers', nargs='+', help="parsers of the real corpus (default: all subdirectories)")
+    parser.add_argument('--synthetic', type=int, default=0, metavar='N',
+                        help="also compare on a synthetic corpus of N documents")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic corpus (default: 0)")
+    parser.add_argument('--numeric', choices=['typed', 'string'],
+                        help="numeric comparison mode of engines that have one (default: the default mode of the "
+                             "reference engine, string if it has no typed comparison)")
+    parser.add_argument('--hash-seed', type=int, default=0,
+                        help="PYTHONHASHSEED of the engine processes (default: 0)")
+    parser.add_argument('--out', default='-', help="report file, '-' for standard output (default)")
+    return parser
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--worker']:
+        return _worker(*argv[1:])
+    parser = create_argument_parser()
+    args = parser.parse_args(argv)
+    if args.gold is None and not args.synthetic:
+        parser.error("--gold or --synthetic is required")
+    if args.gold is not None and args.output is None and not os.path.isfile(args.gold):
+        parser.error("--output is required unless --gold is a manifest")
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            reference = engine_directory(args.reference, os.path.join(tmp, 'reference'))
+            candidate = engine_directory(args.candidate, os.path.join(tmp, 'candidate'))
+        except (OSError, subprocess.CalledProcessError) as err:
+            parser.error(f"Cannot load engine: {err}")
+        corpora = []
+        if args.synthetic:
+            path = os.path.join(tmp, 'synthetic')
+            synthetic_corpus(path, args.synthetic, args.seed)
+            corpora.append(('synthetic', os.path.join(path, 'gold'), os.path.join(path, 'output'), ['AnyStyle']))
+        if args.gold is not None:
+            parser_list = args.parsers or _corpus_parsers(args.gold, args.output)
+            corpora.append((args.gold, args.gold, args.output or '', parser_list))
+        report = {'reference': args.reference, 'candidate': args.candidate, 'numeric': args.numeric,
+                  'hash_seed': args.hash_seed, 'corpora': []}
+        try:
+            for name, path_to_gs, path_to_output, parser_list in corpora:
+                for parser_name in parser_list:
+                    report['corpora'].append(compare_engines(reference, candidate, name, parser_name, path_to_gs,
+                                                             path_to_output, args.numeric, tmp, args.hash_seed))
+                    report['numeric'] = report['corpora'][-1]['numeric']
+        except subprocess.CalledProcessError as err:
+            sys.stderr.write(f"Engine failed: {err}\n")
+            return 1
+    report['identical'] = all(corpus['identical'] for corpus in report['corpora'])
+    for corpus in report['corpora']:
+        sys.stderr.write(f"{corpus['corpus']} {corpus['parser']}: {corpus['files']} files, "
+                         f"{len(corpus['divergent'])} divergent, speedup {corpus['speedup']}\n")
+    if args.out == '-':
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+    else:
+        with open(args.out, 'w', encoding='utf8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0 if report['identical'] else 1
+
+
+# the directory of the evaluation modules of an engine: spec itself if it is a directory, otherwise path, to which the
+# modules of the git revision spec are extracted
+def engine_directory(spec, path) -> str:
+    if os.path.isdir(spec):
+        return os.path.abspath(spec)
+    import io
+    import tarfile
+    # run in the directory of this file, git archive only includes the files of this directory
+    archive = subprocess.run(['git', 'archive', spec, '--', '.'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             check=True, capture_output=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(path)
+    return path
+
+
+# evaluate the files of a parser with both engines and compare the results: returns the report of the corpus
+# numeric: numeric comparison mode, None for the default mode of the reference engine, which the candidate then uses too
+def compare_engines(reference, candidate, corpus, parser_name, path_to_gs, path_to_output, numeric, tmp,
+                    hash_seed=0) -> dict:
+    import pairing
+    tasks = [task for task in pairing.pair_files(os.path.join(path_to_output, parser_name), path_to_gs, parser_name)
+             if task[1] is not None]
+    results = [run_engine(reference, tasks, parser_name, numeric, tmp, hash_seed)]
+    numeric = results[0]['numeric']
+    results.append(run_engine(candidate, tasks, parser_name, numeric, tmp, hash_seed))
+    divergent = []
+    for task, result1, result2 in zip(tasks, results[0]['files'], results[1]['files']):
+        difference = compare_results(result1, result2)
+        if difference:
+            difference['file'] = task[0]
+            divergent.append(difference)
+    seconds = [result['seconds'] for result in results]
+    return {'corpus': corpus, 'parser': parser_name, 'files': len(tasks), 'identical': not divergent,
+            'numeric': numeric, 'reference_seconds': round(seconds[0], 4), 'candidate_seconds': round(seconds[1], 4),
+            'speedup': round(seconds[0] / seconds[1], 2) if seconds[1] else None,
+            'pairs_compared': results[0]['pairs'] and results[1]['pairs'],
+            'failed': [len([result for result in r['files'] if 'error' in result]) for r in results],
+            'divergent': divergent}
+
+
+# the differences between the results of a file in two engines, an empty dict if they are identical
+def compare_results(result1, result2) -> dict:
+    difference = {}
+    if 'error' in result1 or 'error' in result2:
+        if result1.get('error') != result2.get('error'):
+            difference['error'] = [result1.get('error'), result2.get('error')]
+        return difference
+    values = {key: [v1, v2] for key, v1, v2 in zip(value_keys, result1['values'], result2['values']) if v1 != v2}
+    if values:
+        difference['values'] = values
+    if result1['diagnostic'] != result2['diagnostic']:
+        difference['diagnostic'] = [result1['diagnostic'], result2['diagnostic']]
+    if difference and result1.get('pairs') is not None and result2.get('pairs') is not None:
+        difference['pairs'] = divergent_pairs(result1['pairs'], result2['pairs'])
+    return difference
+
+
+# the reference pairs (see get_evaluation_metrics.reference_pair) that only one engine aligned or that the engines
+# judged differently, as [reference pair or None, candidate pair or None] lists
+def divergent_pairs(pairs1, pairs2) -> list:
+    index1 = {(pair['gold_id'], pair['output_id']): pair for pair in pairs1}
+    index2 = {(pair['gold_id'], pair['output_id']): pair for pair in pairs2}
+    return [[index1.get(key), index2.get(key)] for key in sorted(set(index1) | set(index2), key=str)
+            if index1.get(key) != index2.get(key)]
+
+
+# evaluate the (file name, output file, gold file) tasks with the engine in a separate process with the given hash seed:
+# returns {'seconds': evaluation time, 'pairs': whether the engine describes reference pairs, 'numeric': the numeric
+# comparison mode used, 'files': [result of each task]}
+def run_engine(engine, tasks, parser_name, numeric, tmp, hash_seed=0) -> dict:
+    job_path = os.path.join(tmp, 'job.json')
+    result_path = os.path.join(tmp, 'result.json')
+    with open(job_path, 'w', encoding='utf8') as f:
+        json.dump({'tasks': tasks, 'parser': parser_name, 'numeric': numeric}, f)
+    subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', engine, job_path, result_path], check=True,
+                   env={**os.environ, 'PYTHONHASHSEED': str(hash_seed)})
+    with open(result_path, encoding='utf8') as f:
+        return json.load(f)
+
+
+# evaluate the tasks of the job file with the modules in engine and write the results to result_path
+def _worker(engine, job_path, result_path) -> int:
+    # the engine's modules replace those next to this file
+    sys.path[0] = engine
+    import inspect
+    import get_evaluation_metrics as gem
+    import meta_eval
+    with open(job_path, encoding='utf8') as f:
+        job = json.load(f)
+    numeric = 'string'
+    if hasattr(meta_eval, 'set_numeric_mode'):
+        if job['numeric'] is not None:
+            meta_eval.set_numeric_mode(job['numeric'])
+        numeric = meta_eval.get_numeric_mode()
+    with_pairs = 'pairs' in inspect.signature(gem.get_single_data).parameters
+    # older engines print every comparison
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    sys.stdout.flush()
+    os.dup2(devnull, sys.stdout.fileno())
+    results, seconds = [], 0.0
+    for n, (file_name, out_file, gs_file) in enumerate(job['tasks']):
+        pairs = [] if with_pairs else None
+        start = time.perf_counter()
+        try:
+            if with_pairs:
+                vals_to_sum = gem.get_single_data(out_file, gs_file, job['parser'], pairs)
+            else:
+                vals_to_sum = gem.get_single_data(out_file, gs_file, job['parser'])
+        except Exception as err:
+            results.append({'error': f"{err.__class__.__name__}: {err}"})
+            continue
+        finally:
+            seconds += time.perf_counter() - start
+        values = [[key, 0] for key in value_keys]
+        for inner, value in enumerate(vals_to_sum):
+            values[inner][1] += value
+        diagnostic = gem.create_json(file_name, {}, values, n, job['parser'])[file_name]
+        results.append({'values': [v[1] for v in values], 'diagnostic': diagnostic, 'pairs': pairs})
+    with open(result_path, 'w', encoding='utf8') as f:
+        json.dump({'seconds': seconds, 'pairs': with_pairs, 'numeric': numeric, 'files': results}, f,
+                  ensure_ascii=False)
+    return 0
+
+
+def _corpus_parsers(path_to_gs, path_to_output) -> list:
+    import pairing
+    if pairing.is_manifest(path_to_gs):
+        return pairing.manifest_parsers(path_to_gs)
+    return sorted(name for name in os.listdir(path_to_output) if os.path.isdir(os.path.join(path_to_output, name)))
+
+
+_words = ['law', 'society', 'legal', 'theory', 'justice', 'courts', 'state', 'order', 'rights', 'rules', 'power',
+          'social', 'norms', 'history', 'contract', 'property', 'market', 'sociology', 'conflict', 'culture']
+_names = [('Smith', 'John'), ('Müller', 'Anna'), ('García', 'Luis'), ('Chen', 'Wei'), ('Rossi', 'Mario'),
+          ('Dupont', 'Marie'), ('Kowalski', 'Jan'), ('Okafor', 'Ngozi')]
+
+
+# write a synthetic corpus of n documents to path: AnyStyle/CSL-JSON references converted to TEI in 'gold' (in the TEI
+# namespace, like gold standard files) and, with typical parsing errors (changed or missing fields, typos, merged
+# authors, missing and spurious references), in 'output/AnyStyle' (like the converted AnyStyle output)
+def synthetic_corpus(path, n, seed=0):
+    import json_to_tei_anystyle
+    rnd = random.Random(seed)
+    json_dir = os.path.join(path, 'json')
+    for d in ['json', 'gold', os.path.join('output', 'AnyStyle')]:
+        os.makedirs(os.path.join(path, d), exist_ok=True)
+    for i in range(n):
+        gold = [_synthetic_reference(rnd) for _ in range(rnd.randint(3, 15))]
+        output = [_perturb(rnd, ref) for ref in gold if rnd.random() > 0.1]
+        if rnd.random() < 0.3:
+            output.insert(rnd.randint(0, len(output)), _synthetic_reference(rnd))
+        if not output:
+            output = [_synthetic_reference(rnd)]
+        for name, data in [('gold', gold), ('output', output)]:
+            json_path = os.path.join(json_dir, f'{name}{i}.json')
+            with open(json_path, 'w', encoding='utf8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        tree = json_to_tei_anystyle.anystyle_tree(os.path.join(json_dir, f'gold{i}.json'))
+        for element in tree.getroot().iter():
+            element.tag = '{http://www.tei-c.org/ns/1.0}' + element.tag
+        tree.write(os.path.join(path, 'gold', f'doc{i}.xml'), encoding='utf-8', xml_declaration=True, pretty_print=True)
+        json_to_tei_anystyle.anystyle_parser(os.path.join(json_dir, f'output{i}.json'),
+                                             os.path.join(path, 'output', 'AnyStyle', f'doc{i}.xml'))
+
+
+def _synthetic_reference(rnd) -> dict:
+    ref_type = rnd.choice(['article-journal', 'article-journal', 'chapter', 'book'])
+    ref = {'type': ref_type,
+           'author': [{'family': family, 'given': given} for family, given in rnd.sample(_names, rnd.randint(1, 3))],
+           'title': [' '.join(rnd.sample(_words, rnd.randint(3, 8))).capitalize()],
+           'date': [str(rnd.randint(1950, 2023))]}
+    if ref_type == 'article-journal':
+        ref['container-title'] = ['Journal of ' + rnd.choice(_words).capitalize()]
+        ref['volume'] = [str(rnd.randint(1, 80))]
+        first = rnd.randint(1, 900)
+        ref['pages'] = [f"{first}-{first + rnd.randint(1, 40)}"]
+    elif ref_type == 'chapter':
+        ref['container-title'] = ['Handbook of ' + ' '.join(rnd.sample(_words, 2))]
+        ref['editor'] = [{'family': family, 'given': given} for family, given in rnd.sample(_names, 1)]
+        ref['publisher'] = ['Oxford University Press']
+    else:
+        ref['publisher'] = [rnd.choice(['Oxford University Press', 'Routledge', 'Springer'])]
+        ref['location'] = [rnd.choice(['Oxford', 'London', 'Berlin'])]
+    return ref
+
+
+def _perturb(rnd, ref) -> dict:
+    ref = json.loads(json.dumps(ref))
+    x = rnd.random()
+    if x < 0.15:
+        title = ref['title'][0]
+        n = rnd.randrange(len(title))
+        ref['title'] = [title[:n] + title[n + 1:]]  # typo
+    elif x < 0.25:
+        ref['date'] = [str(int(ref['date'][0]) + rnd.choice([-1, 1]))]
+    elif x < 0.35:
+        ref['author'] = ref['author'][:1]
+    elif x < 0.42:
+        ref['author'] = [{'family': ' '.join(a['family'] for a in ref['author'])}]  # merged authors
+    elif x < 0.5 and 'pages' in ref:
+        ref['pages'] = [ref['pages'][0].replace('-', '–')]
+    elif x < 0.58 and 'container-title' in ref:
+        del ref['container-title']
+    elif x < 0.64:
+        ref['title'] = [' '.join(reversed(ref['title'][0].split()))]
+    return ref
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+from lxml import etree
+import get_evaluation_metrics as gem
+import corpus_io
+import meta_eval
+import pairing
+import schema
+import verdict_cache
+
+
+# evaluation service for tools that re-score one document at a time, e.g. after every correction in an annotation
+# tool. The gold standard is parsed once when the service starts and kept in memory together with the modules and the
+# verdict cache, so that a request only pays for parsing the posted document and comparing it, e.g.
+#
+#   python eval_service.py --gold data/gold --socket /tmp/extraction-eval.sock
+#   curl --unix-socket /tmp/extraction-eval.sock --data-binary @doc1.xml http://localhost/score/doc1?parser=AnyStyle
+#
+# The service speaks HTTP/1.1 on a Unix socket or on a port of localhost, with keep-alive connections:
+#
+#   POST /score/<document>?parser=<parser name>   body: the parser output as TEI XML or, with the content type
+#                                                application/json, as AnyStyle/CSL-JSON
+#   GET /health                                  the number of gold standard documents
+#
+# <document> is the name of the gold standard file, with or without suffixes (see pairing.file_stem). The response
+# contains the nine counters of get_single_data and the file-level diagnostics of create_json:
+#
+#   {"document": "doc1.xml", "parser": "AnyStyle", "values": {"ref_tot_gs": 12, ...}, "diagnostic": {...},
+#    "seconds": 0.004}
+#
+# Errors are returned as {"error": message} with the status 400 (invalid request or document), 404 (unknown gold
+# standard document or path) or 500 (evaluation failed). Documents are evaluated one at a time in a worker thread, so
+# that the service keeps accepting connections while a document is compared.
+
+max_body_size = 64 * 1024 * 1024
+
+
+class GoldStore:
+
+    # path_to_gs: directory or archive of the gold standard files, or manifest file (see pairing.py)
+    def __init__(self, path_to_gs):
+        if pairing.is_manifest(path_to_gs):
+            files = [gs_file for gs_file, _ in pairing.load_manifest(path_to_gs)]
+        else:
+            files = [path for _, path in corpus_io.list_inputs(path_to_gs)]
+        parser = etree.XMLParser(recover=True)
+        self.documents = {}  # file stem -> (file name, root of the gold standard)
+        for gs_file in files:
+            name = corpus_io.plain_name(gs_file)
+            stem = pairing.file_stem(name)
+            if stem in self.documents:
+                raise ValueError(f"More than one gold standard file for '{stem}'.")
+            self.documents[stem] = name, gem.read_root(gs_file, parser, gold=True)
+        corpus_io.close_archives()
+
+    # the (file name, root) tuple of the gold standard of the document, None if there is none
+    def get(self, document):
+        return self.documents.get(pairing.file_stem(document))
+
+    def __len__(self):
+        return len(self.documents)
+
+
+# evaluate a parser output given as bytes against the gold standard of the document: returns the response dict.
+# Raises a LookupError if there is no gold standard for the document and a ValueError if the output cannot be read.
+def score_document(store, document, parser_name, body, is_json=False) -> dict:
+    gold = store.get(document)
+    if gold is None:
+        raise LookupError(f"No gold standard for '{document}'.")
+    name, gs_root = gold
+    start = time.perf_counter()
+    out_root = output_root(body, parser_name, is_json)
+    # the output "file name" is only used in messages
+    vals_to_sum = gem.get_single_data(f"{parser_name}/{name}", name, parser_name, inputs=(gs_root, out_root))
+    values = gem.file_values(vals_to_sum)
+    if verdict_cache.active is not None:
+        verdict_cache.active.flush()
+    return {'document': name, 'parser': parser_name, 'values': {key: value for key, value in values},
+            'diagnostic': gem.create_json(name, {}, values, 0, parser_name)[name],
+            'seconds': round(time.perf_counter() - start, 6)}
+
+
+# the root of a parser output given as bytes, as load_inputs returns it: for Grobid the <listBibl>
+def output_root(body, parser_name, is_json=False):
+    if is_json:
+        from json_to_tei_anystyle import references_tree
+        try:
+            data = json.loads(body)
+        except ValueError as err:
+            raise ValueError(f"Invalid JSON: {err}") from err
+        if not isinstance(data, list) or not all(isinstance(ref, dict) for ref in data):
+            raise ValueError("The JSON document must be a list of references.")
+        return references_tree(data, allow_empty=True).getroot()
+    if gem.is_grobid(parser_name):
+        import io
+        root = gem._extract_list_bibl(io.BytesIO(body))
+    else:
+        root = etree.fromstring(body, etree.XMLParser(recover=True))
+    if root is None:
+        raise ValueError("The document contains no references.")
+    return root
+
+
+class EvaluationService:
+
+    def __init__(self, store):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    # handle the requests of a connection until the client closes it
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, response = await self.respond(method, target, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                _write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as err:
+            _write_response(writer, 400, {'error': str(err)}, False)
+        finally:
+            writer.close()
+
+    # the status and the response dict of a request
+    async def respond(self, method, target, headers, body):
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'documents': len(self.store)}
+        if not url.path.startswith('/score/'):
+            return 404, {'error': f"Unknown path '{url.path}'."}
+        if method != 'POST':
+            return 405, {'error': "Use POST to score a document."}
+        document = unquote(url.path[len('/score/'):])
+        parser_name = parse_qs(url.query).get('parser', ['AnyStyle'])[0]
+        is_json = headers.get('content-type', '').split(';')[0].strip() == 'application/json'
+        if self.store.get(document) is None:
+            return 404, {'error': f"No gold standard for '{document}'."}
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(
+                self._executor, score_document, self.store, document, parser_name, body, is_json)
+        except ValueError as err:
+            return 400, {'error': str(err)}
+        except Exception as err:
+            return 500, {'error': f"{err.__class__.__name__}: {err}"}
+        return 200, response
+
+    # serve on the Unix socket at path or, if path is None, on the port of localhost until the task is cancelled
+    async def serve(self, path=None, port=8765):
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, '127.0.0.1', port)
+        async with server:
+            await server.serve_forever()
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise ValueError("Invalid request line.")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0) or 0)
+    if length > max_body_size:
+        raise ValueError("The document is too large.")
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def _write_response(writer, status, response, keep_alive=True):
+    body = json.dumps(response, ensure_ascii=False).encode('utf8')
+    writer.write(f"HTTP/1.1 {status} {_reasons[status]}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                 .encode('latin-1') + body)
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description="Serve the evaluation of single documents over a local socket.")
+    parser.add_argument('--gold', required=True,
+                        help="directory or archive containing the XML-TEI gold standard, or manifest file")
+    parser.add_argument('--socket', metavar='PATH', help="listen on the Unix socket at PATH")
+    parser.add_argument('--port', type=int, default=8765,
+                        help="port of localhost to listen on if no socket is given (default: 8765)")
+    parser.add_argument('--numeric', choices=meta_eval.numeric_modes, default=meta_eval.numeric_mode,
+                        help="comparison of dates, volumes, issues and pages (default: typed)")
+    parser.add_argument('--schema', help="JSON file with the metadata fields compared per reference type")
+    parser.add_argument('--verdict-cache', metavar='FILE',
+                        help="SQLite database persisting the verdicts of the reference comparisons")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = create_argument_parser()
+    args = parser.parse_args(argv)
+    meta_eval.set_numeric_mode(args.numeric)
+    try:
+        if args.schema is not None:
+            schema.set_schema(args.schema)
+        if args.verdict_cache is not None:
+            verdict_cache.set_verdict_cache(args.verdict_cache)
+        store = GoldStore(args.gold)
+    except (OSError, ValueError, sqlite3.Error) as err:
+        parser.error(str(err))
+    sys.stderr.write(f"Loaded {len(store)} gold standard documents, listening on "
+                     f"{args.socket or f'127.0.0.1:{args.port}'}\n")
+    try:
+        asyncio.run(EvaluationService(store).serve(args.socket, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if verdict_cache.active is not None:
+            verdict_cache.active.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
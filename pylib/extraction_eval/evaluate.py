@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import traceback
+import get_evaluation_metrics as gem
+import instrumentation
+import corpus_io
+import meta_eval
+import pairing
+import progress
+import result_stream
+import schema
+import tracing
+import verdict_cache
+
+
+# command line entry point for the evaluation, so that scoring can run without the ruby workflow, e.g.
+#
+#   python evaluate.py --gold data/gold --output data/output --parsers AnyStyle --jobs 4 --out results.json
+#
+# The output directory must contain one subdirectory per parser, whose files are paired with the gold standard files
+# by file stem. Instead of the gold standard directory, --gold can be a manifest listing the gold standard and output
+# files of every document (see pairing.py); --output is then not needed. Exit codes: 0 on success, 1 if the evaluation
+# failed, 2 on invalid arguments.
+
+formats = ['json', 'jsonl', 'csv', 'parquet']
+diagnostic_levels = ['none', 'file', 'reference']
+
+
+# argument type of --shard: 'i/n' -> (i, n)
+def parse_shard(value):
+    index, _, count = value.partition('/')
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected i/n")
+    if not 1 <= shard[0] <= shard[1]:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', i must be between 1 and n")
+    return shard
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description="Evaluate reference extraction output against a gold standard.")
+    parser.add_argument('--gold', required=True,
+                        help="directory or archive containing the XML-TEI gold standard, or manifest file of the "
+                             "documents")
+    parser.add_argument('--output',
+                        help="directory containing one subdirectory or archive with the XML-TEI output of each parser "
+                             "(required unless --gold is a manifest)")
+    parser.add_argument('--parsers', nargs='+',
+                        help="names of the parsers to evaluate (default: all subdirectories of the output directory)")
+    parser.add_argument('--jobs', type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N',
+                        help="evaluate only the i-th of n disjoint shards of the files, e.g. 2/4; combine the jsonl "
+                             "results of all shards with merge.py")
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help="estimate the scores from a stratified random sample of N files (json format only)")
+    parser.add_argument('--target-width', type=float,
+                        help="with --sample, grow the sample until the f-score confidence intervals are at most this "
+                             "wide")
+    parser.add_argument('--strata', choices=['size', 'type'], default='size',
+                        help="with --sample, stratify the files by the size of their gold standard file (default) or by "
+                             "reference type and number of references, which parses all gold standard files first")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the random sample (default: 0)")
+    parser.add_argument('--sweep', action='store_true',
+                        help="report precision, recall and f-score of every field for deltas from 0.5 to 1 instead of "
+                             "the scores (json format only)")
+    parser.add_argument('--candidates', type=int, default=0, metavar='K',
+                        help="report the K nearest gold standard references of every output reference that could not "
+                             "be matched, with the similarity of every field (json and jsonl formats)")
+    parser.add_argument('--prefetch', type=int, default=2,
+                        help="number of files read and parsed ahead in background threads when --jobs is 1 "
+                             "(default: 2, 0 to disable)")
+    parser.add_argument('--format', choices=formats, default='json', help="result format (default: json)")
+    parser.add_argument('--diagnostics', choices=diagnostic_levels, default='none',
+                        help="level of detail: overall scores only, per file, or per aligned reference pair")
+    parser.add_argument('--out', default='-',
+                        help="result file, '-' for standard output (default). Required for csv and parquet.")
+    parser.add_argument('--pairs-out',
+                        help="file for the reference pair table with --diagnostics reference and csv/parquet format "
+                             "(default: derived from --out)")
+    parser.add_argument('--stream', help="JSON Lines file to which file results are appended; resumes from it")
+    parser.add_argument('--numeric', choices=meta_eval.numeric_modes, default=meta_eval.numeric_mode,
+                        help="compare dates, volumes, issues and pages as numbers ('typed', default) or as strings "
+                             "('string', reproduces results published before the typed comparison)")
+    parser.add_argument('--schema', help="JSON file with the fields compared per reference type (see schema.py)")
+    parser.add_argument('--verdict-cache', metavar='FILE',
+                        help="SQLite database in which the verdicts of the reference comparisons are kept for later "
+                             "runs (see verdict_cache.py)")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="append a JSON Lines trace of the comparisons to FILE (see tracing.py)")
+    parser.add_argument('--trace-level', choices=tracing.levels, default='debug',
+                        help="minimum level of the traced events (default: debug, every comparison)")
+    parser.add_argument('--trace-sample', type=float, default=1.0,
+                        help="fraction of the debug and info events that are traced (default: 1)")
+    parser.add_argument('--timings', action='store_true', help="add stage timings to the json result")
+    parser.add_argument('--quiet', action='store_true', help="do not report progress")
+    parser.add_argument('--status', metavar='FILE',
+                        help="keep a JSON status file with the files and references evaluated, references per second, "
+                             "ETA and number of workers (see progress.py)")
+    parser.add_argument('--status-interval', type=float, default=5.0,
+                        help="minimum number of seconds between two updates of the status file (default: 5)")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = create_argument_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.prefetch < 0:
+        parser.error("--prefetch must not be negative")
+    if args.sample is not None and (args.sample < 1 or args.format != 'json' or args.shard or args.stream):
+        parser.error("--sample requires a positive size and the json format, and cannot be combined with --shard or "
+                     "--stream")
+    if args.sweep and (args.sample is not None or args.format != 'json' or args.shard or args.stream):
+        parser.error("--sweep requires the json format and cannot be combined with --sample, --shard or --stream")
+    if args.candidates and (args.candidates < 0 or args.sample is not None or args.sweep
+                            or args.format not in ['json', 'jsonl']):
+        parser.error("--candidates requires a positive number and the json or jsonl format, and cannot be combined "
+                     "with --sample or --sweep")
+    if args.timings and (args.format != 'json' or args.sample is not None or args.sweep):
+        parser.error("--timings requires the json format and cannot be combined with --sample or --sweep")
+    if args.target_width is not None and args.sample is None:
+        parser.error("--target-width requires --sample")
+    if args.format in ['csv', 'parquet'] and args.out == '-':
+        parser.error(f"--out is required for the {args.format} format")
+    if args.format == 'parquet':
+        import export_tables
+        if export_tables.parquet_engine() is None:
+            parser.error(f"the parquet format requires one of the packages {', '.join(export_tables.parquet_engines)}")
+    if pairing.is_manifest(args.gold):
+        try:
+            parser_list = args.parsers or pairing.manifest_parsers(args.gold)
+        except (OSError, ValueError) as err:
+            parser.error(f"Cannot read manifest: {err}")
+        args.output = args.output or ''
+    else:
+        if args.output is None:
+            parser.error("--output is required unless --gold is a manifest")
+        if not os.path.isdir(args.gold) and not corpus_io.is_archive(args.gold):
+            parser.error(f"'{args.gold}' is neither a directory nor an archive")
+        if not os.path.isdir(args.output):
+            parser.error(f"'{args.output}' is not a directory")
+        parser_list = args.parsers or output_parsers(args.output)
+    if not parser_list:
+        parser.error(f"No parsers found in '{args.output or args.gold}'")
+    meta_eval.set_numeric_mode(args.numeric)
+    if args.schema is not None:
+        try:
+            schema.set_schema(args.schema)
+        except (OSError, ValueError) as err:
+            parser.error(f"Cannot load schema: {err}")
+    if args.verdict_cache is not None:
+        try:
+            verdict_cache.set_verdict_cache(args.verdict_cache)
+        except (OSError, sqlite3.Error) as err:
+            parser.error(f"Cannot open verdict cache: {err}")
+    if args.trace is not None:
+        try:
+            tracing.set_trace(args.trace, args.trace_level, args.trace_sample)
+        except (OSError, ValueError) as err:
+            parser.error(f"Cannot trace: {err}")
+
+    # the evaluation code may print messages to stdout; keep the results on the original stdout and send everything
+    # else, also from the worker processes, to stderr. The original stdout is restored afterwards, since main may be
+    # called in-process (e.g. through PyCall).
+    sys.stdout.flush()
+    results_fd = os.dup(sys.stdout.fileno())
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    try:
+        if args.out == '-':
+            with os.fdopen(results_fd, 'w', encoding='utf8', closefd=False) as out:
+                evaluate(args, parser_list, out)
+        else:
+            with open(args.out, 'w', encoding='utf8') as out:
+                evaluate(args, parser_list, out)
+    except Exception as err:
+        sys.stderr.write(f"Evaluation failed: {err.__class__.__name__}: {err}\n{traceback.format_exc()}")
+        return 1
+    finally:
+        sys.stdout.flush()
+        os.dup2(results_fd, sys.stdout.fileno())
+        os.close(results_fd)
+    return 0
+
+
+# the parsers with outputs in the output directory: the names of its subdirectories and archives
+def output_parsers(output_dir) -> list:
+    parsers = set()
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if os.path.isdir(path):
+            parsers.add(name)
+        elif corpus_io.is_archive(path):
+            suffix = max((suffix for suffix in corpus_io.archive_suffixes if name.lower().endswith(suffix)), key=len)
+            parsers.add(name[:-len(suffix)])
+    return sorted(parsers)
+
+
+def evaluate(args, parser_list, out):
+    pairs = args.diagnostics == 'reference'
+    if args.sample is not None:
+        result = gem.sample_values(parser_list, args.gold, args.output, args.sample, args.target_width, seed=args.seed,
+                                   strata=args.strata, jobs=args.jobs, prefetch=args.prefetch)
+        json.dump(result, out, indent=2, ensure_ascii=False)
+        out.write('\n')
+    elif args.sweep:
+        result = gem.sweep_values(parser_list, args.gold, args.output, jobs=args.jobs, prefetch=args.prefetch)
+        json.dump(result, out, indent=2, ensure_ascii=False)
+        out.write('\n')
+    elif args.format == 'json':
+        result = {}
+        for parser_name in parser_list:
+            if args.timings:
+                with instrumentation.collect() as collector:
+                    result[parser_name] = summarize(args, parser_name, file_records(args, parser_name, pairs))
+                result[parser_name]['timings'] = collector.report()
+            else:
+                result[parser_name] = summarize(args, parser_name, file_records(args, parser_name, pairs))
+        json.dump(result, out, indent=2, ensure_ascii=False)
+        out.write('\n')
+    elif args.format == 'jsonl':
+        for parser_name in parser_list:
+            for record in file_records(args, parser_name, pairs):
+                if args.diagnostics == 'none':
+                    del record['diagnostic']
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    else:
+        import export_tables
+        records = []
+        for parser_name in parser_list:
+            for record in file_records(args, parser_name, pairs):
+                del record['diagnostic']
+                records.append(record)
+        export_tables.write_table(export_tables.file_table(records), args.out, args.format)
+        if pairs:
+            pairs_out = args.pairs_out or '-pairs'.join(os.path.splitext(args.out))
+            export_tables.write_table(export_tables.pair_table(records), pairs_out, args.format)
+
+
+# the file records of a parser with progress reporting on stderr and in the status file
+def file_records(args, parser_name, pairs):
+    output_dir = os.path.join(args.output, parser_name)
+    tracker = progress.Progress(None if args.quiet else report_progress, args.status, args.status_interval)
+    if args.stream is None:
+        yield from gem.iter_file_data(output_dir, parser_name, args.gold, pairs=pairs, jobs=args.jobs,
+                                      prefetch=args.prefetch, shard=args.shard, candidates=args.candidates,
+                                      progress=tracker)
+    else:
+        done = result_stream.completed_files(args.stream, parser_name)
+        yield from result_stream.write_jsonl(
+            gem.iter_file_data(output_dir, parser_name, args.gold, skip=done, pairs=pairs, jobs=args.jobs,
+                               prefetch=args.prefetch, shard=args.shard, candidates=args.candidates,
+                               progress=tracker),
+            args.stream)
+    if args.stream is not None:
+        # files evaluated in a previous run are only read back from the stream
+        yield from (record for record in result_stream.read_jsonl(args.stream, parser_name)
+                    if record['file'] in done)
+
+
+# progress callback writing a line to stderr for every evaluated file
+def report_progress(status):
+    if status['state'] != 'running' or not status['files_done']:
+        return
+    eta = f", ETA {status['eta']:.0f}s" if status['eta'] is not None else ''
+    sys.stderr.write(f"{status['label']}: {status['files_done']}/{status['files_total']} {status['current_file']} "
+                     f"({status['references_per_second']:.1f} refs/s{eta})\n")
+
+
+# overall scores of a parser in the format of compute_values, plus file-level diagnostics and reference pairs
+# depending on the diagnostics level, and the nearest gold standard references of the unmatched output references
+def summarize(args, parser_name, records) -> dict:
+    files, pairs, unmatched = {}, {}, {}
+    if args.candidates:
+        def keep_unmatched(records):
+            for record in records:
+                if record.get('unmatched'):
+                    unmatched[record['file']] = record['unmatched']
+                yield record
+        records = keep_unmatched(records)
+    if args.diagnostics != 'none':
+        def keep(records):
+            for record in records:
+                files[record['file']] = record['diagnostic']
+                if 'pairs' in record:
+                    pairs[record['file']] = record['pairs']
+                yield record
+        records = keep(records)
+    file_data = gem.aggregate_file_data(records, diagnostic=False)
+    output = {'scores': gem.score_totals(dict(zip(gem.value_keys, file_data['result'])))[0],
+              'counters': dict(zip(gem.value_keys, file_data['result'])),
+              'missing': file_data['missing']}
+    if args.diagnostics != 'none':
+        output['files'] = files
+    if args.diagnostics == 'reference':
+        output['pairs'] = pairs
+    if args.candidates:
+        output['unmatched'] = unmatched
+    return output
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import importlib.util
+import os
+import pandas as pd
+import metrics
+
+
+# tidy columnar tables from the file records of get_evaluation_metrics.iter_file_data, for analysis with dataframe
+# tools or query engines instead of the nested diagnostics dict
+
+
+# one row per (parser, file, metric category) with the raw counters and the unrounded measures
+def file_table(records) -> pd.DataFrame:
+    rows = []
+    for record in records:
+        scores = metrics.prf(record['values'])
+        for c, category in enumerate(metrics.categories):
+            gs, out, corr = record['values'][c * 3:c * 3 + 3]
+            row = {'parser': record['parser'], 'file': record['file'], 'category': category,
+                   'gold': gs, 'output': out, 'correct': corr, 'missing': record['missing']}
+            row.update(zip(metrics.measures, scores[c].tolist()))
+            rows.append(row)
+    columns = ['parser', 'file', 'category', 'gold', 'output', 'correct', 'missing'] + metrics.measures
+    return pd.DataFrame(rows, columns=columns)
+
+
+# one row per aligned reference pair, with the counters the pair contributed and one 'field.<name>' column per
+# compared field containing 'matched', 'rejected' or 'missing' (empty if the field is not compared for the type).
+# Requires records created with pairs=True.
+def pair_table(records) -> pd.DataFrame:
+    rows = []
+    for record in records:
+        for pair in record.get('pairs') or []:
+            row = {'parser': record['parser'], 'file': record['file']}
+            row.update((key, value) for key, value in pair.items() if key != 'fields')
+            row.update(('field.' + key, value) for key, value in pair['fields'].items())
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# the Parquet engines that pandas can use, in the order in which it tries them
+parquet_engines = ['pyarrow', 'fastparquet']
+
+
+# the name of the first installed Parquet engine, None if none is installed
+def parquet_engine():
+    for engine in parquet_engines:
+        if importlib.util.find_spec(engine) is not None:
+            return engine
+    return None
+
+
+# write a table as Parquet or CSV. If format is not given, it is derived from the file extension
+# ('.parquet', '.csv' or a compressed '.csv.gz'). Writing Parquet requires pyarrow or fastparquet.
+def write_table(table, path, format=None):
+    if format is None:
+        name = path[:-3] if path.endswith('.gz') else path
+        format = os.path.splitext(name)[1].lstrip('.')
+    if format == 'parquet':
+        table.to_parquet(path, index=False)
+    elif format == 'csv':
+        table.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unsupported table format '{format}', use 'parquet' or 'csv'.")
@@ -1,22 +1,27 @@
 import re
 from lxml import etree
 from lxml.etree import QName
-import xml.etree.ElementTree as ET
 import sys
 import datetime
 
 
-# function which creates the new empty output file xml
-def generate_xml(fileName):
+# function which creates the root element of a new empty output document, with the text and listBibl elements
+def create_root():
     # create the root and add the attributes
     root = etree.XML('<TEI></TEI>')
     root.attrib[QName("http://www.w3.org/XML/1998/namespace", "space")] = "preserve"
     root.attrib[QName("http://www.w3.org/XML/1998/namespace", "xmlns")] = "http://www.tei-c.org/ns/1.0"
     root.attrib[QName("http://www.w3.org/XML/1998/namespace", "lang")] = "eng"
-    tree = ET.ElementTree(root)
     # add the text element
     text_node = etree.SubElement(root, 'text')
     etree.SubElement(text_node, 'listBibl')
+    return root
+
+
+# function which creates the new empty output file xml
+def generate_xml(fileName):
+    import xml.etree.ElementTree as ET  # only needed here, imported on first use
+    tree = ET.ElementTree(create_root())
     # try-except commentato solo per non riscrivere il file tutte le volte
     try:
         # create and write the new file
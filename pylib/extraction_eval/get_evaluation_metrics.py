@@ -1,20 +1,22 @@
 from lxml import etree
 import os, sys
 import json, re
-from meta_eval import compare_meta, compare_single
-
-
-types_l = [(['article', 'newspaper','article-journal'], ['date', 'monogr-title', 'analytic-title', 'biblScope_unit_volume', 'biblScope_unit_page']),
-           (['chapter', 'ebook-chapter', 'technical-report-chapter', 'proceeding', 'conference', 'paper-conference'], ['date', 'analytic-title', 'monogr-title']),
-           (['book', 'thesis', 'ebook', 'manual', 'data-sheet', 'database', 'online-database', 'preprint', 'technical-report', 'report', 'software', 'standard', 'preprint'], ['date', 'monogr-title']),
-           (['forthcoming-article', 'unpublished', 'grey-literature'], ['date', 'monogr-title', 'note']),
-           (['patent'], ['date', 'monogr-title', 'idno_type_docNumber']),
-           (['series'], ['date', 'series-title', 'monogr-title']),
-           (['webpage'], ['date', 'ref'])
-           ]
-pars_except = {'Cermine': ['note', 'idno_type_docNumber', 'ref'],
-           'Pdfssa4met': ['analytic-title', 'note', 'idno_type_docNumber', 'ref'],
-           'ScienceParse': ['note', 'idno_type_docNumber', 'ref']}
+import hashlib
+from collections import deque
+from functools import partial
+from meta_eval import compare_meta, compare_single, get_numeric_mode, set_numeric_mode
+from author_align import AuthorAligner
+import corpus_io
+import instrumentation
+import pairing
+import result_stream
+import schema
+import tracing
+import verdict_cache
+from nearest_gold import CandidateReport, GoldIndex
+from threshold_sweep import ThresholdSweep
+# concurrent.futures, export_tables (pandas) and metrics (numpy) are imported where they are needed, so that importing
+# this module stays fast
 
 
 def count_meta_per_ref(input_l, reference, meta_counter, limitation_list, grobid, max_aut, xml_prefix=True):
@@ -25,8 +27,11 @@ def count_meta_per_ref(input_l, reference, meta_counter, limitation_list, grobid
 
     # enter each occurrence in the input structure
     for struct in input_l:
-        # attribute the correct tag on the basis of the limitation list and grobid factors
-        if (limitation_list and not grobid) or not xml_prefix:
+        # attribute the correct tag on the basis of the limitation list and grobid factors: Grobid outputs are in the
+        # TEI namespace, other outputs are not, gold standard references are if xml_prefix is true
+        if grobid:
+            tag = './/{http://www.tei-c.org/ns/1.0}'
+        elif limitation_list or not xml_prefix:
             tag = './/'
         else:
             tag = './/{http://www.tei-c.org/ns/1.0}'
@@ -115,7 +120,7 @@ def count_meta_per_ref(input_l, reference, meta_counter, limitation_list, grobid
                                         if not grobid:
                                             tag_full = child2.tag + add_s
                                         else:
-                                            tag_full = child2.tag.split('}')[1] + add_s
+                                            tag_full = etree.QName(child2).localname + add_s
 
                                     # if the tag of the current element is equal to one of the names add it to out_list
                                     # normal case of output is ['persName', ['forename', 'Mario'], ['surname', 'Rossi']]
@@ -125,7 +130,7 @@ def count_meta_per_ref(input_l, reference, meta_counter, limitation_list, grobid
                                         out_list.append([tag_full, t])
                                         break
                             else:
-                                out_list.append([child2.tag.split('}')[1] + add_s, t])
+                                out_list.append([etree.QName(child2).localname + add_s, t])
                                 # impr_n += 1
 
                         cur_meta += len(imprint.getchildren())
@@ -146,7 +151,7 @@ def count_meta_per_ref(input_l, reference, meta_counter, limitation_list, grobid
                                 if not grobid:
                                     tag_full = subchild.tag
                                 else:
-                                    tag_full = subchild.tag.split('}')[1]
+                                    tag_full = etree.QName(subchild).localname
                             if tag_full == name or (tag_full in ['persName', 'author'] and name in ['surname', 'forename']):
 
                                 if temp is None:
@@ -177,7 +182,7 @@ def count_meta_per_ref(input_l, reference, meta_counter, limitation_list, grobid
                         else:
                             cur_list = temp
 
-                        cur_list.append([add_s + subchild.tag.split('}')[1], t])
+                        cur_list.append([add_s + etree.QName(subchild).localname, t])
                         cur_meta += 1
 
             if temp is not None and len(temp):
@@ -257,21 +262,103 @@ def get_metadata(cur_ref, out_l, elem_l):
     return out_l
 
 
-# in this function we go inside each specific file and extract its information
-def get_single_data(out_file, gs_file, parser_name):
-    output = []
+# return the first <listBibl> element of a TEI document, e.g. the bibliography of a Grobid full-text output.
+# The document is parsed incrementally: everything outside the <listBibl> is discarded as soon as it has been read,
+# and parsing stops at the end of the <listBibl>, so that the memory used does not depend on the size of the body.
+# Returns None if the document has no <listBibl>. The file may be compressed or an archive member (see corpus_io).
+def extract_list_bibl(xml_file):
+    with corpus_io.open_input(xml_file) as f:
+        return _extract_list_bibl(f)
+
+
+def _extract_list_bibl(f):
+    tag = '{http://www.tei-c.org/ns/1.0}listBibl'
+    depth = 0  # nesting level inside the first listBibl
+    for event, element in etree.iterparse(f, events=('start', 'end'), recover=True):
+        if element.tag == tag:
+            if event == 'start':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return element
+        elif event == 'end' and depth == 0:
+            # the element is complete and not part of the listBibl: drop its content and its preceding siblings
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    return None
+
+
+# return the root element of a gold standard (gold=True) or output file. CSL/AnyStyle JSON files ('.json') are
+# converted to TEI in memory as json_to_tei_anystyle.anystyle_parser converts them to TEI files, without namespace
+# (the gold standard may be in the TEI namespace or not). An output without references ('[]') gives an empty
+# <listBibl>, like the TEI file converted from it, so that only the references of the gold standard are counted.
+# Compressed files and archive members are read without extracting them (see corpus_io).
+def read_root(path, parser=None, gold=False):
+    if not corpus_io.plain_name(path).endswith('.json'):
+        if corpus_io.is_plain(path):
+            return etree.parse(path, parser).getroot()
+        return etree.fromstring(corpus_io.read_input(path), parser)
+    from json_to_tei_anystyle import anystyle_tree
+    return anystyle_tree(path, allow_empty=not gold).getroot()
+
+
+# describe an aligned pair of gold standard and output references with the outcome of each compared field:
+# 'matched', 'rejected' (present in the output but judged different) or 'missing' (not present in the output),
+# plus the metadata and content counters that the pair contributed
+def reference_pair(cur_gs, cur_out, cur_type, meta_to_compare, compared, not_found, counters) -> dict:
+    xml_id = '{http://www.w3.org/XML/1998/namespace}id'
+    found = set([tup[0] for tup in compared])
+    fields = {}
+    for key, _ in meta_to_compare:
+        if key not in found:
+            fields[key] = 'missing'
+        elif not_found is not None and key in not_found:
+            fields[key] = 'rejected'
+        else:
+            fields[key] = 'matched'
+    pair = {'gold_id': cur_gs.get(xml_id), 'output_id': cur_out.get(xml_id), 'type': cur_type, 'fields': fields}
+    pair.update(zip(['meta_gs', 'meta_out', 'meta_corr', 'text_corr'], counters))
+    return pair
+
+
+# whether the output of the parser is Grobid's full-text TEI (in the TEI namespace, with the references in a <listBibl>
+# of the back matter). Decided by the parser name, since the paths of a manifest need not contain it.
+def is_grobid(parser_name) -> bool:
+    return parser_name is not None and 'grobid' in parser_name.lower()
+
+
+# read and parse the files compared by get_single_data: returns the root of the gold standard and the root of the
+# output or, for Grobid, the <listBibl> of the output
+def load_inputs(out_file, gs_file, parser_name):
     # enter the gs and output xml with etree
     parser = etree.XMLParser(recover=True)  # prova per vedere se il parser semplifica le cose
-    gs_tree = etree.parse(gs_file, parser)
-    out_tree = etree.parse(out_file, parser)
-    gs_root = gs_tree.getroot()
-    out_root = out_tree.getroot()
+    gs_root = read_root(gs_file, parser, gold=True)
+    if is_grobid(parser_name):
+        # Grobid outputs contain the full text, only the bibliography is needed
+        return gs_root, extract_list_bibl(out_file)
+    return gs_root, read_root(out_file, parser)
+
+
+# in this function we go inside each specific file and extract its information
+# pairs: optional list to which a description of every aligned reference pair is appended (see reference_pair)
+# inputs: the result of load_inputs if the files have already been parsed
+# sweep: optional ThresholdSweep in which the fields of the aligned reference pairs are recorded
+# candidates: optional nearest_gold.CandidateReport to which the nearest gold standard references of the output
+#             references passed over without a match are added
+def get_single_data(out_file, gs_file, parser_name, pairs=None, inputs=None, sweep=None, candidates=None):
+    output = []
+    grobid = is_grobid(parser_name)
+    if inputs is None:
+        with instrumentation.stage('parse'):
+            inputs = load_inputs(out_file, gs_file, parser_name)
+    gs_root, out_root = inputs  # for Grobid, out_root is the <listBibl> of the output
 
     # verify whether the output list is empty or not. For Grobid there is a different procedure (not only refs in file)
     refs = None
-    if 'Grobid' in out_file:
-        list_bibl_struct = out_root.find('.//{http://www.tei-c.org/ns/1.0}listBibl')
-        refs = list(list_bibl_struct.getchildren())
+    if grobid:
+        refs = list(out_root.getchildren())
         if len([child for child in refs]):
             iter_ref = [gs_root, out_root]
             # count total number of references in gs and in output and add it to output list (positions 0 and 1)
@@ -303,13 +390,13 @@ def get_single_data(out_file, gs_file, parser_name):
     tot_gs_meta = tot_out_meta = corr_meta = tot_cor_ref = 0  # 4 out of 7 missing counters (meta + correct refs)
     tot_gs_texts = tot_out_texts = corr_texts = 0  # the last three missing counters (metadata content)
     compared = {}
+    aligner = AuthorAligner(parser_name)  # compares the author lists of aligned references
     prev_type = ''
     last_found = 0  # index of the last identified correct reference in the gold standard
-    limit = 5
-    while count_out < output[1] and count_gs < output[0] and limit > 0:   # funct continues until last reference in output is analysed
-        limit -= 1
+    matched_out = set()  # indices of the output references matched to a gold standard reference
+    while count_out < output[1] and count_gs < output[0]:   # funct continues until last reference in output is analysed
         cur_gs = gs_root[0][0][count_gs]  # current reference in gold standard
-        if 'Grobid' in out_file:
+        if grobid:
             cur_out = refs[count_out]  # current reference in output file
         else:
             cur_out = out_root[0][0][count_out]  # current reference in output file
@@ -325,30 +412,22 @@ def get_single_data(out_file, gs_file, parser_name):
         gs_l = get_metadata(cur_gs, [], ['analytic', 'monogr', 'series'])
         out_l = get_metadata(cur_out, [], ['analytic', 'monogr', 'series'])
 
-        if 'Grobid' in out_file:
-            grobid = True
-        else:
-            grobid = False
-
         # check base metadata in gs (in ancillary function); output = dictionary with metadata:value
-        vals = [t[1] for t in types_l if cur_type in t[0]]
+        # the schema leaves out the metadata that the parser cannot identify
+        fields = schema.active.fields(cur_type, parser_name)
 
-        if len(vals) == 0:
+        if fields is None:
             raise ValueError(f"Cannot determine any metadata to compare for type '{cur_type}'.")
-
-        # on the basis of the parser, if some metadata cannot be identified exclude them from the list
-        if parser_name in pars_except.keys():
-            for val in pars_except[parser_name]:
-                if val in vals:
-                    vals[0].remove(val)
+        vals = [fields]
 
         # check necessary metadata and respective values in gs
         xml_prefix = True
-        meta_to_compare = get_selected_elements(cur_gs, vals, True, False)
-        if len(meta_to_compare) == 0:
-            # try again without prefix
-            meta_to_compare = get_selected_elements(cur_gs, vals, False, False)
-            xml_prefix = False
+        with instrumentation.stage('select'):
+            meta_to_compare = get_selected_elements(cur_gs, vals, True, False)
+            if len(meta_to_compare) == 0:
+                # try again without prefix
+                meta_to_compare = get_selected_elements(cur_gs, vals, False, False)
+                xml_prefix = False
 
         # check if the respective metadata is present in the output file
         '''if not len(prev_type) or prev_type != cur_type or not len(compared):  # da finire di sistemare, manca il caso in cui il tipo sia lo stesso ma il numero di metadati no
@@ -359,9 +438,11 @@ def get_single_data(out_file, gs_file, parser_name):
 
         if len(meta_to_compare):
             keys = set([tup[0] for tup in meta_to_compare])
-            compared = get_selected_elements(cur_out, [list(keys)], grobid, grobid)
+            with instrumentation.stage('select'):
+                compared = get_selected_elements(cur_out, [list(keys)], grobid, grobid)
             # compara i valori: do metadata coincide? Call an external function to verify it
-            temporary_value, not_found = compare_meta(meta_to_compare, compared, cur_type)
+            with instrumentation.stage('compare_meta'):
+                temporary_value, not_found = compare_meta(meta_to_compare, compared, cur_type)
         else:
             temporary_value, not_found = False, None
             id = cur_gs.get('{http://www.w3.org/XML/1998/namespace}id')
@@ -371,14 +452,17 @@ def get_single_data(out_file, gs_file, parser_name):
 
         # we are inside the file: do necessary data coincide? In case it is so enter
         if temporary_value:
+            corr_before = (corr_meta, corr_texts)
             tot_cor_ref += 1  # 1 point to correct references counter
+            matched_out.add(count_out)
             last_found += count_gs-last_found  # assign to the variable of last reference found the index of current ref
             count_gs += 1  # 1 point to gold standard references counter
             count_out += 1  # 1 point to output references counter
 
             # 3. creare sottofunzione che guardi tutti i metadati, per l'output solo se trovati nel gold standard
             # tot_gs_meta is summed with the number of metadata identified
-            tot_gs_meta, gs_comp, cur_tot_gs = count_meta_per_ref(gs_l, cur_gs, tot_gs_meta, None, False, None, xml_prefix)
+            with instrumentation.stage('count_meta'):
+                tot_gs_meta, gs_comp, cur_tot_gs = count_meta_per_ref(gs_l, cur_gs, tot_gs_meta, None, False, None, xml_prefix)
             # tot_out_meta is summed with the number of metadata identified (max same metadata but may more occurrences)
             cur_keys = set([tup[0] for tup in gs_comp])
 
@@ -395,7 +479,10 @@ def get_single_data(out_file, gs_file, parser_name):
             for element in gs_comp:
                 if element[0] == 'persName':
                     max_aut.extend(element[1])
-            tot_out_meta, out_comp, cur_tot_out = count_meta_per_ref(out_l, cur_out, tot_out_meta, cur_keys, grobid, len(max_aut), xml_prefix)
+            with instrumentation.stage('count_meta'):
+                tot_out_meta, out_comp, cur_tot_out = count_meta_per_ref(out_l, cur_out, tot_out_meta, cur_keys, grobid, len(max_aut), xml_prefix)
+            if sweep is not None:
+                sweep.record(gs_comp, out_comp)
 
             # intersection in order to get only the metadata that are in the gold standard
             comm = set([tup[0] for tup in gs_comp]).intersection(set([tup[0] for tup in out_comp]))
@@ -482,55 +569,30 @@ def get_single_data(out_file, gs_file, parser_name):
             else:
                 corr_texts += len(compared)-len(not_found)  # correctly found metadata in a previous passage
             # find the remaining metadata for text metadata
-            out = 0
-            # loop to verify whether the metadata contents are the same
-            while out < len(out_comp):  # counter for output reference
-                gs = 0
-                # if clause to check if that specific metadata has alreay been verified in a previous step
-                if out_comp[out][0] not in set([tup[0] for tup in compared]):
-                    while gs < len(gs_comp):  # counter for gold standard reference
-                        # if the metadata texts are the same add one to correct texts
-
-                        # prova 1
-                        if gs_comp[gs][0] == 'persName' and out_comp[out][0] == 'persName':
-                            both = 0
-                            found = 0
-                            # if len(out_comp[out][1]) == 2:
-                            if isinstance(out_comp[out][1][0], list):
-                                for item1 in out_comp[out][1]:
-                                    for item2 in gs_comp[gs][1]:
-                                        # verify if surname and forename belong to same author, else it is not counted
-                                        if item1[0] == item2[0]:
-                                            if compare_single(item1[1], item2[1], item1[0], parser_name):
-                                                found += 1
-                                            else:
-                                                both += 1
-                                if both == 0:
-                                    corr_texts += found
-                                    gs += len(gs_comp)
-                                else:
-                                    gs += 1
-                            else:  # handle the case in which only persName defines an author: ScienceParse, Scholarcy
-                                for item1 in out_comp[out][1][0].split(' '):
-                                    for item2 in gs_comp[gs][1]:
-                                        if compare_single(item1, item2[1], item2[0], parser_name):
-                                            found += 1
-                                        else:
-                                            both += 1
-                                if both < 3:  # necessary since not known which are forename and surname, needed 4 tries
-                                    corr_texts += 1  # in this case it can't be found: the out data counts as 1
+            with instrumentation.stage('content'):
+                out = 0
+                # loop to verify whether the metadata contents are the same
+                while out < len(out_comp):  # counter for output reference
+                    gs = 0
+                    # if clause to check if that specific metadata has alreay been verified in a previous step
+                    if out_comp[out][0] not in set([tup[0] for tup in compared]):
+                        if out_comp[out][0] == 'persName':
+                            corr_texts += aligner.count_matches(out_comp[out], gs_comp)
+                        else:
+                            while gs < len(gs_comp):  # counter for gold standard reference
+                                # if the metadata texts are the same add one to correct texts
+                                if gs_comp[gs][0] == out_comp[out][0] and \
+                                        compare_single(gs_comp[gs][1], out_comp[out][1], gs_comp[gs][0], parser_name):
+                                    corr_texts += 1
                                     gs += len(gs_comp)
                                 else:
                                     gs += 1
+                    out += 1
 
-                        else:
-                            if (gs_comp[gs][0] == out_comp[out][0] or (gs_comp[gs][0] in ['surname', 'forename'] and out_comp[out][0] == 'persName')) and \
-                                    compare_single(gs_comp[gs][1], out_comp[out][1], gs_comp[gs][0], parser_name):
-                                corr_texts += 1
-                                gs += len(gs_comp)
-                            else:
-                                gs += 1
-                out += 1
+            if pairs is not None:
+                pairs.append(reference_pair(cur_gs, cur_out, cur_type, meta_to_compare, compared, not_found,
+                                            [cur_tot_gs, cur_tot_out, corr_meta - corr_before[0],
+                                             corr_texts - corr_before[1]]))
 
             # per evitare di riempire compared di nuovo se la reference è uguale: se c'è match il dizionario si
             # svuota. Al momento di riempirlo (r. 178) viene chiesto se è vuoto. Se non lo è resta lo stesso di prima
@@ -553,11 +615,48 @@ def get_single_data(out_file, gs_file, parser_name):
         # count_out += 1
         # print(temporary_value, cur_type, gs_l)
 
+    if candidates is not None:
+        # all output references, including those after the last gold standard reference that the alignment never reached
+        out_refs = refs if refs is not None else list(out_root[0][0])
+        unmatched = [n for n in range(len(out_refs)) if n not in matched_out]
+        if unmatched:
+            with instrumentation.stage('candidates'):
+                report_unmatched(candidates, list(gs_root[0][0]), out_refs, unmatched, parser_name, grobid)
+
     output.extend([tot_cor_ref, tot_gs_meta, tot_out_meta, corr_meta, tot_gs_texts, tot_out_texts, corr_texts])
     # print('Get single data: ', output)
     return output
 
 
+# author surnames, compared in addition to the schema fields when looking for the nearest gold standard references
+candidate_name_fields = ['analytic-author-persName-surname', 'monogr-author-persName-surname']
+
+
+# add the nearest gold standard references of the output references with the given indices to the CandidateReport
+# gs_refs, out_refs: the gold standard and output references of the document
+def report_unmatched(candidates, gs_refs, out_refs, unmatched, parser_name, grobid):
+    xml_id = '{http://www.w3.org/XML/1998/namespace}id'
+    index = GoldIndex([(ref.get(xml_id), _reference_text(ref)) for ref in gs_refs])
+
+    def gold_fields(n):
+        cur_type = gs_refs[n].get('type')
+        vals = [list(schema.active.fields(cur_type, parser_name) or ()) + candidate_name_fields]
+        selected = get_selected_elements(gs_refs[n], vals, True, False)
+        if not selected:
+            selected = get_selected_elements(gs_refs[n], vals, False, False)
+        return cur_type, selected
+
+    for n in unmatched:
+        cur_out = out_refs[n]
+        candidates.record((n, cur_out.get(xml_id), _reference_text(cur_out)), index, gold_fields,
+                          lambda keys: get_selected_elements(cur_out, [keys], grobid, grobid))
+
+
+# the text of a reference element with normalized whitespace
+def _reference_text(ref):
+    return ' '.join(' '.join(ref.itertext()).split())
+
+
 # compute the values and add them to the dictionary that will create the json file
 def create_json(file_name, js_dict, values, index, parser_name) -> dict:
     keys = [('ref', 'references'), ('meta', 'metadata'), ('text', 'content')]
@@ -583,87 +682,187 @@ def create_json(file_name, js_dict, values, index, parser_name) -> dict:
     return js_dict
 
 
-# the objective is to count the values of each file and return them as a list, for input to the prior function
-# second aim is creating a json file for each parser, including all the single papers and topics
-#
-# returns a dict with keys "result", containing a list of lists with the numeric results,  "diagnostic", containing
-# the more verbose file-level diagnostic data, and "missing", containing data on the missing files
-def get_file_data(path, parser_name, path_to_gs):
+# the nine counters computed for each file, in the order returned by get_single_data
+value_keys = ['ref_tot_gs', 'ref_tot_out', 'ref_tot_corr', 'meta_tot_gs', 'meta_tot_out', 'meta_tot_corr',
+              'text_tot_gs', 'text_tot_out', 'text_tot_corr']
+
+
+# pair the parser output files in path with the gold standard files in path_to_gs, a directory or a manifest file:
+# returns a list of (file name, output file, gold standard file) tuples. Documents are paired by file stem or by the
+# manifest (see pairing.py); the output file is None if it is missing.
+def file_tasks(path, path_to_gs, parser_name=None) -> list:
+    return pairing.pair_files(path, path_to_gs, parser_name)
+
+
+# evaluate the files of a parser one by one and yield a record for each file as soon as it has been computed:
+# {"parser": parser name, "file": file name, "values": list of the nine counters, "diagnostic": file-level diagnostic
+# data as created by create_json, "missing": true if no output could be evaluated for the gold file}
+# skip: collection of file names that should not be evaluated, e.g. because they are already in a results stream
+# pairs: if true, the records contain a "pairs" list describing the aligned reference pairs (see reference_pair)
+# jobs: number of worker processes evaluating files in parallel, the records are still yielded in file order
+# prefetch: number of upcoming files read and parsed in background threads while a file is evaluated, if jobs is 1
+# shard: optional (i, n) tuple to evaluate only the files of the i-th of n shards (see in_shard)
+# sweep: if true, the records contain a "sweep" dict with the field similarity histograms of the file (see
+#        threshold_sweep)
+# candidates: if positive, the records contain an "unmatched" list with the given number of nearest gold standard
+#             references of every output reference that could not be matched (see nearest_gold)
+# progress: optional progress.Progress to which every file is reported with the number of its gold standard references
+def iter_file_data(path, parser_name, path_to_gs, skip=(), pairs=False, jobs=1, prefetch=0, shard=None, sweep=False,
+                   candidates=0, progress=None):
+    tasks = [task for task in file_tasks(path, path_to_gs, parser_name)
+             if task[0] not in skip and in_shard(task[0], shard)]
+    if progress is not None:
+        progress.start('evaluation', parser_name, len(tasks), jobs if jobs and jobs > 1 and len(tasks) > 1 else 1)
+        try:
+            for record in _iter_records(tasks, parser_name, pairs, jobs, prefetch, sweep, candidates):
+                progress.update(record['file'], record['values'][0])
+                yield record
+        except BaseException:
+            progress.finish(failed=True)
+            raise
+        progress.finish()
+    else:
+        yield from _iter_records(tasks, parser_name, pairs, jobs, prefetch, sweep, candidates)
+
+
+# the records of iter_file_data for the given (file name, output file, gold file) tasks
+def _iter_records(tasks, parser_name, pairs, jobs, prefetch, sweep, candidates):
+    for n, (file_name, vals_to_sum, file_pairs, file_sweep, file_unmatched) in enumerate(
+            _evaluate_files(tasks, parser_name, pairs, jobs, prefetch, sweep, candidates)):
+        missing = vals_to_sum is None  # true if the output file is missing
+        if missing:
+            # Compute Missing Files: only the gold standard references are counted
+            parser = etree.XMLParser(recover=True)  # prova per vedere se il parser semplifica le cose
+            gs_root = read_root(tasks[n][2], parser, gold=True)
+            cur_id = gs_root[0][0][-1].attrib['{http://www.w3.org/XML/1998/namespace}id']
+            vals_to_sum = [int(cur_id[1:]) + 1]
+        values = file_values(vals_to_sum)
+        record = {
+            "parser": parser_name,
+            "file": file_name,
+            "values": [v[1] for v in values],
+            "diagnostic": create_json(file_name, {}, values, n, parser_name)[file_name],
+            "missing": missing
+        }
+        if pairs:
+            record["pairs"] = file_pairs
+        if sweep:
+            record["sweep"] = file_sweep
+        if candidates:
+            record["unmatched"] = file_unmatched
+        yield record
+
+
+# the [[key, value], ...] list of the nine counters of a file from the values returned by get_single_data, which may
+# be fewer if the output has no references
+def file_values(vals_to_sum) -> list:
+    values = [[key, 0] for key in value_keys]
+    inner = 0
+    while inner < len(vals_to_sum):  # add the values returned by get_single_data to the list of lists
+        values[inner][1] += vals_to_sum[inner]  # update the current state for the json
+        inner += 1
+    return values
+
+
+# whether the file belongs to the shard (i, n), i.e. the i-th of n disjoint sets of files (1 <= i <= n). Files are
+# assigned by a hash of their name that is the same on every machine and in every run. Every file belongs to the shard
+# None.
+def in_shard(file_name, shard) -> bool:
+    if shard is None:
+        return True
+    index, count = shard
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {index}/{count}.")
+    digest = hashlib.sha1(file_name.encode('utf8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count == index - 1
+
+
+# evaluate a single (file name, output file, gold file) task, returns the file name, the values of get_single_data,
+# the list of reference pairs, the field similarity histograms and the nearest gold standard references of the
+# unmatched output references (None if not requested). prefetched is an optional future of the task's inputs. The
+# values are None if the output file is missing.
+def _evaluate_file(task, parser_name, pairs, prefetched=None, sweep=False, candidates=0):
+    file_pairs = [] if pairs else None
+    file_sweep = ThresholdSweep() if sweep else None
+    file_candidates = CandidateReport(candidates) if candidates else None
+    if task[1] is None:
+        return task[0], None, file_pairs, (file_sweep.to_dict() if sweep else None), \
+            ([] if candidates else None)
+    with instrumentation.file(task[0]):
+        inputs = None
+        if prefetched is not None:
+            # only the time spent waiting for the background thread is counted
+            with instrumentation.stage('parse'):
+                inputs = prefetched.result()
+        vals_to_sum = get_single_data(task[1], task[2], parser_name, file_pairs, inputs, file_sweep, file_candidates)
+    if verdict_cache.active is not None:
+        verdict_cache.active.flush()
+    return task[0], vals_to_sum, file_pairs, (file_sweep.to_dict() if sweep else None), \
+        (file_candidates.to_list() if candidates else None)
+
+
+# evaluate the tasks in order, in a pool of worker processes if jobs > 1. The results are yielded in the order of the
+# tasks; instrumentation only covers files evaluated in the current process. The workers use the numeric comparison
+# mode, the schema, the trace settings and the verdict cache settings of the current process. Without worker
+# processes, the inputs of up to prefetch upcoming tasks are parsed in background threads.
+def _evaluate_files(tasks, parser_name, pairs, jobs, prefetch=0, sweep=False, candidates=0):
+    if jobs is None or jobs <= 1 or len(tasks) <= 1:
+        if prefetch and len(tasks) > 1:
+            for task, prefetched in _prefetch_inputs(tasks, parser_name, prefetch):
+                yield _evaluate_file(task, parser_name, pairs, prefetched, sweep, candidates)
+        else:
+            for task in tasks:
+                yield _evaluate_file(task, parser_name, pairs, sweep=sweep, candidates=candidates)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(get_numeric_mode(), schema.active,
+                                       tracing.active.config() if tracing.active is not None else None,
+                                       verdict_cache.active.config() if verdict_cache.active is not None else None)
+                             ) as executor:
+        yield from executor.map(partial(_evaluate_file, parser_name=parser_name, pairs=pairs, sweep=sweep,
+                                        candidates=candidates), tasks)
+
+
+# yield every task with a future of its inputs (see load_inputs). The inputs are read and parsed by depth threads,
+# at most depth tasks ahead of the one yielded last, so that reading the files overlaps with the comparison.
+def _prefetch_inputs(tasks, parser_name, depth):
+    from concurrent.futures import ThreadPoolExecutor
+    queue = deque()
+    with ThreadPoolExecutor(max_workers=depth) as executor:
+        for task in tasks:
+            queue.append((task, executor.submit(load_inputs, task[1], task[2], parser_name)
+                          if task[1] is not None else None))
+            if len(queue) > depth:
+                yield queue.popleft()
+        while queue:
+            yield queue.popleft()
+
+
+def _init_worker(numeric_mode, active_schema, trace=None, verdicts=None):
+    set_numeric_mode(numeric_mode)
+    schema.set_schema(active_schema)
+    if trace is not None:
+        tracing.set_trace(*trace)
+    # a forked worker must neither use nor close the database connection of the parent process
+    verdict_cache.active = verdict_cache.VerdictCache(*verdicts) if verdicts is not None else None
+
+
+# sum up a stream of file records as yielded by iter_file_data (or read back from a results stream) into the dict
+# returned by get_file_data. If diagnostic is false, the file-level diagnostic data is not kept in memory.
+def aggregate_file_data(records, diagnostic=True) -> dict:
     output = [0, 0, 0, 0, 0, 0, 0, 0, 0]  # list that will contain the final values of all the files of the dataset
     missing = []
     to_json = {}
-    n = 0
-    files_list = list(os.listdir(path))
-
-    # section to verify whether there are missing files in the output files directory
-    if len(files_list) == len(list(os.listdir(path_to_gs))):
-        out_list = files_list
-        gs_list = list(os.listdir(path_to_gs))
-    else:
-        raise RuntimeError("Number of parser output files and gold standard files do not match.")
-        # the following only makes sense with the original dataset and must be updated to work with arbitrary file names
-        #
-        # gs = list(os.listdir(path_to_gs))
-        # out_list, gs_list = [], []
-        # c = 1
-        # while c in range(1, 57): 
-        #     found = False
-        #     for item in files_list:
-        #         if parser_name == 'Scholarcy':
-        #             str_search = '_'+str(c)+'.pdf_tei'
-        #         else:
-        #             str_search = '_'+str(c)+'_'
-        #         if str_search in item or 'z_notes_test'+str(c-54) in item:
-        #             out_list.append(files_list[files_list.index(item)])
-        #             for item2 in gs:
-        #                 if item2.split('_')[1] == str(c)+'.xml' or 'z_notes_test'+str(c-54) in item2:
-        #                     gs_list.append(gs[gs.index(item2)])
-        #                     found = True
-        #                     break
-        #         if found:
-        #             break
-        #     if not found:
-        #         for item2 in gs:
-        #             if item2.split('_')[1] == str(c) + '.xml' or 'z_notes_test' + str(c - 54) in item2:
-        #                 missing.append(gs[gs.index(item2)])
-        #                 break
-        #     c += 1
-
-    # starts the actual analysis, out_l is used as reference since there may be changes in the number of references
-    while n < 1:
-    #while n < len(out_list):  # select one by one the papers in the specified parser's output directory
-
-        values = [['ref_tot_gs', 0], ['ref_tot_out', 0], ['ref_tot_corr', 0], ['meta_tot_gs', 0], ['meta_tot_out', 0],
-                  ['meta_tot_corr', 0], ['text_tot_gs', 0], ['text_tot_out', 0], ['text_tot_corr', 0]]
-        out_file = os.path.join(path, out_list[n])
-        gold_file = os.path.join(path_to_gs, gs_list[n])
-        vals_to_sum = get_single_data(out_file, gold_file, parser_name)
-        if vals_to_sum is not None:  # it is true only in case no reference is in the output file
-            inner = 0
-            while inner < len(vals_to_sum):  # add the values returned by get_single_data to the list of lists
-                values[inner][1] += vals_to_sum[inner]  # update the current state for the json
-                output[inner] += vals_to_sum[inner]  # update the output list for get_parsr_data
-                inner += 1
-            to_json = create_json(out_list[n], to_json, values, n, parser_name)
-        else:
-            missing.append(out_list[n])
-
-        n += 1
-
-# Compute Missing Files
-    for file in missing:
-        values = [['ref_tot_gs', 0], ['ref_tot_out', 0], ['ref_tot_corr', 0], ['meta_tot_gs', 0],
-                  ['meta_tot_out', 0],
-                  ['meta_tot_corr', 0], ['text_tot_gs', 0], ['text_tot_out', 0], ['text_tot_corr', 0]]
-        parser = etree.XMLParser(recover=True)  # prova per vedere se il parser semplifica le cose
-        gs_tree = etree.parse(path_to_gs + '/' + file, parser)
-        gs_root = gs_tree.getroot()
-        cur_id = gs_root[0][0][-1].attrib['{http://www.w3.org/XML/1998/namespace}id']
-        output[0] += int(cur_id[1:]) + 1  # adding this value to output in order to count the
-        values[0][1] += int(cur_id[1:]) + 1
-        to_json = create_json(file, to_json, values, n, parser_name)
-        # print('Get single data: ', [l[1] for l in values])
-        n += 1
+    for record in records:
+        inner = 0
+        while inner < len(output):
+            output[inner] += record['values'][inner]  # update the output list for get_parser_data
+            inner += 1
+        if record['missing']:
+            missing.append(record['file'])
+        if diagnostic:
+            to_json[record['file']] = record['diagnostic']
 
     # print('Get file data: ', to_json)
     if len(missing):
@@ -675,52 +874,167 @@ def get_file_data(path, parser_name, path_to_gs):
         "diagnostic": to_json
     }
 
+
+# the objective is to count the values of each file and return them as a list, for input to the prior function
+# second aim is creating a json file for each parser, including all the single papers and topics
+#
+# returns a dict with keys "result", containing a list of lists with the numeric results,  "diagnostic", containing
+# the more verbose file-level diagnostic data, and "missing", containing data on the missing files
+def get_file_data(path, parser_name, path_to_gs):
+    return aggregate_file_data(iter_file_data(path, parser_name, path_to_gs))
+
+
+# like get_file_data, but append the file records to the JSON Lines file at stream while they are computed. Files
+# already in the stream are not evaluated again, the result is aggregated from the complete stream.
+def get_streamed_file_data(path, parser_name, path_to_gs, stream):
+    return aggregate_file_data(iter_streamed_file_data(path, parser_name, path_to_gs, stream))
+
+
+# evaluate the files of a parser that are not yet in the JSON Lines file at stream, append their records to it and
+# yield all the records of the parser from the stream
+def iter_streamed_file_data(path, parser_name, path_to_gs, stream, pairs=False, jobs=1, prefetch=0, shard=None,
+                            progress=None):
+    done = result_stream.completed_files(stream, parser_name)
+    records = iter_file_data(path, parser_name, path_to_gs, skip=done, pairs=pairs, jobs=jobs, prefetch=prefetch,
+                             shard=shard, progress=progress)
+    for _ in result_stream.write_jsonl(records, stream):
+        pass
+    return result_stream.read_jsonl(stream, parser_name)
+
+
+def _file_records(parser, path_to_gs, path_to_output, stream=None, pairs=False, jobs=1, prefetch=0, shard=None,
+                  progress=None):
+    if stream is None:
+        return iter_file_data(os.path.join(path_to_output, parser), parser, path_to_gs, pairs=pairs, jobs=jobs,
+                              prefetch=prefetch, shard=shard, progress=progress)
+    return iter_streamed_file_data(os.path.join(path_to_output, parser), parser, path_to_gs, stream, pairs, jobs,
+                                   prefetch, shard, progress)
+
 # retrieve evaluation data for the given list of parsers
 # parser_list: list of parser names to test, which will be prepended to the output dir path
-# path_to_gs: the path to the directory containing the XML-TEI gold standard
+# path_to_gs: the path to the directory containing the XML-TEI gold standard, or to a manifest file listing the gold
+#             standard and output files (see pairing.py). Gold standard and output files are paired by file stem;
+#             gold standard files without output are counted as missing.
 # path_to_output: path to the directory containing subfolders with the XML-TEI result of the individual parsers
+#                 (not used with a manifest)
 # diagnostic: if true, return verbose file-level diagnostics instead of the raw numeric data
-def get_parser_data(parser_list, path_to_gs, path_to_output, diagnostic=False) -> list:
+# timings: if true, add a 'timings' section with stage timings, per-file timings, call counters and cache statistics
+#          to the result dict of each parser
+# stream: optional path to a JSON Lines file to which the file-level records are appended as soon as they are
+#         computed. Files already in the stream are skipped, so that an interrupted run can be resumed.
+# jobs: number of worker processes evaluating files in parallel
+# prefetch: if jobs is 1, number of upcoming files read and parsed in background threads while a file is evaluated
+# shard: optional (i, n) tuple with 1 <= i <= n to evaluate only the files of the i-th of n shards, which are assigned
+#        by a stable hash of the file name (see in_shard). The results of the shards can be combined with
+#        merge_parser_data if their records have been written to a stream.
+# progress: optional progress.Progress reporting the files and references evaluated, the throughput and the
+#           estimated time to completion of each parser through a callback and/or a status file
+def get_parser_data(parser_list, path_to_gs, path_to_output, diagnostic=False, timings=False, stream=None,
+                    jobs=1, prefetch=0, shard=None, progress=None) -> list:
     output = []
     for parser in parser_list:
-        file_data = get_file_data(os.path.join(path_to_output, parser), parser, path_to_gs)
-        if diagnostic:
-            output.append([parser, file_data['diagnostic']])
+        if timings:
+            with instrumentation.collect() as collector:
+                file_data = aggregate_file_data(_file_records(parser, path_to_gs, path_to_output, stream, jobs=jobs,
+                                                              prefetch=prefetch, shard=shard, progress=progress),
+                                                diagnostic)
+            file_data['timings'] = collector.report()
         else:
-            temp_out = [parser, {}]
-            key_l = ['ref_tot_gs', 'ref_tot_out', 'ref_tot_corr', 'meta_tot_gs', 'meta_tot_out', 'meta_tot_corr',
-                    'text_tot_gs', 'text_tot_out', 'text_tot_corr']
-            value_l = file_data['result'] 
-            # while loop to associate the keys to the respective values
-            n = 0
-            while n < len(key_l):
-                temp_out[1].update({key_l[n]: value_l[n]})
-                n += 1
-                # append the current final list to the comprehensive major list
-            output.append(temp_out)
+            file_data = aggregate_file_data(_file_records(parser, path_to_gs, path_to_output, stream, jobs=jobs,
+                                                          prefetch=prefetch, shard=shard, progress=progress),
+                                            diagnostic)
+        output.append(parser_entry(parser, file_data, diagnostic))
     return output
 
 
+# the entry of a parser in the list returned by get_parser_data, from the aggregated file data of the parser
+def parser_entry(parser, file_data, diagnostic=False) -> list:
+    if diagnostic:
+        if 'timings' in file_data:
+            file_data['diagnostic']['timings'] = file_data['timings']
+        return [parser, file_data['diagnostic']]
+    temp_out = [parser, {}]
+    key_l = value_keys
+    value_l = file_data['result']
+    # while loop to associate the keys to the respective values
+    n = 0
+    while n < len(key_l):
+        temp_out[1].update({key_l[n]: value_l[n]})
+        n += 1
+        # append the current final list to the comprehensive major list
+    if 'timings' in file_data:
+        temp_out[1]['timings'] = file_data['timings']
+    return temp_out
+
+
+# compute the rounded precision, recall and f-score of the three categories from a dict with the nine counters,
+# in the format of the values of compute_values
+def score_totals(totals) -> list:
+    keys = [('ref', 'references'), ('meta', 'metadata'), ('text', 'content')]
+    total_comput = [{}]
+    for key in keys:
+        precision = round(totals[key[0]+'_tot_corr'] / totals[key[0]+'_tot_out'], 2) if totals[key[0]+'_tot_out'] else 0
+        recall = round(totals[key[0]+'_tot_corr'] / totals[key[0]+'_tot_gs'], 2) if totals[key[0]+'_tot_gs'] else 0
+        f_score = round((2 * (precision * recall) / (precision + recall)), 2) if precision or recall else 0
+        # total_comput['values'].append({key[1]:[{'precision': precision, 'recall': recall, 'f-score': f_score}]})
+        total_comput[0].update({key[1]: [{'precision': precision, 'recall': recall, 'f-score': f_score}]})
+    return total_comput
+
+
 # compute precison, recall and f-score for each parser + print out a json file with the results
 # parser_list: list of parser names to test, which will be prepended to the output dir path
-# path_to_gs: the path to the directory containing the XML-TEI gold standard
+# path_to_gs: the path to the directory containing the XML-TEI gold standard or to a manifest (see get_parser_data)
 # path_to_output: path to the directory containing subfolders with the XML-TEI result of the individual parsers
-def compute_values(parser_list, path_to_gs, path_to_output):
-    final_data = get_parser_data(parser_list, path_to_gs, path_to_output)
-    keys = [('ref', 'references'), ('meta', 'metadata'), ('text', 'content')]
+# timings: if true, add a 'timings' section to the result of each parser (see get_parser_data)
+# stream: optional path to a JSON Lines file for the file-level records (see get_parser_data)
+# jobs, prefetch: number of worker processes and of files read ahead (see get_parser_data)
+# shard: optional (i, n) tuple to evaluate only the i-th of n shards of the files (see get_parser_data)
+def compute_values(parser_list, path_to_gs, path_to_output, timings=False, stream=None, jobs=1, prefetch=0,
+                   shard=None):
+    final_data = get_parser_data(parser_list, path_to_gs, path_to_output, timings=timings, stream=stream, jobs=jobs,
+                                 prefetch=prefetch, shard=shard)
+    return parser_scores(final_data)
+
+
+# the result of compute_values from the result of get_parser_data without diagnostics
+def parser_scores(final_data) -> dict:
     output = {}
     for parser in final_data:
         # total_comput = {'parser': parser[0], 'values': []}
-        total_comput = [{}]
-        for key in keys:
-            precision = round(parser[1][key[0]+'_tot_corr'] / parser[1][key[0]+'_tot_out'], 2) if parser[1][key[0]+'_tot_out'] else 0
-            recall = round(parser[1][key[0]+'_tot_corr'] / parser[1][key[0]+'_tot_gs'], 2) if parser[1][key[0]+'_tot_gs'] else 0
-            f_score = round((2 * (precision * recall) / (precision + recall)), 2) if precision or recall else 0
-            # total_comput['values'].append({key[1]:[{'precision': precision, 'recall': recall, 'f-score': f_score}]})
-            total_comput[0].update({key[1]: [{'precision': precision, 'recall': recall, 'f-score': f_score}]})
+        total_comput = score_totals(parser[1])
+        if 'timings' in parser[1]:
+            total_comput[0]['timings'] = parser[1]['timings']
         output.update({parser[0]: total_comput})
     return output
 
+
+# combine the file records of evaluation shards into the result of a single run. The shards are JSON Lines files
+# written by evaluating with a shard and a stream (or by evaluate.py --shard with the jsonl format), e.g.
+#   get_parser_data(['AnyStyle'], gold, output, shard=(1, 4), stream='shard-1.jsonl')
+# parser_list: optional list of the parsers to include, in the order of the result; by default all parsers found
+# diagnostic: see get_parser_data. Requires shards written with file-level diagnostics.
+# Raises a ValueError if a file has been evaluated in more than one shard.
+def merge_parser_data(shard_paths, parser_list=None, diagnostic=False) -> list:
+    records = {}
+    for path in shard_paths:
+        for record in result_stream.read_jsonl(path):
+            if parser_list is not None and record['parser'] not in parser_list:
+                continue
+            parser_records = records.setdefault(record['parser'], {})
+            if record['file'] in parser_records:
+                raise ValueError(f"File '{record['file']}' of {record['parser']} is in more than one shard.")
+            parser_records[record['file']] = record
+    output = []
+    for parser in (parser_list if parser_list is not None else list(records)):
+        file_data = aggregate_file_data(records.get(parser, {}).values(), diagnostic)
+        output.append(parser_entry(parser, file_data, diagnostic))
+    return output
+
+
+# the result of compute_values for the evaluation shards (see merge_parser_data)
+def merge_values(shard_paths, parser_list=None) -> dict:
+    return parser_scores(merge_parser_data(shard_paths, parser_list))
+
 def file_level_diagnostics(parser_name, path_to_gs, path_to_output):
     output = []
     out_dir = os.path.join(path_to_output, parser_name)
@@ -728,4 +1042,108 @@ def file_level_diagnostics(parser_name, path_to_gs, path_to_output):
         gold_path = os.path.join(path_to_gs, gold_file)
         out_path = os.path.join(path_to_output, parser_name, gold_file)
         output.append(get_single_data(out_path, gold_path, parser_name))
-    return output
\ No newline at end of file
+    return output
+
+# compute micro- and macro-averaged precision, recall and f-score with document-level bootstrap confidence intervals
+# for each parser. Unlike compute_values, the values are not rounded.
+# parser_list, path_to_gs, path_to_output, stream, jobs, prefetch: see get_parser_data
+# n_resamples: number of bootstrap resamples, 0 to skip the confidence intervals
+# confidence: confidence level of the intervals
+# seed: seed of the random generator used for resampling
+def compute_statistics(parser_list, path_to_gs, path_to_output, n_resamples=2000, confidence=0.95, seed=0,
+                       stream=None, jobs=1, prefetch=0) -> dict:
+    import metrics
+    output = {}
+    for parser in parser_list:
+        names, matrix = metrics.counter_matrix(_file_records(parser, path_to_gs, path_to_output, stream, jobs=jobs,
+                                                             prefetch=prefetch))
+        output[parser] = metrics.summarize(matrix, n_resamples, confidence, seed)
+    return output
+
+
+# the most frequent reference type and the number of references of a gold standard file, used to stratify samples by
+# reference type. This parses the whole file.
+def gold_profile(gs_file) -> tuple:
+    references = list(read_root(gs_file, etree.XMLParser(recover=True), gold=True)[0][0])
+    types = [reference.get('type') for reference in references]
+    return (max(set(types), key=types.count) if types else None), len(references)
+
+
+# estimate precision, recall and f-score for each parser from a stratified random sample of the files instead of
+# evaluating all of them (see sampling.py).
+# parser_list, path_to_gs, path_to_output, jobs, prefetch: see get_parser_data
+# sample_size: number of files in the first sample
+# target_width: if given, the sample is grown by half of its size until the confidence intervals of the f-scores are
+#               at most this wide (e.g. 0.05), all files have been evaluated or max_size has been reached
+# seed: seed of the random generator used for sampling
+# confidence: confidence level of the intervals
+# strata: 'size' to stratify the files by the size of their gold standard file, which is read from the file system or
+#         the archive index, so that only the sampled files are read; 'type' to stratify them by the most frequent
+#         reference type and the number of references of the gold standard (see gold_profile), which parses every gold
+#         standard file once before the sample is drawn
+# size_bins: number of strata by size within each reference type
+# Returns a dict with the estimates, their confidence intervals and the achieved sample size of each parser.
+def sample_values(parser_list, path_to_gs, path_to_output, sample_size=30, target_width=None, max_size=None, seed=0,
+                  confidence=0.95, strata='size', size_bins=3, jobs=1, prefetch=0) -> dict:
+    import sampling
+    output = {}
+    for parser in parser_list:
+        path = os.path.join(path_to_output, parser)
+        tasks = file_tasks(path, path_to_gs, parser)
+        names = [task[0] for task in tasks]
+        if strata == 'type':
+            profiles = [gold_profile(task[2]) for task in tasks]
+        else:
+            profiles = [(None, corpus_io.input_size(task[2])) for task in tasks]
+        sample = sampling.StratifiedSample(names, profiles, size_bins, seed)
+        limit = min(len(names), max_size) if max_size else len(names)
+        values = {}
+        size = min(sample_size, limit)
+        while True:
+            selected = sample.sample(size)
+            new = set(name for members in selected.values() for name in members if name not in values)
+            for record in iter_file_data(path, parser, path_to_gs, skip=set(names) - new, jobs=jobs,
+                                         prefetch=prefetch):
+                values[record['file']] = record['values']
+            result = sample.estimate(selected, values, confidence)
+            if target_width is None or result['width'] <= target_width or size >= limit:
+                break
+            size = min(limit, size + max(1, size // 2))
+        output[parser] = result
+    return output
+
+
+# precision, recall and f-score of every compared field for a grid of deltas, from a single evaluation run of each
+# parser (see threshold_sweep.py). The references are aligned with the configured deltas.
+# parser_list, path_to_gs, path_to_output, jobs, prefetch: see get_parser_data
+# deltas: list of deltas, by default 0.5 to 1 in steps of 0.01
+# Returns a dict with the curves of the fields of each parser.
+def sweep_values(parser_list, path_to_gs, path_to_output, deltas=None, jobs=1, prefetch=0) -> dict:
+    output = {}
+    for parser in parser_list:
+        sweep = ThresholdSweep()
+        for record in iter_file_data(os.path.join(path_to_output, parser), parser, path_to_gs, jobs=jobs,
+                                     prefetch=prefetch, sweep=True):
+            sweep.update(record['sweep'])
+        output[parser] = sweep.curves(deltas)
+    return output
+
+
+# export the evaluation results as tidy tables in Parquet or CSV format (chosen by file extension, see
+# export_tables.write_table) instead of the nested diagnostics dict
+# parser_list, path_to_gs, path_to_output, stream, jobs, prefetch: see get_parser_data
+# files_path: path of the table with one row per parser, file and metric category
+# pairs_path: optional path of the table with one row per aligned reference pair and the outcome of each field. When
+#             a stream is used, it must have been written with reference pairs.
+def export_results(parser_list, path_to_gs, path_to_output, files_path, pairs_path=None, stream=None, jobs=1,
+                   prefetch=0):
+    import export_tables
+    records = []
+    for parser in parser_list:
+        for record in _file_records(parser, path_to_gs, path_to_output, stream, pairs_path is not None, jobs,
+                                    prefetch):
+            del record['diagnostic']  # the tables are built from the counters and pairs only
+            records.append(record)
+    export_tables.write_table(export_tables.file_table(records), files_path)
+    if pairs_path is not None:
+        export_tables.write_table(export_tables.pair_table(records), pairs_path)
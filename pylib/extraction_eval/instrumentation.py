@@ -0,0 +1,97 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+
+# opt-in collector for stage timings, call counters and cache statistics of an evaluation run.
+# Only one collector can be active at a time. Instrumented code checks `instrumentation.active` before doing any work,
+# so that a disabled run pays no more than a module attribute lookup per call site.
+active = None
+
+_disabled = nullcontext()
+
+
+class Instrumentation:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # stage name -> [number of calls, cumulated wall time]
+        self.files = {}  # file name -> wall time
+        self.counters = {}  # counter name -> number of calls
+        self.caches = {}  # cache name -> [hits, misses]
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+
+    @contextmanager
+    def file(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.files[name] = self.files.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def cache(self, name, hit):
+        entry = self.caches.setdefault(name, [0, 0])
+        entry[0 if hit else 1] += 1
+
+    # returns the collected data as a json-serializable dict. Stages may be nested (e.g. 'similarity' runs inside
+    # 'compare_meta'), their times are therefore inclusive and do not add up to the total.
+    def report(self) -> dict:
+        caches = {}
+        for name, (hits, misses) in self.caches.items():
+            caches[name] = {'hits': hits, 'misses': misses,
+                            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0}
+        return {
+            'total': round(time.perf_counter() - self.started, 6),
+            'stages': {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                       for name, (calls, seconds) in self.stages.items()},
+            'files': {name: round(seconds, 6) for name, seconds in self.files.items()},
+            'counters': dict(self.counters),
+            'caches': caches
+        }
+
+
+# activate a new collector for the duration of the with-block and yield it
+@contextmanager
+def collect():
+    global active
+    previous = active
+    active = Instrumentation()
+    try:
+        yield active
+    finally:
+        active = previous
+
+
+# context manager timing a stage if instrumentation is active, a no-op otherwise
+def stage(name):
+    if active is None:
+        return _disabled
+    return active.stage(name)
+
+
+# context manager timing a single file if instrumentation is active, a no-op otherwise
+def file(name):
+    if active is None:
+        return _disabled
+    return active.file(name)
+
+
+def count(name, n=1):
+    if active is not None:
+        active.count(name, n)
+
+
+def cache(name, hit):
+    if active is not None:
+        active.cache(name, hit)
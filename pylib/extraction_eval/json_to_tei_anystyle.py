@@ -2,9 +2,11 @@ import json as JS
 from lxml.etree import QName
 from lxml import etree
 import os.path
-from generate_new_xml import generate_xml, get_time, add_to_xml
+from generate_new_xml import create_root, generate_xml, get_time, add_to_xml
 from retrieve_jats_metadata import create_standard_reference
 import sys
+import corpus_io
+import tracing
 
 
 # to be fixed once we figure out how to move (currently interpreted venue as title) at the time
@@ -109,46 +111,90 @@ def add_listbibl(tree, cit_id, metadata_list, analytic_var, series_var, type):
     create_citation(metadata_list, analyt_node, mono_node, imprint_node, series_node)
 
 
-def anystyle_parser(infile, outfile):
-    print(infile)
+# convert an AnyStyle/CSL-JSON file into a TEI tree in memory
+# allow_empty: if true, a file without references gives a tree with an empty <listBibl> instead of a RuntimeError
+def anystyle_tree(infile, allow_empty=False):
     try:
-        generate_xml(outfile)
-        pub_list = ['article', 'chapter', 'paper-conference']  # cases in which analytic node is created
-
         # load the file and check if there are references in list
-        with open(infile, encoding="utf8") as json_file:
+        with corpus_io.open_input(infile) as json_file:
             data = JS.load(json_file)
-            if len(data):
-                pass
-                # print("references: ", data)
-            else:
-                raise RuntimeError("No bibliographic section found")
-
-            # check and list the metadata present in the input json file
-            outtree = etree.parse(outfile)
-            for ref in data:
-                all_meta = []
-                analytic_var, series_var = False, False
-                keys = ref.keys()
-                for field in keys:
-                    # check if the reference type allows to create the analytic section or not
-                    if field == 'type' and ref[field] in pub_list:
-                        analytic_var = True
-                    # separate the metadata so that in the creation phase they are ready to be analysed
-                    elif field != 'type':
-                        if field == 'collection-title':
-                            series_var = True
-                        if type(ref[field]) is list:
-                            for value in ref[field]:
-                                all_meta.append((field, value))
-                        elif ref[field]:
-                            all_meta.append((field, ref[field]))
-                        # the fields, if not present should not be identified, else counted as an empty data
-                        else:
-                            all_meta.append((field, ""))
-                add_listbibl(outtree, data.index(ref), all_meta, analytic_var, series_var, ref['type'])
-
-        add_to_xml(outtree, outfile)
+        return references_tree(data, allow_empty)
 
     except FileNotFoundError:
         raise FileExistsError(f"File '{infile}' does not exist.")
+
+
+# convert a list of AnyStyle/CSL-JSON references into a TEI tree in memory (allow_empty: see anystyle_tree)
+def references_tree(data, allow_empty=False):
+    tree = etree.ElementTree(create_root())
+    pub_list = ['article', 'chapter', 'paper-conference']  # cases in which analytic node is created
+
+    if len(data):
+        pass
+        # print("references: ", data)
+    elif not allow_empty:
+        raise RuntimeError("No bibliographic section found")
+
+    # check and list the metadata present in the input json file
+    for ref in data:
+        all_meta = []
+        analytic_var, series_var = False, False
+        keys = ref.keys()
+        for field in keys:
+            # check if the reference type allows to create the analytic section or not
+            if field == 'type' and ref[field] in pub_list:
+                analytic_var = True
+            # separate the metadata so that in the creation phase they are ready to be analysed
+            elif field != 'type':
+                if field == 'collection-title':
+                    series_var = True
+                if type(ref[field]) is list:
+                    for value in ref[field]:
+                        all_meta.append((field, value))
+                elif ref[field]:
+                    all_meta.append((field, ref[field]))
+                # the fields, if not present should not be identified, else counted as an empty data
+                else:
+                    all_meta.append((field, ""))
+        add_listbibl(tree, data.index(ref), all_meta, analytic_var, series_var, ref['type'])
+    return tree
+
+
+# convert an AnyStyle/CSL-JSON file into a TEI file. If the input cannot be converted, an empty document is written.
+# The input may be compressed or the member of an archive (see corpus_io). Returns the number of references.
+def anystyle_parser(infile, outfile):
+    tracing.emit('info', 'anystyle_parser', file=infile)
+    generate_xml(outfile)
+    tree = anystyle_tree(infile)
+    add_to_xml(tree, outfile)
+    return len(tree.getroot()[0][0])
+
+
+# convert the AnyStyle/CSL-JSON files in in_dir, which may be gzip- or zstd-compressed, to TEI files in out_dir.
+# Existing TEI files are only converted again if overwrite is true. Files that cannot be converted are reported on
+# stderr and skipped.
+# progress: optional progress.Progress to which every converted file is reported with the number of its references
+def convert_directory(in_dir, out_dir, overwrite=False, progress=None):
+    tasks = []
+    for name in sorted(os.listdir(in_dir)):
+        stem = name
+        for suffix in corpus_io.compression_suffixes:
+            if stem.endswith(suffix):
+                stem = stem[:-len(suffix)]
+        if not stem.endswith('.json'):
+            continue
+        outfile = os.path.join(out_dir, stem[:-len('.json')] + '.xml')
+        if overwrite or not os.path.exists(outfile):
+            tasks.append((os.path.join(in_dir, name), outfile))
+    if progress is not None:
+        progress.start('conversion', in_dir, len(tasks))
+    for infile, outfile in tasks:
+        references = 0
+        try:
+            references = anystyle_parser(infile, outfile)
+        except Exception as err:
+            sys.stderr.write(f"{err}\n")
+        if progress is not None:
+            progress.update(os.path.basename(infile), references)
+    if progress is not None:
+        progress.finish()
@@ -0,0 +1,48 @@
+import argparse
+import json
+import sys
+import get_evaluation_metrics as gem
+
+
+# command line to combine the results of an evaluation that has been split into shards, e.g. on several machines:
+#
+#   python evaluate.py --gold data/gold --output data/output --shard 1/2 --format jsonl --out shard-1.jsonl
+#   python evaluate.py --gold data/gold --output data/output --shard 2/2 --format jsonl --out shard-2.jsonl
+#   python merge.py shard-1.jsonl shard-2.jsonl --out results.json
+#
+# The result is the one of get_evaluation_metrics.compute_values for all files, or with --diagnostic the one of
+# get_parser_data(..., diagnostic=True), which requires shards written with --diagnostics file. Exit codes: 0 on
+# success, 1 if the shards cannot be merged, 2 on invalid arguments.
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description="Merge the JSON Lines results of evaluation shards.")
+    parser.add_argument('shards', nargs='+', help="JSON Lines files with the file records of the shards")
+    parser.add_argument('--parsers', nargs='+', help="names of the parsers to include (default: all)")
+    parser.add_argument('--diagnostic', action='store_true', help="output file-level diagnostics instead of scores")
+    parser.add_argument('--out', default='-', help="result file, '-' for standard output (default)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = create_argument_parser().parse_args(argv)
+    try:
+        if args.diagnostic:
+            result = dict(gem.merge_parser_data(args.shards, args.parsers, diagnostic=True))
+        else:
+            result = gem.merge_values(args.shards, args.parsers)
+    except (OSError, ValueError, KeyError) as err:
+        sys.stderr.write(f"Merging failed: {err.__class__.__name__}: {err}\n")
+        return 1
+    if args.out == '-':
+        json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+    else:
+        with open(args.out, 'w', encoding='utf8') as out:
+            json.dump(result, out, indent=2, ensure_ascii=False)
+            out.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,103 +1,185 @@
-from nltk.tokenize import word_tokenize
 import string
-from similarity.normalized_levenshtein import NormalizedLevenshtein
+import instrumentation
+import tracing
+import verdict_cache
+from typed_compare import is_numeric, compare_typed
 
 
-normalized_levenshtein = NormalizedLevenshtein()
+# how dates, volumes, issues and pages are compared by eval_field: 'typed' parses them into years, numbers and page
+# ranges and compares these numerically (see typed_compare), 'string' uses the Levenshtein similarity of the cleaned
+# strings like all other fields, which reproduces the results published before the typed comparison was introduced
+numeric_modes = ['typed', 'string']
+numeric_mode = 'typed'
+
+
+def set_numeric_mode(mode):
+    global numeric_mode
+    if mode not in numeric_modes:
+        raise ValueError(f"Unknown numeric mode '{mode}', use one of {', '.join(numeric_modes)}.")
+    numeric_mode = mode
+
+
+def get_numeric_mode():
+    return numeric_mode
+
+
+# nltk and strsim are slow to import, they are loaded on first use by the two functions below
+_word_tokenize = None
+_normalized_levenshtein = None
+
+
+def word_tokenize(text):
+    global _word_tokenize
+    if _word_tokenize is None:
+        from nltk.tokenize import word_tokenize as _word_tokenize
+    return _word_tokenize(text)
+
+
+def get_normalized_levenshtein():
+    global _normalized_levenshtein
+    if _normalized_levenshtein is None:
+        from similarity.normalized_levenshtein import NormalizedLevenshtein
+        _normalized_levenshtein = NormalizedLevenshtein()
+    return _normalized_levenshtein
+
+
+# normalized Levenshtein similarity of two values. All comparisons in eval_field go through this function so that they
+# can be counted and timed when instrumentation is enabled.
+def similarity(s0, s1):
+    if instrumentation.active is None:
+        return get_normalized_levenshtein().similarity(s0, s1)
+    instrumentation.active.count('similarity')
+    with instrumentation.active.stage('similarity'):
+        return get_normalized_levenshtein().similarity(s0, s1)
 
 
 # this function is called by get_evaluation_metric with the purpose of comparing the values of the output and the ones
 # of the gold standard.
 # input: tuples list with gold standard values (l1), tuples list with output values (l2), type of publication
 # output: boolean stating if the two references are the same
+# The verdicts are cached by the content of l1 and l2 (see verdict_cache).
 def compare_meta(l1, l2, type):
-    print(f"Compare meta '{l1}' with '{l2}' in {type}")
-    val = False
-    new_l1, new_l2 = [], []
-
-    # clean the dict contents
-    count = 0
-    while count < 2:
-        for tup in [l1, l2][count]:
-            sec_pos = []
-            for occur in tup[1]:
-                if isinstance(occur, list):
-                    n_l = []
-                    for el in occur:
-                        r = match_content(el, tup[0])
-                        if isinstance(r, list):
-                            n_l.extend(r)
-                        else:
-                            n_l.append(r)
-                    # [new_l1, new_l2][count].append((tup[0], n_l))
-                    sec_pos.append(n_l)
-                else:
-                    # [new_l1, new_l2][count].append((tup[0], match_content(tup[1], tup[0])))
-                    sec_pos.append(match_content(occur, tup[0]))
-
-            [new_l1, new_l2][count].append((tup[0], sec_pos))
-        count += 1
-
-    # direct check if all the key-values pair are exactly the same
-    if new_l1 == new_l2:
-        val = True
-        reject_l = None
+    cache = verdict_cache.active
+    if cache is None:
+        val, reject_l = _compare_meta(l1, l2, type)
     else:
-        res, check = 0, 0
-        # check if there are the minimum metadata in common, else they are different and val goes False (unless it is
-        # title which represents an exception)
-        keys1 = set([tup[0] for tup in l1])
-        keys2 = set([tup[0] for tup in l2])
-        if keys1 == keys2 and not (type == 'article' or type == 'newspaper'):
-            check += 1
-            reject_l = None
-            for key in keys1:
-                res += eval_field(
-                    {key: [f[1] for f in new_l1 if f[0] == key][0]},
-                    {key: [f[1] for f in new_l2 if f[0] == key][0]}
-                )
-
-        elif type == 'article' or type == 'newspaper':
-            check += 1
-            # if 'monogr-title' in keys1 and not 'monogr-title' in keys2:
-            if ('date' in keys1 and not 'date' in keys2) or ('monogr-title' in keys1 and not 'monogr-title' in keys2) \
-                    and not ('analytic-title' in keys2 or ('biblScope_unit_volume' in keys2 and 'biblScope_unit_page' in keys2)):
-                res += 1
-                reject_l = None
-            else:
-                eval_l = []
-                reject_l = []  # counter for article title and volume-pages
-                # use keys2 since not all the metadata of keys1 are necessarily present in keys2 (the contrary is true)
-                for key in keys2:
-                    res = 0
-                    res += eval_field(
-                        {key: [f[1] for f in new_l1 if f[0] == key][0]},
-                        {key: [f[1] for f in new_l2 if f[0] == key][0]}
-                    )
-                    # if before the last item there is already one wrong, it makes no sense to continue searching
-                    if (key == 'date' or key == 'monogr-title') and res == 1:
-                        break
-                    elif (key == 'analytic-title' or 'volume' in key or 'page' in key) and res == 1:
-                        if 'analytic-title' in reject_l or ('volume' in reject_l and 'page' in reject_l) or \
-                                (not 'analytic-title' in keys2 and ('volume' in reject_l or 'page' in reject_l)):
-                            break
-                        else:
-                            reject_l.append(key)
-                    else:
-                        eval_l.append(key)
+        key = verdict_cache.verdict_key(l1, l2, type, (numeric_mode,))
+        cached = cache.get(key)
+        instrumentation.cache('verdicts', cached is not None)
+        if cached is None:
+            val, reject_l = _compare_meta(l1, l2, type)
+            cache.put(key, (val, list(reject_l) if reject_l is not None else None))
         else:
-            reject_l = None
+            val, reject_l = cached[0], (list(cached[1]) if cached[1] is not None else None)
+    if tracing.active is not None:
+        tracing.active.emit('debug', 'compare_meta', type=type, gold=l1, output=l2, result=val, rejected=reject_l)
+    return val, reject_l
 
-        if check == 1 and res == 0:
-            val = True
 
-    print(f"{val} ~~~ {reject_l}")
-    return val, reject_l
+# The fields are cleaned and compared only when they are needed, cheapest and most discriminating first (see
+# _field_cost), and the comparison stops as soon as the verdict is certain. The verdicts are the same as those of
+# cleaning and comparing every field; the rejected fields are only listed for accepted references, rejected references
+# return None.
+def _compare_meta(l1, l2, type):
+    instrumentation.count('compare_meta')
+    records = _LazyRecords(l1, l2)
+
+    # direct check if all the key-values pair are exactly the same
+    if records.identical():
+        return True, None
+
+    # check if there are the minimum metadata in common, else they are different (unless it is title which represents
+    # an exception)
+    keys1 = set([tup[0] for tup in l1])
+    keys2 = set([tup[0] for tup in l2])
+    if keys1 == keys2 and not (type == 'article' or type == 'newspaper'):
+        # every field has to match
+        for key in sorted(keys1, key=_field_cost):
+            if records.mismatch(key):
+                return False, None
+        return True, None
+
+    elif type == 'article' or type == 'newspaper':
+        # if 'monogr-title' in keys1 and not 'monogr-title' in keys2:
+        if ('date' in keys1 and not 'date' in keys2) or ('monogr-title' in keys1 and not 'monogr-title' in keys2) \
+                and not ('analytic-title' in keys2 or ('biblScope_unit_volume' in keys2 and 'biblScope_unit_page' in keys2)):
+            return False, None
+        # use keys2 since not all the metadata of keys1 are necessarily present in keys2 (the contrary is true). The
+        # fields are compared in a fixed order, so that the verdict does not depend on the iteration order of the set.
+        # The date, the monograph title and any other field have to match, while the analytic title, the volume and
+        # the pages are tolerated to differ: the analytic title alone, or the volume and/or the pages if the analytic
+        # title matches; without analytic title, only one of volume and pages.
+        tolerated = [key for key in sorted(keys2, key=_field_cost)
+                     if key == 'analytic-title' or 'volume' in key or 'page' in key]
+        for key in sorted(keys2.difference(tolerated), key=_field_cost):
+            if records.mismatch(key):
+                return False, None
+        reject_l = []  # the tolerated fields that differ
+        for key in tolerated:
+            if records.mismatch(key):
+                reject_l.append(key)
+                if len(reject_l) > 1 and ('analytic-title' in reject_l or 'analytic-title' not in keys2):
+                    return False, None
+        return True, reject_l
+
+    return False, None
+
+
+# the order in which the fields are compared: years first, then volumes, issues and pages, then identifiers and the
+# other short fields, then titles. Years and numbers are cheap to clean and compare and reject most of the candidate
+# references, titles are tokenized and compared with the Levenshtein distance.
+def _field_cost(field):
+    if field == 'date':
+        return 0, field
+    if 'volume' in field or 'issue' in field:
+        return 1, field
+    if 'page' in field:
+        return 2, field
+    if 'title' in field:
+        return 4, field
+    return 3, field
+
+
+# the gold standard record l1 and the output record l2 of compare_meta, whose occurrences are cleaned by match_content
+# when a field is first compared
+class _LazyRecords:
+
+    def __init__(self, l1, l2):
+        self.records = (l1, l2)
+        self._cleaned = ({}, {})  # position in the record -> cleaned occurrences
+        self._mismatch = {}  # field -> result of eval_field
+
+    # the cleaned occurrences of the n-th field of the record (0: gold standard, 1: output)
+    def cleaned(self, side, n):
+        cleaned = self._cleaned[side].get(n)
+        if cleaned is None:
+            field, occurrences = self.records[side][n]
+            cleaned = self._cleaned[side][n] = [clean_occurrence(occur, field) for occur in occurrences]
+        return cleaned
+
+    # whether both records have the same fields in the same order with the same cleaned occurrences
+    def identical(self):
+        l1, l2 = self.records
+        if len(l1) != len(l2) or any(f1[0] != f2[0] or len(f1[1]) != len(f2[1]) for f1, f2 in zip(l1, l2)):
+            return False
+        for n in sorted(range(len(l1)), key=lambda n: _field_cost(l1[n][0])):
+            if self.cleaned(0, n) != self.cleaned(1, n):
+                return False
+        return True
+
+    # eval_field of the first occurrence of the field in both records: 0 if they match, 1 otherwise
+    def mismatch(self, key):
+        result = self._mismatch.get(key)
+        if result is None:
+            n1 = [n for n, f in enumerate(self.records[0]) if f[0] == key][0]
+            n2 = [n for n, f in enumerate(self.records[1]) if f[0] == key][0]
+            result = self._mismatch[key] = eval_field({key: self.cleaned(0, n1)}, {key: self.cleaned(1, n2)})
+        return result
 
 
 # function to compare single output and gold standard values
 def compare_single(t1, t2, type, parser_name):
-    print(f"Compare single '{t1}' with '{t2}' in {type}")
+    instrumentation.count('compare_single')
     out_l = []
     # select both the terms singularly
     for t in [t1, t2]:
@@ -121,15 +203,20 @@ def compare_single(t1, t2, type, parser_name):
             else:
                 out_l.append(match_content(t, type))
 
-    if eval_field({type: [out_l[0]]}, {type: [out_l[1]]}) == 0:
-        print('True')
-        return True
-    else:
-        print('False')
-        return False
+    result = eval_field({type: [out_l[0]]}, {type: [out_l[1]]}) == 0
+    if tracing.active is not None:
+        tracing.active.emit('debug', 'compare_single', type=type, gold=t1, output=t2, result=result)
+    return result
 
 
 def match_content(t, type):
+    if instrumentation.active is None:
+        return _match_content(t, type)
+    with instrumentation.active.stage('match_content'):
+        return _match_content(t, type)
+
+
+def _match_content(t, type):
     if t is not None and len(t):
         if type == 'biblScope_unit_page':
             out = clean_pages(t)
@@ -207,15 +294,15 @@ def clean_pages(t):
 # The function takes every value of the list and compares it to the value of the gold standard. If one of them is true
 # it returns 0.
 def eval_field(d1, d2):
-    # definition of the deltas
-    delta = 1  # valid for DOIs and dates
     keys = list(d1.keys())
-    if 'title' in keys[0] or 'note' in keys or 'surname' in keys or 'forename' in keys or 'publisher' in keys:
-        delta = 0.85
-    if 'volume' in keys[0] or 'issue' in keys[0] or 'page' in keys[0] or 'idno_type_docNumber' in keys:
-        delta = 0.9
-    if 'ref' in keys:
-        delta = 0.95
+    delta = field_delta(keys[0])
+
+    # numeric fields are compared as numbers if both sides can be parsed
+    if numeric_mode == 'typed' and is_numeric(keys[0]):
+        instrumentation.count('typed_compare')
+        found = compare_typed(keys[0], d1[keys[0]], d2[keys[0]])
+        if found is not None:
+            return found
 
     # return 0 if the two items are the same, otherwise 1
     # specifica per le note
@@ -224,8 +311,8 @@ def eval_field(d1, d2):
     if keys[0] == 'date':
         for date1 in d1[keys[0]]:
             for date2 in d2[keys[0]]:
-                if normalized_levenshtein.similarity(date1[0], date2[0]) >= delta or \
-                        normalized_levenshtein.similarity(date1[1], date2[1]) >= delta:
+                if similarity(date1[0], date2[0]) >= delta or \
+                        similarity(date1[1], date2[1]) >= delta:
                     found = 0
                     break
 
@@ -235,17 +322,17 @@ def eval_field(d1, d2):
                 if '10.' in doi1 and '10.' in doi2:
                     suffix1 = doi1.split('10.')[1]
                     suffix2 = doi2.split('10.')[1]
-                    if normalized_levenshtein.similarity(suffix1, suffix2) >= delta:
+                    if similarity(suffix1, suffix2) >= delta:
                         prefix1 = doi1.split('10.')[0]
                         prefix2 = doi2.split('10.')[0]
-                        if normalized_levenshtein.similarity(prefix1, prefix2) >= delta:
+                        if similarity(prefix1, prefix2) >= delta:
                             found = 0
 
         '''elif 'monographic-title' in keys[0]:
             tit2 = d2[keys[0]]
             tit1 = d1[keys[0]]
             if len(tit1.split(' ')) == len(tit2.split(' ')):
-                if normalized_levenshtein.similarity(i1, i2) >= delta:
+                if similarity(i1, i2) >= delta:
                     found = 0'''
 
     elif 'page' in keys[0] and (len(d1[keys[0]]) and len(d2[keys[0]])) and (len(d1[keys[0]][0]) != len(d2[keys[0]][0])):
@@ -255,7 +342,7 @@ def eval_field(d1, d2):
             a, b = d1[keys[0]], d2[keys[0]]
         for i2 in a[0]:
             for i1 in b[0]:
-                if normalized_levenshtein.similarity(i1, i2) >= delta:
+                if similarity(i1, i2) >= delta:
                     found = 0
                     break
 
@@ -264,21 +351,77 @@ def eval_field(d1, d2):
         for i1 in d1[keys[0]]:
             for i2 in d2[keys[0]]:
                 try:
-                    if normalized_levenshtein.similarity(i1[0], i2[0]) >= delta:
+                    if similarity(i1[0], i2[0]) >= delta:
                         found = 0
                 except IndexError:
-                    print(d1, d2)
+                    if tracing.active is not None:
+                        tracing.active.emit('warning', 'empty_forename', gold=d1, output=d2)
                     found = 1
 
     else:  # per titoli e nomi
         for i1 in d1[keys[0]]:
             for i2 in d2[keys[0]]:
-                if normalized_levenshtein.similarity(i1, i2) >= delta:
+                if similarity(i1, i2) >= delta:
                     found = 0
 
     return found
 
 
+# one occurrence of a field cleaned like compare_meta cleans it: lists are cleaned element by element and flattened
+def clean_occurrence(occur, field):
+    if not isinstance(occur, list):
+        return match_content(occur, field)
+    cleaned = []
+    for el in occur:
+        r = match_content(el, field)
+        if isinstance(r, list):
+            cleaned.extend(r)
+        else:
+            cleaned.append(r)
+    return cleaned
+
+
+# the minimum similarity for two values of the field to be the same
+def field_delta(field):
+    delta = 1  # valid for DOIs and dates
+    if 'title' in field or field in ['note', 'surname', 'forename', 'publisher']:
+        delta = 0.85
+    if 'volume' in field or 'issue' in field or 'page' in field or field == 'idno_type_docNumber':
+        delta = 0.9
+    if field == 'ref':
+        delta = 0.95
+    return delta
+
+
+# the similarity of a single occurrence of the field in the gold standard (v1) and in the output (v2), both cleaned by
+# match_content, as a number between 0 and 1 such that eval_field({field: [v1]}, {field: [v2]}) is 0 if and only if
+# it is at least field_delta(field). Typed comparisons of numeric fields are either 1 or 0.
+def field_similarity(field, v1, v2):
+    if numeric_mode == 'typed' and is_numeric(field):
+        found = compare_typed(field, [v1], [v2])
+        if found is not None:
+            return 1.0 - found
+    try:
+        if field == 'date':
+            first = similarity(v1[0], v2[0])
+            if len(v1) < 2 or len(v2) < 2:
+                return first
+            return max(first, similarity(v1[1], v2[1]))
+        if 'DOI' in field:
+            if '10.' not in v1 or '10.' not in v2:
+                return 0.0
+            prefix1, suffix1 = v1.split('10.')[:2]
+            prefix2, suffix2 = v2.split('10.')[:2]
+            return min(similarity(suffix1, suffix2), similarity(prefix1, prefix2))
+        if 'page' in field and len(v1) and len(v2) and len(v1) != len(v2):
+            return max(similarity(i1, i2) for i1 in v1 for i2 in v2)
+        if 'forename' in field:
+            return similarity(v1[0], v2[0])
+    except IndexError:
+        return 0.0
+    return similarity(v1, v2)
+
+
 '''clean_contents('This is a long text.')
 clean_contents('This shoul%d be a "title" for some peèople.')
 clean_contents("Mordivoi, scifonai, non vi avessi visto mai!")
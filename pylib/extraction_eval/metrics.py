@@ -0,0 +1,107 @@
+import numpy as np
+
+
+# vectorized computation of precision, recall and f-score from the per-file counters of get_evaluation_metrics.
+# The counters of a parser are stored as an integer array with one row per file and the nine columns
+# ref_tot_gs, ref_tot_out, ref_tot_corr, meta_tot_gs, meta_tot_out, meta_tot_corr, text_tot_gs, text_tot_out,
+# text_tot_corr, so that all three categories are computed at once. Unlike create_json and compute_values, the values
+# are not rounded.
+
+categories = ['references', 'metadata', 'content']
+measures = ['precision', 'recall', 'f-score']
+
+
+# build the files x 9 counter array from file records as yielded by get_evaluation_metrics.iter_file_data.
+# Returns the list of file names and the array.
+def counter_matrix(records):
+    names, rows = [], []
+    for record in records:
+        names.append(record['file'])
+        rows.append(record['values'])
+    return names, np.array(rows, dtype=np.int64).reshape(len(rows), 9)
+
+
+# precision, recall and f-score from counters of shape (..., 9); returns an array of shape (..., 3 categories,
+# 3 measures). As in create_json, a measure is 0 if its denominator is 0.
+def prf(counters):
+    counters = np.asarray(counters, dtype=np.float64)
+    triples = counters.reshape(counters.shape[:-1] + (3, 3))
+    gs, out, corr = triples[..., 0], triples[..., 1], triples[..., 2]
+    precision = np.divide(corr, out, out=np.zeros_like(corr), where=out != 0)
+    recall = np.divide(corr, gs, out=np.zeros_like(corr), where=gs != 0)
+    total = precision + recall
+    f_score = np.divide(2 * precision * recall, total, out=np.zeros_like(total), where=total != 0)
+    return np.stack([precision, recall, f_score], axis=-1)
+
+
+# micro-averaged measures (computed from the summed counters) and macro-averaged measures (mean of the file-level
+# measures) of a files x 9 counter array, as two arrays of shape (3 categories, 3 measures)
+def averages(matrix):
+    matrix = np.asarray(matrix)
+    if not len(matrix):
+        return np.zeros((3, 3)), np.zeros((3, 3))
+    return prf(matrix.sum(axis=0)), prf(matrix).mean(axis=0)
+
+
+# document-level bootstrap: resample the files of the counter array with replacement n_resamples times and return
+# the micro- and macro-averaged measures of every resample, as two arrays of shape (n_resamples, 3, 3). The resamples
+# are drawn as multinomial file weights and evaluated batch_size at a time by matrix products.
+def bootstrap(matrix, n_resamples=2000, seed=0, batch_size=500, rng=None):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = len(matrix)
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    file_prf = prf(matrix).reshape(n, 9)
+    micro, macro = [], []
+    done = 0
+    while done < n_resamples:
+        size = min(batch_size, n_resamples - done)
+        weights = rng.multinomial(n, np.full(n, 1 / n), size=size).astype(np.float64)
+        micro.append(prf(weights @ matrix))
+        macro.append((weights @ file_prf / n).reshape(size, 3, 3))
+        done += size
+    return np.concatenate(micro), np.concatenate(macro)
+
+
+# percentile confidence interval of bootstrap replicates along the first axis; returns (lower, upper)
+def percentile_interval(replicates, confidence=0.95):
+    alpha = (1 - confidence) / 2
+    return np.quantile(replicates, alpha, axis=0), np.quantile(replicates, 1 - alpha, axis=0)
+
+
+# point estimates and bootstrap confidence intervals for a files x 9 counter array, as a json-serializable dict:
+# {'files': n, 'references': {'micro': {'precision': x, ..., 'ci': {'precision': [lower, upper], ...}}, 'macro': ...}}
+# Without files or with n_resamples=0 no intervals are computed.
+def summarize(matrix, n_resamples=2000, confidence=0.95, seed=0) -> dict:
+    matrix = np.asarray(matrix)
+    estimates = dict(zip(['micro', 'macro'], averages(matrix)))
+    intervals = {}
+    if n_resamples and len(matrix):
+        for name, replicates in zip(['micro', 'macro'], bootstrap(matrix, n_resamples, seed)):
+            intervals[name] = percentile_interval(replicates, confidence)
+    output = {'files': int(len(matrix))}
+    for c, category in enumerate(categories):
+        output[category] = {}
+        for name, values in estimates.items():
+            entry = {measure: float(values[c, m]) for m, measure in enumerate(measures)}
+            if name in intervals:
+                lower, upper = intervals[name]
+                entry['ci'] = {measure: [float(lower[c, m]), float(upper[c, m])] for m, measure in enumerate(measures)}
+            output[category][name] = entry
+    return output
+
+
+# paired bootstrap of the difference between two parsers evaluated on the same files (rows in the same order):
+# returns the micro- and macro-averaged differences (a - b) and their confidence intervals, each of shape (3, 3)
+def compare(matrix_a, matrix_b, n_resamples=2000, confidence=0.95, seed=0):
+    matrix_a, matrix_b = np.asarray(matrix_a), np.asarray(matrix_b)
+    if matrix_a.shape != matrix_b.shape:
+        raise ValueError("Paired comparison requires counters for the same files.")
+    diff_micro, diff_macro = [a - b for a, b in zip(averages(matrix_a), averages(matrix_b))]
+    # the same seed draws the same resamples for both parsers
+    a_micro, a_macro = bootstrap(matrix_a, n_resamples, seed)
+    b_micro, b_macro = bootstrap(matrix_b, n_resamples, seed)
+    return {
+        'micro': (diff_micro, percentile_interval(a_micro - b_micro, confidence)),
+        'macro': (diff_macro, percentile_interval(a_macro - b_macro, confidence))
+    }
@@ -0,0 +1,90 @@
+import math
+import re
+from meta_eval import clean_occurrence, field_similarity
+
+
+# diagnostics for the output references that the alignment of get_single_data passes over without matching them to a
+# gold standard reference: for each of them, the k nearest gold standard references of the document and the similarity
+# of every field, to tell a reference that is missing from the gold standard from one that was parsed too badly to be
+# recognized (and in which fields).
+#
+# The candidates are not found by comparing every output reference with every gold standard reference. The gold
+# standard references of the document are indexed once by the words and numbers of their text; an output reference is
+# looked up with its own words, the gold standard references sharing the rarest words (idf-weighted) are taken as
+# candidates, and only these are compared field by field. The cost per unmatched reference therefore depends on the
+# number of its words and candidates, not on the size of the gold standard, so the diagnostics can stay on in
+# production runs.
+#
+# The score of a candidate is the mean of the best similarities (meta_eval.field_similarity) of the fields of the gold
+# standard reference to the same fields of the output reference; fields that the output reference does not have count
+# as 0 and are reported as None.
+
+_token = re.compile(r'[^\W_]+')
+
+
+# the index words of a text: lowercased words of at least 3 characters and numbers
+def index_tokens(text) -> set:
+    return set(t for t in _token.findall(text.lower()) if len(t) >= 3 or t.isdigit())
+
+
+class GoldIndex:
+
+    # refs: list of (reference id, reference text) tuples of the gold standard references of a document
+    def __init__(self, refs):
+        self.ids = [ref_id for ref_id, _ in refs]
+        self._postings = {}  # word -> indices of the references containing it
+        for n, (_, text) in enumerate(refs):
+            for token in index_tokens(text):
+                self._postings.setdefault(token, []).append(n)
+        self._idf = {token: math.log(1 + len(refs) / len(postings)) for token, postings in self._postings.items()}
+
+    # the indices of the (at most) n references sharing the highest idf-weighted sum of words with the text, best first
+    def lookup(self, text, n) -> list:
+        scores = {}
+        for token in index_tokens(text):
+            for ref in self._postings.get(token, ()):
+                scores[ref] = scores.get(ref, 0) + self._idf[token]
+        return sorted(scores, key=lambda ref: (-scores[ref], ref))[:n]
+
+
+class CandidateReport:
+
+    # k: number of nearest gold standard references reported per unmatched output reference
+    # pool: number of candidates taken from the index and compared field by field, by default max(3 * k, 10)
+    def __init__(self, k=3, pool=None):
+        self.k = k
+        self.pool = pool if pool is not None else max(3 * k, 10)
+        self.entries = []
+
+    # report an unmatched output reference
+    # output_ref: (index, id, text) of the output reference
+    # index: GoldIndex of the gold standard references of the document
+    # gold_fields: function returning the reference type and the fields (as returned by
+    #              get_evaluation_metrics.get_selected_elements) of the gold standard reference with the given index
+    # output_fields: function returning the fields of the output reference, given the fields to select
+    def record(self, output_ref, index, gold_fields, output_fields):
+        candidates = []
+        for ref in index.lookup(output_ref[2], self.pool):
+            ref_type, gs_fields = gold_fields(ref)
+            if not gs_fields:
+                continue
+            out_fields = dict(output_fields([field for field, _ in gs_fields]))
+            similarities = {field: _best_similarity(field, values, out_fields[field]) if field in out_fields else None
+                            for field, values in gs_fields}
+            score = sum(s or 0 for s in similarities.values()) / len(similarities)
+            candidates.append({'gold_id': index.ids[ref], 'type': ref_type, 'score': round(score, 4),
+                               'fields': {field: None if s is None else round(s, 4)
+                                          for field, s in similarities.items()}})
+        candidates.sort(key=lambda c: -c['score'])
+        self.entries.append({'output': output_ref[0], 'output_id': output_ref[1], 'text': output_ref[2],
+                             'candidates': candidates[:self.k]})
+
+    def to_list(self) -> list:
+        return self.entries
+
+
+# the best similarity of any cleaned occurrence of the field in the gold standard to any in the output
+def _best_similarity(field, gs_values, out_values):
+    gs_values = [clean_occurrence(v, field) for v in gs_values]
+    out_values = [clean_occurrence(v, field) for v in out_values]
+    return max((field_similarity(field, v1, v2) for v1 in gs_values for v2 in out_values), default=0.0)
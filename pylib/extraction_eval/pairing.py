@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import corpus_io
+
+
+# pairing of gold standard and parser output files. Files are paired by their stem, i.e. their name without the
+# suffixes in stem_suffixes ('doc1.xml' and 'doc1.json' are both 'doc1'), through an index of the output files, so that
+# the pairing does not depend on the order of directory listings. The directories may also be tar or zip archives and
+# the files may be compressed (see corpus_io); the output "directory" of a parser can be an archive named after the
+# parser, e.g. 'AnyStyle.tar.gz' instead of 'AnyStyle'. Alternatively, a manifest lists the gold standard file of every
+# document and the output file of every parser, wherever they are, e.g.
+#
+#   [{"gold": "gold/doc1.json", "outputs": {"AnyStyle": "anystyle/doc1.json", "Grobid": "grobid/doc1.tei.xml"}}, ...]
+#
+# Relative paths are relative to the directory of the manifest. Paths can also be compressed files or archive members,
+# e.g. "batch-1.tar.gz::gold/doc1.json". A gold standard file without output is paired with None, so that it can be
+# counted as missing instead of failing the evaluation.
+
+stem_suffixes = ['.xml', '.json', '.tei', '.gz', '.zst']
+
+
+# the name of the file without its path and the suffixes in stem_suffixes
+def file_stem(name):
+    name = os.path.basename(name)
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in stem_suffixes:
+            if name.lower().endswith(suffix) and len(name) > len(suffix):
+                name = name[:-len(suffix)]
+                stripped = True
+    return name
+
+
+# whether path_to_gs is a manifest file rather than a directory or archive of gold standard files
+def is_manifest(path_to_gs):
+    return os.path.isfile(path_to_gs) and not corpus_io.is_archive(path_to_gs)
+
+
+# the directory or, if there is no such directory, the archive with the given path and one of the suffixes of
+# corpus_io.archive_suffixes
+def resolve_directory(path):
+    if not os.path.isdir(path):
+        for suffix in corpus_io.archive_suffixes:
+            if corpus_io.is_archive(path + suffix):
+                return path + suffix
+    return path
+
+
+# the entries of a manifest file as a list of (gold standard path, {parser name: output path}) tuples, with the paths
+# resolved. Raises a ValueError if the manifest is invalid.
+def load_manifest(path) -> list:
+    with open(path, encoding='utf8') as f:
+        entries = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    output = []
+    try:
+        for entry in entries:
+            outputs = {parser: os.path.join(base, out_path)
+                       for parser, out_path in (entry.get('outputs') or {}).items() if out_path}
+            output.append((os.path.join(base, entry['gold']), outputs))
+    except (KeyError, TypeError, AttributeError) as err:
+        raise ValueError(f"Invalid manifest '{path}': {err}") from err
+    return output
+
+
+# the names of the parsers that have outputs in the manifest, in alphabetical order
+def manifest_parsers(path) -> list:
+    return sorted(set(parser for _, outputs in load_manifest(path) for parser in outputs))
+
+
+# pair the output files of a parser with the gold standard files: returns a list of (file name, output file, gold
+# standard file) tuples, ordered by gold standard file name (in the order of an archive of gold standard files) or in
+# the order of the manifest. The files are read in this order, and the members of compressed tar archives are read
+# fastest in the order in which they are stored (see corpus_io): if the output files are in a compressed tar archive
+# and the gold standard files are not, the tuples follow the archive, with the gold standard files without output last.
+# The file name is the name of the output file, or of the gold standard file if the output is missing, in which case
+# the output file is None.
+# path: directory or archive of the output files of the parser (not used with a manifest)
+# path_to_gs: directory or archive of the gold standard files or manifest file (see above)
+# Output files without gold standard are reported on stderr and left out. Raises a ValueError if two documents have
+# the same file name.
+def pair_files(path, path_to_gs, parser_name=None) -> list:
+    if is_manifest(path_to_gs):
+        pairs = [(gs_file, outputs.get(parser_name)) for gs_file, outputs in load_manifest(path_to_gs)]
+    else:
+        outputs = {}
+        out_dir = resolve_directory(path)
+        stored = corpus_io.list_inputs(out_dir)
+        for name, out_path in stored:
+            outputs.setdefault(file_stem(name), []).append((name, out_path))
+        gold = corpus_io.list_inputs(path_to_gs)
+        if not corpus_io.is_archive(path_to_gs):
+            gold.sort()
+        pairs = []
+        for gs_name, gs_path in gold:
+            candidates = outputs.pop(file_stem(gs_name), [])
+            if len(candidates) > 1:
+                names = ', '.join(sorted(name for name, _ in candidates))
+                raise ValueError(f"More than one output file for '{gs_name}': {names}.")
+            pairs.append((gs_path, candidates[0][1] if candidates else None))
+        if outputs:
+            unmatched = sorted(name for names in outputs.values() for name, _ in names)
+            sys.stderr.write(f"Output files without gold standard: {', '.join(unmatched)}\n")
+        if corpus_io.is_sequential(out_dir) and not corpus_io.is_sequential(path_to_gs):
+            position = {out_path: n for n, (_, out_path) in enumerate(stored)}
+            pairs.sort(key=lambda pair: position.get(pair[1], len(position)))
+    tasks, names = [], set()
+    for gs_file, out_file in pairs:
+        name = os.path.basename(out_file if out_file is not None else gs_file)
+        if name in names:
+            raise ValueError(f"More than one document with the file name '{name}'.")
+        names.add(name)
+        tasks.append((name, out_file, gs_file))
+    return tasks
@@ -0,0 +1,94 @@
+import json
+import os
+import time
+
+
+# progress reporting for long conversion and evaluation runs: files and references processed, references per second,
+# estimated time to completion and number of worker processes. A Progress object is passed to the batch functions
+# (get_evaluation_metrics.get_parser_data, json_to_tei_anystyle.convert_directory), which report every finished file
+# to it. It hands the status to an optional callback after every file and writes it to an optional JSON status file at
+# most every `interval` seconds, e.g.
+#
+#   {"task": "evaluation", "label": "AnyStyle", "state": "running", "files_done": 120, "files_total": 400,
+#    "references": 5230, "references_per_second": 87.2, "elapsed": 60.0, "eta": 140.0, "workers": 4,
+#    "current_file": "doc120.xml", "started": 1700000000.0, "updated": 1700000060.0, "pid": 4242}
+#
+# The status file is replaced atomically, so that it can be read at any time. Since it is written when files finish,
+# an "updated" time much older than the slowest file indicates a stalled run.
+
+class Progress:
+
+    # callback: optional function called with the status dict after every file
+    # status_path: optional path of the JSON status file
+    # interval: minimum number of seconds between two writes of the status file
+    def __init__(self, callback=None, status_path=None, interval=5.0):
+        self.callback = callback
+        self.status_path = status_path
+        self.interval = interval
+        self._written = None
+        self.task = self.label = self.current_file = None
+        self.files_total = self.files_done = self.references = 0
+        self.workers = 1
+        self.state = 'running'
+        self.started = time.time()
+        self._clock = time.perf_counter()
+
+    # start reporting the progress of a batch of files_total files, e.g. the files of one parser
+    def start(self, task, label, files_total, workers=1):
+        self.task = task
+        self.label = label
+        self.files_total = files_total
+        self.workers = workers
+        self.files_done = 0
+        self.references = 0
+        self.current_file = None
+        self.state = 'running'
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self._report(force=True)
+
+    # a file of the batch has been processed, with the given number of references
+    def update(self, file_name, references=0):
+        self.files_done += 1
+        self.references += references
+        self.current_file = file_name
+        self._report()
+
+    # the batch is complete, or has failed if failed is true
+    def finish(self, failed=False):
+        self.state = 'failed' if failed else 'finished'
+        self._report(force=True)
+
+    def status(self) -> dict:
+        elapsed = time.perf_counter() - self._clock
+        remaining = max(0, self.files_total - self.files_done)
+        eta = None
+        if self.state != 'running':
+            eta = 0.0
+        elif self.files_done:
+            eta = round(elapsed / self.files_done * remaining, 1)
+        return {'task': self.task, 'label': self.label, 'state': self.state, 'files_done': self.files_done,
+                'files_total': self.files_total, 'references': self.references,
+                'references_per_second': round(self.references / elapsed, 2) if elapsed > 0 else 0.0,
+                'elapsed': round(elapsed, 1), 'eta': eta, 'workers': self.workers,
+                'current_file': self.current_file, 'started': self.started, 'updated': time.time(),
+                'pid': os.getpid()}
+
+    def _report(self, force=False):
+        if self.callback is None and self.status_path is None:
+            return
+        status = self.status()
+        if self.callback is not None:
+            self.callback(status)
+        if self.status_path is not None and \
+                (force or self._written is None or time.perf_counter() - self._written >= self.interval):
+            write_status(self.status_path, status)
+            self._written = time.perf_counter()
+
+
+# write the status dict to the JSON file at path, replacing it atomically
+def write_status(path, status):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf8') as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(temp_path, path)
@@ -0,0 +1,58 @@
+import json
+import os
+
+
+# append-only JSON Lines storage for the file records yielded by get_evaluation_metrics.iter_file_data.
+# Every record is written and flushed as soon as it arrives, so that an interrupted run loses at most the file that was
+# being evaluated and can be resumed by skipping the files that are already in the stream.
+
+
+# append the records to the JSON Lines file at path while passing them on to the consumer
+def write_jsonl(records, path):
+    _drop_partial_line(path)
+    with open(path, 'a', encoding='utf8') as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            file.flush()
+            yield record
+
+
+# yield the records stored in the JSON Lines file at path, optionally only those of the given parser.
+# A missing file is treated as an empty stream.
+def read_jsonl(path, parser_name=None):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf8') as file:
+        for line in file:
+            if not line.endswith('\n'):
+                break  # the last record of an interrupted run may be incomplete
+            record = json.loads(line)
+            if parser_name is None or record['parser'] == parser_name:
+                yield record
+
+
+# the names of the files of the given parser that are already in the stream
+def completed_files(path, parser_name) -> set:
+    return set(record['file'] for record in read_jsonl(path, parser_name))
+
+
+# remove an incomplete last line left behind by an interrupted run, so that appending starts on a fresh line. The file
+# is read backwards in blocks from its end up to the last line break, not as a whole.
+def _drop_partial_line(path, block_size=65536):
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            file.seek(start)
+            block = file.read(position - start)
+            if position == end and block.endswith(b'\n'):
+                return
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                file.truncate(start + newline + 1)
+                return
+            position = start
+        file.truncate(0)
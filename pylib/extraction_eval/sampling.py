@@ -0,0 +1,109 @@
+from statistics import NormalDist
+import numpy as np
+import metrics
+
+
+# stratified random sampling of documents for a fast approximate evaluation. The documents are divided into strata by
+# a category, such as the most frequent reference type of their gold standard, and by their size, such as the number
+# of references or the size of the gold standard file (size_bins bins of about the same number of documents), every
+# stratum is shuffled once with a fixed seed, and a sample of size n takes the first documents of every stratum in
+# proportion to the size of the stratum. Samples of increasing size are therefore nested and the documents evaluated
+# for a smaller sample are reused.
+#
+# The totals of the counters are estimated by weighting the documents of a stratum with (stratum size / documents
+# sampled from it). Precision, recall and f-score are ratios of these totals; their confidence intervals use the
+# linearized variance of a stratified ratio estimator with finite population correction, so that they shrink to zero
+# when all documents are sampled.
+
+# minimum number of documents sampled from a stratum (if it has as many), so that its variance can be estimated
+min_per_stratum = 2
+
+
+class StratifiedSample:
+
+    # names: document names, profiles: list of (category or None, size) of the documents
+    def __init__(self, names, profiles, size_bins=3, seed=0):
+        sizes = np.array([size for _, size in profiles], dtype=np.float64)
+        edges = []
+        if len(sizes) and size_bins > 1:
+            edges = np.unique(np.quantile(sizes, np.linspace(0, 1, size_bins + 1)[1:-1]))
+        strata = {}
+        for name, (ref_type, size) in zip(names, profiles):
+            label = (ref_type or 'unknown', int(np.searchsorted(edges, size, side='right')))
+            strata.setdefault(label, []).append(name)
+        rng = np.random.default_rng(seed)
+        self.strata = {label: [members[i] for i in rng.permutation(len(members))]
+                       for label, members in sorted(strata.items())}
+        self.population = len(names)
+
+    # the number of documents to sample from every stratum for a sample of about n documents: proportional to the size
+    # of the stratum with largest remainders, at least min_per_stratum and at most all documents of the stratum
+    def allocation(self, n) -> dict:
+        n = min(n, self.population)
+        quotas = {label: n * len(members) / self.population for label, members in self.strata.items()}
+        alloc = {label: min(len(self.strata[label]), max(min_per_stratum, int(quota)))
+                 for label, quota in quotas.items()}
+        remaining = n - sum(alloc.values())
+        order = sorted(quotas, key=lambda label: quotas[label] - int(quotas[label]), reverse=True)
+        while remaining > 0:
+            grown = False
+            for label in order:
+                if remaining > 0 and alloc[label] < len(self.strata[label]):
+                    alloc[label] += 1
+                    remaining -= 1
+                    grown = True
+            if not grown:
+                break
+        return alloc
+
+    # the names of the documents in the sample of about n documents, by stratum
+    def sample(self, n) -> dict:
+        return {label: self.strata[label][:size] for label, size in self.allocation(n).items()}
+
+    # estimated micro-averaged measures with confidence intervals from the counters of the sampled documents.
+    # sample: the result of sample(n), values: dict of document name -> list of the nine counters.
+    # Returns a json-serializable dict in the format of metrics.summarize (micro-averages only), plus the population
+    # size, the achieved sample size, the number of strata and the largest width of the f-score intervals.
+    def estimate(self, sample, values, confidence=0.95) -> dict:
+        groups = []  # (stratum size, counters of the sampled documents)
+        for label, names in sample.items():
+            if names:
+                matrix = np.array([values[name] for name in names], dtype=np.float64).reshape(len(names), 9)
+                groups.append((len(self.strata[label]), matrix))
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        output = {'files': self.population, 'sampled': sum(len(names) for names in sample.values()),
+                  'strata': len(self.strata), 'width': 0.0}
+        for c, category in enumerate(metrics.categories):
+            gs, out, corr = 3 * c, 3 * c + 1, 3 * c + 2
+            # all three measures are ratios of counter totals: f-score = 2 * correct / (gold + output)
+            ratios = {'precision': ([corr], [out]), 'recall': ([corr], [gs]), 'f-score': ([corr, corr], [gs, out])}
+            entry, intervals = {}, {}
+            for measure in metrics.measures:
+                estimate, error = _ratio(groups, *ratios[measure])
+                entry[measure] = estimate
+                intervals[measure] = [max(0.0, estimate - z * error), min(1.0, estimate + z * error)]
+            entry['ci'] = intervals
+            output[category] = entry
+            output['width'] = max(output['width'], intervals['f-score'][1] - intervals['f-score'][0])
+        return output
+
+
+# stratified ratio estimate of sum(numerator columns) / sum(denominator columns) and its standard error, computed by
+# linearization with finite population correction. groups: list of (stratum size, sampled counters) tuples.
+def _ratio(groups, numerator, denominator):
+    totals = [0.0, 0.0]
+    for size, matrix in groups:
+        weight = size / len(matrix)
+        totals[0] += weight * matrix[:, numerator].sum()
+        totals[1] += weight * matrix[:, denominator].sum()
+    if not totals[1]:
+        return 0.0, 0.0
+    ratio = totals[0] / totals[1]
+    variance = 0.0
+    for size, matrix in groups:
+        n = len(matrix)
+        if n < 2:
+            continue  # a single document gives no estimate of the variance of its stratum
+        residuals = matrix[:, numerator].sum(axis=1) - ratio * matrix[:, denominator].sum(axis=1)
+        variance += size ** 2 * (1 - n / size) * residuals.var(ddof=1) / n
+    return float(ratio), float(np.sqrt(variance) / totals[1])
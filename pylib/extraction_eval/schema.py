@@ -0,0 +1,89 @@
+import json
+
+
+# registry of the metadata fields that decide whether a gold standard and an output reference are the same, by
+# reference type. It is compiled once: every type maps to an immutable tuple of fields, and the fields of every
+# (parser, type) combination without the fields that the parser cannot identify are computed in advance, so that
+# looking them up does not depend on the order in which references and parsers are evaluated.
+
+# groups of types with the fields compared for them. A type that appears in more than one group uses the first one.
+default_types = [
+    (['article', 'newspaper', 'article-journal'],
+     ['date', 'monogr-title', 'analytic-title', 'biblScope_unit_volume', 'biblScope_unit_page']),
+    (['chapter', 'ebook-chapter', 'technical-report-chapter', 'proceeding', 'conference', 'paper-conference'],
+     ['date', 'analytic-title', 'monogr-title']),
+    (['book', 'thesis', 'ebook', 'manual', 'data-sheet', 'database', 'online-database', 'preprint', 'technical-report',
+      'report', 'software', 'standard'],
+     ['date', 'monogr-title']),
+    (['forthcoming-article', 'unpublished', 'grey-literature'], ['date', 'monogr-title', 'note']),
+    (['patent'], ['date', 'monogr-title', 'idno_type_docNumber']),
+    (['series'], ['date', 'series-title', 'monogr-title']),
+    (['webpage'], ['date', 'ref'])
+]
+
+# fields that a parser cannot identify and that are therefore not compared for its output
+default_exclusions = {
+    'Cermine': ['note', 'idno_type_docNumber', 'ref'],
+    'Pdfssa4met': ['analytic-title', 'note', 'idno_type_docNumber', 'ref'],
+    'ScienceParse': ['note', 'idno_type_docNumber', 'ref']
+}
+
+
+class Schema:
+
+    # types: list of (list of types, list of fields) groups, exclusions: dict of parser name -> excluded fields
+    def __init__(self, types, exclusions=None):
+        self._fields = {}
+        for type_names, fields in types:
+            for type_name in type_names:
+                self._fields.setdefault(type_name, tuple(fields))
+        self._masked = {}
+        for parser_name, excluded in (exclusions or {}).items():
+            excluded = set(excluded)
+            self._masked[parser_name] = {type_name: tuple(field for field in fields if field not in excluded)
+                                         for type_name, fields in self._fields.items()}
+
+    @property
+    def types(self):
+        return list(self._fields)
+
+    # the tuple of fields compared for references of the given type in the output of the parser, None if the type is
+    # unknown
+    def fields(self, type_name, parser_name=None):
+        masked = self._masked.get(parser_name)
+        if masked is not None:
+            return masked.get(type_name)
+        return self._fields.get(type_name)
+
+
+# load a schema from a JSON file of the form
+#   {"types": [{"types": ["article", ...], "fields": ["date", ...]}, ...], "exclusions": {"Cermine": ["note", ...]}}
+# "exclusions" is optional; if it is missing, the default exclusions are used.
+def load_schema(path) -> Schema:
+    with open(path, encoding='utf8') as f:
+        config = json.load(f)
+    try:
+        types = [(group['types'], group['fields']) for group in config['types']]
+    except (KeyError, TypeError) as err:
+        raise ValueError(f"Invalid schema file '{path}': {err}") from err
+    return Schema(types, config.get('exclusions', default_exclusions))
+
+
+default_schema = Schema(default_types, default_exclusions)
+
+# the schema used by the evaluation
+active = default_schema
+
+
+# use the given Schema, the schema loaded from a JSON file if a path is given, or the default schema if None
+def set_schema(schema):
+    global active
+    if schema is None:
+        schema = default_schema
+    elif not isinstance(schema, Schema):
+        schema = load_schema(schema)
+    active = schema
+
+
+def get_schema() -> Schema:
+    return active
@@ -0,0 +1,21 @@
+import json
+import os
+import sys
+
+# the modules of extraction_eval import each other by their plain names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# write a list of AnyStyle/CSL-JSON references to the file at path, which is evaluated like the converted TEI file
+def write_json(path, refs):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(refs, f)
+    return str(path)
+
+
+# an AnyStyle reference of an article, numbered by n so that all references of a document are different
+def article(n):
+    return {'type': 'article-journal', 'author': [{'family': f'Author{n}', 'given': 'Anna'}],
+            'title': [f'Title of article number {n} on legal theory'], 'date': [str(1950 + n)],
+            'container-title': ['Journal of Law and Society'], 'volume': [str(n)], 'pages': [f'{10 * n}-{10 * n + 9}']}
@@ -0,0 +1,127 @@
+import gzip
+import io
+import json
+import os
+import tarfile
+import zipfile
+import pytest
+import corpus_io
+import get_evaluation_metrics as gem
+import pairing
+from conftest import article
+
+
+@pytest.fixture(autouse=True)
+def close_archives():
+    yield
+    corpus_io.close_archives()
+
+
+# the documents of a corpus as {file name: content} of the gold standard and of the output, which has errors in some
+# references and misses the last document
+def documents():
+    gold, output = {}, {}
+    for d in range(5):
+        refs = [article(d * 10 + n) for n in range(1 + d % 3)]
+        gold[f'doc{d}.json'] = json.dumps(refs).encode('utf8')
+        if d < 4:
+            output[f'doc{d}.json'] = json.dumps([dict(ref, date=['1900']) if n == 1 else ref
+                                                 for n, ref in enumerate(refs)]).encode('utf8')
+    return gold, output
+
+
+def zstd(data):
+    import zstandard
+    return zstandard.ZstdCompressor().compress(data)
+
+
+# write the files into a container at path without its suffix: a directory, a directory of compressed files or an
+# archive, in the given order. Returns the path of the container.
+def write_container(path, files, container):
+    path = str(path)
+    if container in ['directory', 'gz', 'zst']:
+        for name, data in files.items():
+            if container == 'gz':
+                name, data = name + '.gz', gzip.compress(data)
+            elif container == 'zst':
+                name, data = name + '.zst', zstd(data)
+            write_bytes(f'{path}/{name}', data)
+        return path
+    path += '.' + container
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if container == 'zip':
+        with zipfile.ZipFile(path, 'w') as archive:
+            for name, data in files.items():
+                archive.writestr(f'documents/{name}', data)
+        return path
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(f'documents/{name}')
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    data = buffer.getvalue()
+    if container == 'tar.gz':
+        data = gzip.compress(data)
+    elif container == 'tar.zst':
+        data = zstd(data)
+    write_bytes(path, data)
+    return path
+
+
+def write_bytes(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def evaluate(gold, output):
+    return [(record['file'], record['values'], record['missing'])
+            for record in gem.iter_file_data(output, 'AnyStyle', gold)]
+
+
+@pytest.mark.parametrize('container', ['directory', 'gz', 'zst', 'tar', 'tar.gz', 'tar.zst', 'zip'])
+def test_containers_give_the_results_of_plain_files(tmp_path, container):
+    if 'zst' in container:
+        pytest.importorskip('zstandard')
+    gold, output = documents()
+    expected = evaluate(write_container(tmp_path / 'plain' / 'gold', gold, 'directory'),
+                        write_container(tmp_path / 'plain' / 'output' / 'AnyStyle', output, 'directory'))
+    assert [values[:3] for _, values, _ in expected] == [[1, 1, 1], [2, 2, 1], [3, 3, 2], [1, 1, 1], [2, 0, 0]]
+
+    gold_path = write_container(tmp_path / 'packed' / 'gold', gold, container)
+    write_container(tmp_path / 'packed' / 'output' / 'AnyStyle', output, container)
+    # the output archive is found by the name of the parser
+    results = evaluate(gold_path, str(tmp_path / 'packed' / 'output' / 'AnyStyle'))
+    suffix = {'gz': '.gz', 'zst': '.zst'}.get(container, '')
+    assert results == [(name + suffix, values, missing) for name, values, missing in expected]
+    assert sorted(corpus_io.plain_name(path) for _, path in corpus_io.list_inputs(gold_path)) == sorted(gold)
+    for _, path in corpus_io.list_inputs(gold_path):
+        assert corpus_io.read_input(path) == gold[corpus_io.plain_name(path)]
+
+
+def test_manifest_with_archive_members(tmp_path):
+    gold, output = documents()
+    gold_path = write_container(tmp_path / 'gold', gold, 'zip')
+    write_container(tmp_path / 'anystyle', output, 'tar.gz')
+    entries = [{'gold': f'gold.zip::documents/{name}',
+                'outputs': {'AnyStyle': f'anystyle.tar.gz::documents/{name}' if name in output else None}}
+               for name in reversed(list(gold))]
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text(json.dumps(entries))
+    expected = evaluate(gold_path, str(tmp_path / 'anystyle'))
+    assert evaluate(str(manifest), '') == sorted(expected, key=lambda result: result[0], reverse=True)
+
+
+def test_compressed_output_archive_is_read_in_storage_order(tmp_path):
+    gold, output = documents()
+    gold_path = write_container(tmp_path / 'gold', gold, 'directory')
+    stored = dict(reversed(list(output.items())))
+    output_path = write_container(tmp_path / 'output' / 'AnyStyle', stored, 'tar.gz')
+    tasks = pairing.pair_files(str(tmp_path / 'output' / 'AnyStyle'), gold_path)
+    assert [name for name, _, _ in tasks] == ['doc3.json', 'doc2.json', 'doc1.json', 'doc0.json', 'doc4.json']
+    assert [out_file for _, out_file, _ in tasks][:4] == [path for _, path in corpus_io.list_inputs(output_path)]
+    # an uncompressed archive can be read in any order
+    write_container(tmp_path / 'tar' / 'AnyStyle', stored, 'tar')
+    tasks = pairing.pair_files(str(tmp_path / 'tar' / 'AnyStyle'), gold_path)
+    assert [name for name, _, _ in tasks] == sorted(gold)
@@ -0,0 +1,15 @@
+import json
+import os
+import diff_harness
+
+
+def test_engines_run_with_the_numeric_mode_of_the_reference(tmp_path):
+    diff_harness.synthetic_corpus(str(tmp_path / 'corpus'), 3, seed=1)
+    engine = os.path.dirname(os.path.abspath(diff_harness.__file__))
+    report_path = tmp_path / 'report.json'
+    assert diff_harness.main(['--reference', engine, '--candidate', engine, '--gold', str(tmp_path / 'corpus' / 'gold'),
+                              '--output', str(tmp_path / 'corpus' / 'output'), '--out', str(report_path)]) == 0
+    report = json.loads(report_path.read_text())
+    assert (report['numeric'], report['hash_seed']) == ('typed', 0)
+    assert [(corpus['files'], corpus['numeric'], corpus['identical']) for corpus in report['corpora']] == \
+           [(3, 'typed', True)]
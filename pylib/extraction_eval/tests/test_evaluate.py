@@ -0,0 +1,48 @@
+import json
+import os
+import pytest
+import evaluate
+import export_tables
+import get_evaluation_metrics as gem
+from conftest import article, write_json
+
+
+def test_parquet_without_engine_fails_before_the_evaluation(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_tables, 'parquet_engine', lambda: None)
+    monkeypatch.setattr(gem, 'iter_file_data', lambda *args, **kwargs: pytest.fail("the evaluation was started"))
+    with pytest.raises(SystemExit) as exit_info:
+        evaluate.main(['--gold', str(tmp_path), '--output', str(tmp_path), '--format', 'parquet',
+                       '--out', str(tmp_path / 'results.parquet')])
+    assert exit_info.value.code == 2
+
+
+def write_corpus(tmp_path):
+    refs = [article(n) for n in range(3)]
+    write_json(tmp_path / 'gold' / 'doc1.json', refs)
+    write_json(tmp_path / 'output' / 'AnyStyle' / 'doc1.json', refs)
+    return ['--gold', str(tmp_path / 'gold'), '--output', str(tmp_path / 'output'), '--quiet']
+
+
+def test_results_on_stdout_and_stdout_restored(tmp_path, capfd):
+    stdout = os.fstat(1)
+    assert evaluate.main(write_corpus(tmp_path)) == 0
+    assert (os.fstat(1).st_dev, os.fstat(1).st_ino) == (stdout.st_dev, stdout.st_ino)
+    print('after the evaluation')
+    out = capfd.readouterr().out
+    assert json.loads(out[:out.rindex('}') + 1])['AnyStyle']['counters']['ref_tot_corr'] == 3
+    assert out.endswith('after the evaluation\n')
+
+
+def test_failed_evaluation_reports_the_traceback(tmp_path, capfd, monkeypatch):
+    def fail(*args, **kwargs):
+        raise KeyError('broken')
+    monkeypatch.setattr(gem, 'iter_file_data', fail)
+    assert evaluate.main(write_corpus(tmp_path)) == 1
+    err = capfd.readouterr().err
+    assert "Evaluation failed: KeyError: 'broken'" in err and 'Traceback (most recent call last)' in err
+
+
+def test_timings_require_the_json_format(tmp_path):
+    with pytest.raises(SystemExit) as exit_info:
+        evaluate.main(write_corpus(tmp_path) + ['--timings', '--format', 'jsonl'])
+    assert exit_info.value.code == 2
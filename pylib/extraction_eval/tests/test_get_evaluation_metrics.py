@@ -0,0 +1,87 @@
+import json
+import os
+from lxml import etree
+import get_evaluation_metrics as gem
+from conftest import article, write_json
+from json_to_tei_anystyle import anystyle_parser, references_tree
+
+
+def test_all_references_are_aligned(tmp_path):
+    refs = [article(n) for n in range(8)]
+    gold = write_json(tmp_path / 'gold' / 'doc1.json', refs)
+    output = write_json(tmp_path / 'AnyStyle' / 'doc1.json', refs)
+    values = gem.get_single_data(output, gold, 'AnyStyle')
+    assert values[:3] == [8, 8, 8]
+    assert values[3] == values[4] == values[5]
+
+
+def test_output_without_references_counts_the_gold_standard(tmp_path):
+    gold = write_json(tmp_path / 'gold' / 'doc1.json', [article(n) for n in range(3)])
+    write_json(tmp_path / 'output' / 'AnyStyle' / 'doc1.json', [])
+    records = list(gem.iter_file_data(str(tmp_path / 'output' / 'AnyStyle'), 'AnyStyle', str(tmp_path / 'gold')))
+    assert [record['values'] for record in records] == [[3, 0, 0, 0, 0, 0, 0, 0, 0]]
+    assert not records[0]['missing']
+    assert gem.get_single_data(str(tmp_path / 'output' / 'AnyStyle' / 'doc1.json'), gold, 'AnyStyle') == [3]
+
+
+# a Grobid output is full-text TEI in the TEI namespace, with the references in the back matter
+def write_grobid(path, refs):
+    tei = '{http://www.tei-c.org/ns/1.0}'
+    list_bibl = references_tree(refs).getroot()[0][0]
+    for element in list_bibl.iter():
+        element.tag = tei + element.tag
+    root = etree.Element(tei + 'TEI')
+    text = etree.SubElement(root, tei + 'text')
+    etree.SubElement(etree.SubElement(text, tei + 'body'), tei + 'p').text = 'Full text of the document.'
+    etree.SubElement(etree.SubElement(text, tei + 'back'), tei + 'div').append(list_bibl)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    etree.ElementTree(root).write(str(path))
+
+
+def test_grobid_output_in_a_manifest_without_grobid_in_the_path(tmp_path):
+    entries = []
+    for doc in ['doc1', 'doc2']:
+        refs = [article(n) for n in range(3)]
+        write_json(tmp_path / 'gold' / f'{doc}.json', refs)
+        write_grobid(tmp_path / 'grobid' / f'{doc}.tei.xml', refs)
+        entries.append({'gold': f'gold/{doc}.json', 'outputs': {'Grobid': f'grobid/{doc}.tei.xml'}})
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text(json.dumps(entries))
+    for prefetch in [0, 2]:  # the files are read by get_single_data or in advance by load_inputs
+        records = list(gem.iter_file_data('', 'Grobid', str(manifest), prefetch=prefetch))
+        assert [record['values'][:3] for record in records] == [[3, 3, 3], [3, 3, 3]]
+
+
+def test_json_and_converted_tei_give_the_same_diagnostics(tmp_path):
+    gold = [article(n) for n in range(3)] + [
+        {'type': 'chapter', 'author': [{'family': 'Rossi', 'given': 'Mario'}], 'title': ['Law and order'],
+         'date': ['1967'], 'container-title': ['Handbook of legal theory'], 'editor': [{'family': 'Editor'}]},
+        {'type': 'book', 'author': [{'family': 'Chen', 'given': 'Wei'}], 'title': ['Courts and power'],
+         'date': ['1985'], 'publisher': ['Legal Press'], 'location': ['Berlin']}]
+    output = [article(0), dict(article(1), title=['Title of artcle number 1 on legal theory']),
+              dict(article(2), pages=['20']), gold[4], article(7)]
+    write_json(tmp_path / 'json' / 'gold' / 'doc1.json', gold)
+    write_json(tmp_path / 'json' / 'output' / 'AnyStyle' / 'doc1.json', output)
+    for directory in ['gold', 'output/AnyStyle']:
+        os.makedirs(tmp_path / 'tei' / directory)
+        anystyle_parser(str(tmp_path / 'json' / directory / 'doc1.json'), str(tmp_path / 'tei' / directory / 'doc1.xml'))
+    results = {}
+    for gold_format in ['json', 'tei']:
+        for output_format in ['json', 'tei']:
+            records = gem.iter_file_data(str(tmp_path / output_format / 'output' / 'AnyStyle'), 'AnyStyle',
+                                         str(tmp_path / gold_format / 'gold'), pairs=True)
+            results[gold_format, output_format] = [(r['values'], r['diagnostic'], r['pairs']) for r in records]
+    assert results['json', 'json'][0][0][:3] == [5, 5, 4]
+    assert all(result == results['json', 'json'] for result in results.values())
+
+
+def test_output_references_after_the_last_gold_reference_are_unmatched(tmp_path):
+    refs = [article(n) for n in range(3)]
+    write_json(tmp_path / 'gold' / 'doc1.json', refs)
+    write_json(tmp_path / 'output' / 'AnyStyle' / 'doc1.json', refs + [dict(refs[1], date=['1999']), article(7)])
+    records = list(gem.iter_file_data(str(tmp_path / 'output' / 'AnyStyle'), 'AnyStyle', str(tmp_path / 'gold'),
+                                      candidates=3))
+    assert records[0]['values'][:3] == [3, 5, 3]
+    unmatched = records[0]['unmatched']
+    assert [entry['output'] for entry in unmatched] == [3, 4]
+    assert (unmatched[0]['output_id'], unmatched[0]['candidates'][0]['gold_id']) == ('b3', 'b1')
@@ -0,0 +1,41 @@
+import json
+import evaluate
+import get_evaluation_metrics as gem
+import merge
+import result_stream
+from conftest import article, write_json
+
+
+# a corpus of documents that differ in their number of references and in the errors of the output; the output of the
+# last document is missing
+def write_corpus(tmp_path, documents=9):
+    for d in range(documents):
+        refs = [article(d * 10 + n) for n in range(1 + d % 4)]
+        write_json(tmp_path / 'gold' / f'doc{d}.json', refs)
+        if d == documents - 1:
+            continue
+        output = [dict(ref, date=['1900']) if n == d % 3 else ref for n, ref in enumerate(refs)]
+        write_json(tmp_path / 'output' / 'AnyStyle' / f'doc{d}.json', output + [article(99)] * (d % 2))
+    return str(tmp_path / 'gold'), str(tmp_path / 'output')
+
+
+def test_merged_shards_equal_the_unsharded_evaluation(tmp_path, capfd):
+    gold, output = write_corpus(tmp_path)
+    records = {record['file']: json.loads(json.dumps(record))
+               for record in gem.iter_file_data(output + '/AnyStyle', 'AnyStyle', gold)}
+    shards = []
+    for index in range(1, 4):
+        shards.append(str(tmp_path / f'shard-{index}.jsonl'))
+        assert evaluate.main(['--gold', gold, '--output', output, '--shard', f'{index}/3', '--format', 'jsonl',
+                              '--diagnostics', 'file', '--out', shards[-1], '--quiet']) == 0
+    shard_records = [record for path in shards for record in result_stream.read_jsonl(path)]
+    assert all(0 < len(list(result_stream.read_jsonl(path))) < len(records) for path in shards)
+    assert {record['file']: record for record in shard_records} == records
+    assert len(shard_records) == len(records)
+
+    assert merge.main(shards + ['--out', str(tmp_path / 'merged.json')]) == 0
+    with open(tmp_path / 'merged.json') as f:
+        assert f.read() == json.dumps(gem.compute_values(['AnyStyle'], gold, output), indent=2) + '\n'
+    assert merge.main(shards + ['--diagnostic']) == 0
+    merged = json.loads(capfd.readouterr().out)
+    assert merged == dict(json.loads(json.dumps(gem.get_parser_data(['AnyStyle'], gold, output, diagnostic=True))))
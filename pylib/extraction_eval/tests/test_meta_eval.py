@@ -0,0 +1,35 @@
+import itertools
+import pytest
+import meta_eval
+
+gold = [('date', [['1951', '1951']]), ('monogr-title', ['Journal of Law and Society']),
+        ('analytic-title', ['Title of article number 1 on legal theory']), ('biblScope_unit_volume', ['1']),
+        ('biblScope_unit_page', [['10-19']])]
+
+changes = {'date': [['1987', '1987']], 'monogr-title': ['Annals of Mathematics'],
+           'analytic-title': ['Completely unrelated words'], 'biblScope_unit_volume': ['42'],
+           'biblScope_unit_page': [['300-310']]}
+
+
+# the gold standard record with the given fields changed, and without the given fields
+def output(changed=(), missing=()):
+    return [(key, changes[key] if key in changed else values) for key, values in gold if key not in missing]
+
+
+@pytest.mark.parametrize('changed, missing, expected', [
+    ((), (), (True, [])),
+    (('date',), (), (False, None)),
+    (('monogr-title',), (), (False, None)),
+    (('analytic-title',), (), (True, ['analytic-title'])),
+    (('biblScope_unit_volume', 'biblScope_unit_page'), (), (True, ['biblScope_unit_volume', 'biblScope_unit_page'])),
+    (('analytic-title', 'biblScope_unit_volume'), (), (False, None)),
+    (('analytic-title', 'biblScope_unit_page'), (), (False, None)),
+    (('biblScope_unit_volume',), ('analytic-title',), (True, ['biblScope_unit_volume'])),
+    (('biblScope_unit_volume', 'biblScope_unit_page'), ('analytic-title',), (False, None)),
+])
+def test_article_verdicts_do_not_depend_on_the_field_order(changed, missing, expected):
+    record = output(changed, missing)
+    if not changed:
+        record[0] = ('date', [['1951']])  # not identical, so that the fields are compared
+    for order in itertools.permutations(record):
+        assert meta_eval._compare_meta(gold, list(order), 'article') == expected
@@ -0,0 +1,27 @@
+import pytest
+import result_stream
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 65536])
+def test_partial_last_line_is_dropped(tmp_path, block_size):
+    path = tmp_path / 'stream.jsonl'
+    path.write_bytes(b'{"file": "doc1.xml"}\n{"file": "doc2.xml"}\n{"file": "do')
+    result_stream._drop_partial_line(str(path), block_size)
+    assert path.read_bytes() == b'{"file": "doc1.xml"}\n{"file": "doc2.xml"}\n'
+
+
+@pytest.mark.parametrize('content', [b'', b'{"file": "doc1.xml"}\n', b'{"file": "do'])
+def test_complete_or_single_line_streams(tmp_path, content):
+    path = tmp_path / 'stream.jsonl'
+    path.write_bytes(content)
+    result_stream._drop_partial_line(str(path), 4)
+    assert path.read_bytes() == (content if content.endswith(b'\n') else b'')
+
+
+def test_resumed_stream_appends_after_the_complete_records(tmp_path):
+    path = str(tmp_path / 'stream.jsonl')
+    with open(path, 'w') as f:
+        f.write('{"parser": "AnyStyle", "file": "doc1.xml"}\n{"parser": "Any')
+    records = [{'parser': 'AnyStyle', 'file': 'doc2.xml'}]
+    assert list(result_stream.write_jsonl(records, path)) == records
+    assert result_stream.completed_files(path, 'AnyStyle') == {'doc1.xml', 'doc2.xml'}
@@ -0,0 +1,34 @@
+import get_evaluation_metrics as gem
+from conftest import article, write_json
+
+
+def write_corpus(tmp_path, documents=12):
+    for d in range(documents):
+        refs = [article(d * 10 + n) for n in range(1 + d % 5)]
+        write_json(tmp_path / 'gold' / f'doc{d}.json', refs)
+        write_json(tmp_path / 'output' / 'AnyStyle' / f'doc{d}.json', refs)
+    return str(tmp_path / 'gold'), str(tmp_path / 'output')
+
+
+def test_only_the_sampled_gold_files_are_read(tmp_path, monkeypatch):
+    gold, output = write_corpus(tmp_path)
+    read = []
+    read_root = gem.read_root
+
+    def recording_read_root(path, *args, **kwargs):
+        read.append(path)
+        return read_root(path, *args, **kwargs)
+    monkeypatch.setattr(gem, 'read_root', recording_read_root)
+    result = gem.sample_values(['AnyStyle'], gold, output, sample_size=6)['AnyStyle']
+    assert result['files'] == 12 and result['sampled'] == 6
+    assert len(set(path for path in read if '/gold/' in path)) == 6
+    assert result['references']['f-score'] == 1.0
+
+
+def test_strata_by_reference_type_parse_all_gold_files(tmp_path, monkeypatch):
+    gold, output = write_corpus(tmp_path)
+    profiled = []
+    gold_profile = gem.gold_profile
+    monkeypatch.setattr(gem, 'gold_profile', lambda path: profiled.append(path) or gold_profile(path))
+    result = gem.sample_values(['AnyStyle'], gold, output, sample_size=6, strata='type')['AnyStyle']
+    assert len(profiled) == 12 and result['sampled'] == 6
@@ -0,0 +1,31 @@
+from lxml import etree
+import get_evaluation_metrics as gem
+from conftest import article, write_json
+from json_to_tei_anystyle import references_tree
+from threshold_sweep import ThresholdSweep
+
+
+def test_names_given_as_persname_strings():
+    sweep = ThresholdSweep()
+    sweep.record([['persName', [['forename', 'John'], ['surname', 'Smith']]], ['date', '2001']],
+                 [['persName', ['John Smith', 'Jane Doe']], ['date', '2001']])
+    fields = sweep.to_dict()
+    assert fields['persName']['output'] == 2 and fields['persName']['gold'] == 0
+    assert fields['surname']['gold'] == 1 and fields['surname']['output'] == 0
+    assert fields['date']['histogram'][-1] == 1
+
+
+# a ScienceParse output identifies the authors only as <persName>Anna Author1</persName>
+def test_sweep_of_a_persname_string_output(tmp_path):
+    refs = [article(n) for n in range(3)]
+    write_json(tmp_path / 'gold' / 'doc1.json', refs)
+    tree = references_tree(refs)
+    for author, ref in zip(tree.iter('author'), refs):
+        author.remove(author[0])
+        etree.SubElement(author, 'persName').text = f"{ref['author'][0]['given']} {ref['author'][0]['family']}"
+    (tmp_path / 'output' / 'ScienceParse').mkdir(parents=True)
+    tree.write(str(tmp_path / 'output' / 'ScienceParse' / 'doc1.xml'))
+    result = gem.sweep_values(['ScienceParse'], str(tmp_path / 'gold'), str(tmp_path / 'output'))['ScienceParse']
+    assert result['persName']['output'] == 3
+    assert result['surname']['gold'] == result['forename']['gold'] == 3
+    assert result['date']['curve']['f-score'][-1] == 1.0
@@ -0,0 +1,85 @@
+import pytest
+import meta_eval
+from typed_compare import compare_typed, parse_number, parse_page, parse_pages, parse_roman, parse_year
+
+
+@pytest.fixture
+def numeric_mode():
+    previous = meta_eval.get_numeric_mode()
+    yield meta_eval.set_numeric_mode
+    meta_eval.set_numeric_mode(previous)
+
+
+# the similarity of two raw values of the field, cleaned as in the evaluation
+def similarity(field, value1, value2):
+    return meta_eval.field_similarity(field, meta_eval.match_content(value1, field),
+                                      meta_eval.match_content(value2, field))
+
+
+def test_years():
+    assert parse_year('2011a') == 2011
+    assert parse_year('Spring 1999') == 1999
+    assert parse_year('12011') is None
+    assert parse_year('n.d.') is None
+    assert compare_typed('date', [['2011', '2011']], ['2011']) == 0
+    assert compare_typed('date', ['2011'], ['2012']) == 1
+
+
+@pytest.mark.parametrize('value, number', [('XII', 12), ('xii', 12), ('XLII', 42), ('iv', 4), ('MCMXC', 1990),
+                                           ('MIX', 1009), ('xl', 40)])
+def test_roman_numerals(value, number):
+    assert parse_roman(value) == number
+
+
+@pytest.mark.parametrize('value', ['mix', 'dix', 'Mild', 'vol', 'iiii', 'vx', ''])
+def test_words_are_not_roman_numerals(value):
+    assert parse_roman(value) is None
+
+
+def test_volumes_and_issues():
+    assert parse_number('Vol. 12') == 12
+    assert parse_number('Vol. XII') == 12
+    assert parse_number('vol. xii') == 12
+    assert parse_number('mix') is None
+    assert compare_typed('biblScope_unit_volume', ['xii'], ['12']) == 0
+    assert compare_typed('biblScope_unit_issue', ['2'], ['12']) == 1
+
+
+def test_pages():
+    assert parse_page('p12') == ('', 12)
+    assert parse_page('xiv') == ('roman', 14)
+    assert parse_page('e1002345') == ('e', 1002345)
+    assert parse_page('S12') == ('s', 12)
+    assert parse_pages(['1234', '56']) == (('', 1234), ('', 1256))
+    assert parse_pages(['123', '9']) == (('', 123), ('', 129))
+    assert parse_pages(['12']) == (('', 12), ('', 12))
+
+
+@pytest.mark.parametrize('pages1, pages2, found', [
+    (['123', '9'], ['123', '129'], 0),  # abbreviated end page
+    (['123', '145'], ['123'], 0),  # the end page got lost
+    (['123', '145'], ['130'], 1),  # a page within the range is a pinpoint citation, not the range
+    (['e1002345'], ['1002345'], 1),  # an e-page is not the arabic page with the same number
+    (['xiv'], ['14'], 1),  # nor is a preface page
+])
+def test_page_ranges(pages1, pages2, found):
+    assert compare_typed('biblScope_unit_page', [pages1], [pages2]) == found
+
+
+def test_unparseable_values_fall_back_to_strings():
+    assert compare_typed('biblScope_unit_volume', ['mix'], ['1009']) is None
+    assert compare_typed('date', ['n.d.'], ['2011']) is None
+
+
+@pytest.mark.parametrize('field, value1, value2, typed, string', [
+    ('biblScope_unit_volume', 'XII', '12', 1.0, 0.0),
+    ('biblScope_unit_page', '123-9', '123-129', 1.0, 0.5),
+    ('biblScope_unit_page', '123-145', '123', 1.0, 0.333),
+    ('biblScope_unit_page', 'e1002345', '1002345', 0.0, 1.0),
+    ('biblScope_unit_issue', '2', '12', 0.0, 0.5),
+])
+def test_typed_and_string_comparison(numeric_mode, field, value1, value2, typed, string):
+    numeric_mode('typed')
+    assert similarity(field, value1, value2) == typed
+    numeric_mode('string')
+    assert similarity(field, value1, value2) == pytest.approx(string, abs=0.001)
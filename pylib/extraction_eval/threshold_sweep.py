@@ -0,0 +1,101 @@
+from meta_eval import clean_occurrence, field_delta, field_similarity
+
+
+# sensitivity of the content scores to the acceptance thresholds ("deltas") of meta_eval.eval_field. Instead of
+# re-running the evaluation for every setting, the similarity of every field of the aligned reference pairs is computed
+# once and counted in a histogram per field; precision, recall and f-score of the field are then derived for a whole
+# grid of deltas from the cumulated histogram.
+#
+# The references are aligned with the configured deltas, only the comparison of the fields of aligned references is
+# swept. For every field of an aligned pair, each output occurrence is scored with its best similarity to a gold
+# standard occurrence of the same field, and at most as many scores as there are gold standard occurrences are kept.
+# At delta d, the kept scores >= d are correct, so that precision = correct / output occurrences and recall =
+# correct / gold standard occurrences. Author names are split into forename and surname; names that the output only
+# has as a persName string are counted as the field 'persName'.
+
+# number of histogram bins per unit of similarity: scores are counted in bins of 0.01, which makes the curves exact for
+# deltas on the same grid
+resolution = 100
+
+# the default grid of deltas
+default_deltas = [n / resolution for n in range(resolution // 2, resolution + 1)]
+
+
+class ThresholdSweep:
+
+    def __init__(self):
+        self.fields = {}  # field -> {'gold': occurrences, 'output': occurrences, 'histogram': counts of the scores}
+
+    def _entry(self, field):
+        entry = self.fields.get(field)
+        if entry is None:
+            entry = self.fields[field] = {'gold': 0, 'output': 0, 'histogram': [0] * (resolution + 1)}
+        return entry
+
+    # count the fields of an aligned reference pair, given as the metadata lists of the gold standard and the output
+    # reference returned by get_evaluation_metrics.count_meta_per_ref
+    def record(self, gs_comp, out_comp):
+        gold, output = _occurrences(gs_comp), _occurrences(out_comp)
+        for field in set(gold) | set(output):
+            entry = self._entry(field)
+            values1, values2 = gold.get(field, []), output.get(field, [])
+            entry['gold'] += len(values1)
+            entry['output'] += len(values2)
+            if not values1 or not values2:
+                continue
+            scores = sorted((max(field_similarity(field, v1, v2) for v1 in values1) for v2 in values2), reverse=True)
+            for score in scores[:len(values1)]:
+                entry['histogram'][min(resolution, int(score * resolution + 1e-9))] += 1
+
+    # add the counts of another sweep, or of its to_dict() as stored in the file records
+    def update(self, other):
+        for field, counts in (other.fields if isinstance(other, ThresholdSweep) else other).items():
+            entry = self._entry(field)
+            entry['gold'] += counts['gold']
+            entry['output'] += counts['output']
+            entry['histogram'] = [a + b for a, b in zip(entry['histogram'], counts['histogram'])]
+
+    def to_dict(self) -> dict:
+        return self.fields
+
+    # precision, recall and f-score of every field for every delta of the grid, as a json-serializable dict
+    # {field: {'delta': configured delta, 'gold': n, 'output': n, 'histogram': [...],
+    #          'curve': {'delta': [...], 'precision': [...], 'recall': [...], 'f-score': [...]}}}
+    def curves(self, deltas=None) -> dict:
+        deltas = default_deltas if deltas is None else deltas
+        output = {}
+        for field in sorted(self.fields):
+            entry = self.fields[field]
+            # at_least[i]: number of scores in bin i or above
+            at_least = entry['histogram'][:]
+            for i in range(resolution - 1, -1, -1):
+                at_least[i] += at_least[i + 1]
+            curve = {'delta': list(deltas), 'precision': [], 'recall': [], 'f-score': []}
+            for delta in deltas:
+                correct = at_least[min(resolution, max(0, int(delta * resolution + 1e-9)))]
+                precision = correct / entry['output'] if entry['output'] else 0
+                recall = correct / entry['gold'] if entry['gold'] else 0
+                curve['precision'].append(precision)
+                curve['recall'].append(recall)
+                curve['f-score'].append(2 * precision * recall / (precision + recall) if precision or recall else 0)
+            output[field] = {'delta': field_delta(field), 'gold': entry['gold'], 'output': entry['output'],
+                             'histogram': entry['histogram'], 'curve': curve}
+        return output
+
+
+# the cleaned occurrences of every field in a metadata list of count_meta_per_ref, with the author names split into
+# their parts. Names that the output only has as strings (['persName', ['John Smith']], e.g. ScienceParse and
+# Scholarcy) are counted as persName.
+def _occurrences(comp) -> dict:
+    occurrences = {}
+    for field, value in comp:
+        if field == 'persName' and isinstance(value, list):
+            for item in value:
+                if isinstance(item, (list, tuple)):
+                    part, name = item
+                else:
+                    part, name = 'persName', item
+                occurrences.setdefault(part, []).append(clean_occurrence(name, part))
+        else:
+            occurrences.setdefault(field, []).append(clean_occurrence(value, field))
+    return occurrences
@@ -0,0 +1,90 @@
+import json
+import os
+import random
+import threading
+import time
+
+
+# opt-in tracing of the comparisons, replacing the messages that were printed to stdout for every comparison.
+# Tracing is off by default. Traced code checks `tracing.active` before building a message, so that a disabled run
+# does not format anything:
+#
+#   if tracing.active is not None:
+#       tracing.active.emit('debug', 'compare_meta', gold=l1, output=l2, result=val)
+#
+# When enabled, every event at or above the configured level is written as a JSON object on one line of the trace
+# file: {"time": unix time, "pid": process id, "level": "debug", "event": "compare_meta", ...fields}. Events below
+# 'warning' can be sampled, e.g. to keep one comparison in a hundred. Worker processes append to the same file.
+#
+# Tracing can also be enabled without code changes with the environment variable EXTRACTION_EVAL_TRACE=<path>, and
+# EXTRACTION_EVAL_TRACE_LEVEL and EXTRACTION_EVAL_TRACE_SAMPLE for the level and the sample rate.
+
+levels = ['debug', 'info', 'warning']
+
+active = None
+
+
+class Tracer:
+
+    # path: JSON Lines file the events are appended to
+    # level: minimum level of the events written
+    # sample: fraction of the events below 'warning' that are written
+    # seed: seed of the random generator used for sampling, None for a different sample in every run
+    def __init__(self, path, level='debug', sample=1.0, seed=None):
+        if level not in levels:
+            raise ValueError(f"Unknown trace level '{level}', use one of {', '.join(levels)}.")
+        if not 0 < sample <= 1:
+            raise ValueError("The trace sample rate must be greater than 0 and at most 1.")
+        self.path = path
+        self.level = level
+        self.sample = sample
+        self.seed = seed
+        self._min_level = levels.index(level)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf8')
+
+    # whether events of the level are written at all
+    def enabled(self, level):
+        return levels.index(level) >= self._min_level
+
+    def emit(self, level, event, **fields):
+        n = levels.index(level)
+        if n < self._min_level or (self.sample < 1 and n < 2 and self._random.random() >= self.sample):
+            return
+        record = {'time': time.time(), 'pid': os.getpid(), 'level': level, 'event': event}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()  # one write per line keeps the lines of several processes apart
+
+    # the arguments to create an equivalent tracer, e.g. in a worker process
+    def config(self) -> tuple:
+        return self.path, self.level, self.sample, self.seed
+
+    def close(self):
+        self._file.close()
+
+
+# write trace events at or above level to the JSON Lines file at path (see Tracer), or disable tracing if path is None
+def set_trace(path, level='debug', sample=1.0, seed=None):
+    global active
+    tracer = Tracer(path, level, sample, seed) if path is not None else None
+    if active is not None:
+        active.close()
+    active = tracer
+
+
+def get_trace():
+    return active
+
+
+def emit(level, event, **fields):
+    if active is not None:
+        active.emit(level, event, **fields)
+
+
+if os.environ.get('EXTRACTION_EVAL_TRACE'):
+    set_trace(os.environ['EXTRACTION_EVAL_TRACE'], os.environ.get('EXTRACTION_EVAL_TRACE_LEVEL', 'debug'),
+              float(os.environ.get('EXTRACTION_EVAL_TRACE_SAMPLE', 1.0)))
@@ -0,0 +1,139 @@
+import re
+
+
+# typed comparison of the numeric fields (dates, volumes, issues and pages). Instead of the Levenshtein similarity of
+# the cleaned strings, years are compared as integers, volumes and issues as (tuples of) integers, also if written as
+# Roman numerals, and pages as (start, end) ranges. The values are the ones cleaned by meta_eval.match_content, i.e.
+# every occurrence of a field is a list of strings such as ['2011-12-02', '2011'] -> ['2011', '2011'] or
+# '123-9' -> ['123', '9'].
+
+numeric_fields = ['date', 'biblScope_unit_volume', 'biblScope_unit_issue', 'biblScope_unit_page']
+
+_year = re.compile(r'(?<!\d)(\d{4})(?!\d)')
+_number = re.compile(r'\d+')
+_word = re.compile(r'[a-zA-Z]+')
+_roman = re.compile(r'm{0,3}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})')
+_page = re.compile(r'([a-z]?)(\d+)\s*$')
+_roman_values = {'i': 1, 'v': 5, 'x': 10, 'l': 50, 'c': 100, 'd': 500, 'm': 1000}
+_lower_roman = set('ivxlc')
+
+
+# whether the field is compared by compare_typed
+def is_numeric(field):
+    return field in numeric_fields
+
+
+# the integer value of a Roman numeral, None if value is not a valid Roman numeral. Since d and m also make ordinary
+# words numerals ('mix', 'dix'), a numeral that is not in upper case may only consist of i, v, x, l and c ('xii',
+# e.g. preface pages); in upper case, all letters are read ('MCMXC').
+def parse_roman(value):
+    value = value.strip()
+    if not value.isupper() and not set(value.lower()) <= _lower_roman:
+        return None
+    value = value.lower()
+    if not value or not _roman.fullmatch(value):
+        return None
+    total = 0
+    for n, char in enumerate(value):
+        current = _roman_values[char]
+        if n + 1 < len(value) and _roman_values[value[n + 1]] > current:
+            total -= current
+        else:
+            total += current
+    return total
+
+
+# the first four-digit year in value as an integer, e.g. '2011a' -> 2011, None if there is none
+def parse_year(value):
+    match = _year.search(value) if isinstance(value, str) else None
+    return int(match.group(1)) if match else None
+
+
+# the value of a volume or issue number as an integer: the first arabic number, or else the last word that is a Roman
+# numeral, e.g. 'Vol. XII' -> 12. None if value has no number.
+def parse_number(value):
+    if not isinstance(value, str):
+        return None
+    match = _number.search(value)
+    if match:
+        return int(match.group())
+    for word in reversed(_word.findall(value)):
+        number = parse_roman(word)
+        if number is not None:
+            return number
+    return None
+
+
+# a single page as a (kind, number) tuple: kind is '' for arabic page numbers, 'roman' for Roman numerals and the
+# letter prefix of electronic and supplement pages ('e1002345' -> ('e', 1002345), 'S12' -> ('s', 12)). A 'p' prefix
+# is read as an abbreviation of 'page'. None if value is not a page.
+def parse_page(value):
+    if not isinstance(value, str):
+        return None
+    match = _page.search(value.strip().lower())
+    if match:
+        kind = match.group(1)
+        return ('' if kind == 'p' else kind), int(match.group(2))
+    words = _word.findall(value)
+    number = parse_roman(words[-1]) if words else None
+    return ('roman', number) if number is not None else None
+
+
+# a page range as a (start, end) tuple of pages from the split parts of a page field, e.g. ['pp. 12', '15'] ->
+# (('', 12), ('', 15)). Abbreviated end pages are expanded: ['1234', '56'] -> (('', 1234), ('', 1256)). The end is the
+# start for a single page. None if no part is a page.
+def parse_pages(parts):
+    pages = [page for page in (parse_page(part) for part in parts) if page is not None]
+    if not pages:
+        return None
+    start, end = pages[0], pages[-1]
+    if start[0] == end[0] and end[1] < start[1]:
+        digits_start, digits_end = str(start[1]), str(end[1])
+        if len(digits_end) < len(digits_start):
+            end = (end[0], int(digits_start[:len(digits_start) - len(digits_end)] + digits_end))
+    return start, end
+
+
+def _parts(occurrence):
+    return occurrence if isinstance(occurrence, list) else [occurrence]
+
+
+# the typed value of one occurrence of a field, None if it cannot be parsed
+def typed_value(field, occurrence):
+    parts = _parts(occurrence)
+    if field == 'date':
+        years = frozenset(year for year in map(parse_year, parts) if year is not None)
+        return years or None
+    if field == 'biblScope_unit_page':
+        return parse_pages(parts)
+    numbers = [number for number in map(parse_number, parts) if number is not None]
+    return tuple(numbers) or None
+
+
+# whether two typed values of a field are the same: dates share a year, volumes and issues are equal, page ranges are
+# equal or one side is a single page that is the first page of the range of the other side ('123' and '123-45', the
+# end page got lost). A page within the range of the other side is a different value, e.g. a pinpoint citation.
+def same_value(field, v1, v2):
+    if field == 'date':
+        return not v1.isdisjoint(v2)
+    if field == 'biblScope_unit_page':
+        (start1, end1), (start2, end2) = v1, v2
+        if start1 == end1 or start2 == end2:
+            return start1 == start2
+        return v1 == v2
+    return v1 == v2
+
+
+# compare the occurrences of a numeric field in the gold standard (l1) and in the output (l2) with the return value
+# convention of meta_eval.eval_field: 0 if one pair of occurrences is the same, otherwise 1. Returns None if the
+# occurrences of one side cannot be parsed, so that the caller can fall back to comparing strings.
+def compare_typed(field, l1, l2):
+    values1 = [value for value in (typed_value(field, occurrence) for occurrence in l1) if value is not None]
+    values2 = [value for value in (typed_value(field, occurrence) for occurrence in l2) if value is not None]
+    if not values1 or not values2:
+        return None
+    for v1 in values1:
+        for v2 in values2:
+            if same_value(field, v1, v2):
+                return 0
+    return 1
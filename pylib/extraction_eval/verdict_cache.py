@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+# content-addressed cache of the verdicts of meta_eval.compare_meta. The same cited works appear in many documents and
+# the same output strings in the output of several parsers, so that the same pair of reference records is compared
+# again and again. A verdict only depends on the compared records, the reference type and the comparison settings, it
+# is therefore stored under a hash of these and looked up before comparing.
+#
+# The most recently used verdicts are kept in memory, up to max_size of them. If a path is given, the verdicts are also
+# stored in an SQLite database and reused by later runs; new verdicts are written in batches by flush(), which the
+# evaluation calls after every file.
+
+# part of every key: increase it when a change of meta_eval changes the verdicts, so that persisted verdicts of
+# earlier versions are not used anymore
+# 2: compare_meta compares the fields lazily and stops at the first decisive mismatch; the rejected fields of references
+#    that are not the same are no longer listed
+# 3: the verdicts of articles no longer depend on the iteration order of the fields
+version = 3
+
+
+# the key of a comparison: a hash of the gold standard record l1, the output record l2 (lists of (field, values)
+# tuples as passed to compare_meta), the reference type and the settings the verdict depends on. The order of the
+# fields depends on the iteration order of sets, which differs between runs, but compare_meta compares them in a fixed
+# order; they are therefore sorted (keeping the order of repeated fields), so that the same records in another order
+# share the verdict.
+def verdict_key(l1, l2, type, settings=()) -> bytes:
+    l1, l2 = sorted(l1, key=_field), sorted(l2, key=_field)
+    return hashlib.blake2b(repr((version, settings, type, l1, l2)).encode('utf8'), digest_size=16).digest()
+
+
+def _field(entry):
+    return entry[0]
+
+
+class VerdictCache:
+
+    # path: SQLite database storing the verdicts, None to keep them only in memory
+    # max_size: maximum number of verdicts kept in memory
+    def __init__(self, path=None, max_size=100000):
+        self.path = path
+        self.max_size = max_size
+        self._memo = OrderedDict()  # key -> (verdict, rejected fields), in the order of use
+        self._pending = {}  # verdicts not yet written to the database
+        self._db = None
+        if path is not None:
+            import sqlite3
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            # worker processes write to the same database. The connection may be used by another thread than the one
+            # that opened it (e.g. by the worker thread of eval_service), but only by one thread at a time.
+            self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS verdicts '
+                             '(key BLOB PRIMARY KEY, verdict INTEGER NOT NULL, rejected TEXT NOT NULL)')
+            self._db.commit()
+
+    # the cached (verdict, rejected fields) tuple of compare_meta for the key, None if it is not cached
+    def get(self, key):
+        result = self._memo.get(key)
+        if result is not None:
+            self._memo.move_to_end(key)
+            return result
+        if self._db is not None:
+            row = self._db.execute('SELECT verdict, rejected FROM verdicts WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                result = bool(row[0]), json.loads(row[1])
+                self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        self._remember(key, result)
+        if self._db is not None:
+            self._pending[key] = result
+
+    # write the new verdicts to the database in a single transaction
+    def flush(self):
+        if self._db is None or not self._pending:
+            return
+        with self._db:
+            self._db.executemany('INSERT OR IGNORE INTO verdicts (key, verdict, rejected) VALUES (?, ?, ?)',
+                                 [(key, int(verdict), json.dumps(rejected))
+                                  for key, (verdict, rejected) in self._pending.items()])
+        self._pending = {}
+
+    # the arguments to create an equivalent cache, e.g. in a worker process
+    def config(self) -> tuple:
+        return self.path, self.max_size
+
+    def close(self):
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self):
+        return len(self._memo)
+
+    def _remember(self, key, result):
+        self._memo[key] = result
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.max_size:
+            self._memo.popitem(last=False)
+
+
+# the cache used by compare_meta, in memory by default
+active = VerdictCache()
+
+
+# use the given VerdictCache, a new cache persisted in the SQLite database at path if a path is given, or no cache if
+# None. The previous cache is closed.
+def set_verdict_cache(cache, max_size=100000):
+    global active
+    if cache is not None and not isinstance(cache, VerdictCache):
+        cache = VerdictCache(cache, max_size)
+    if active is not None and active is not cache:
+        active.close()
+    active = cache
+
+
+def get_verdict_cache():
+    return active
@@ -0,0 +1,161 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+from collections import OrderedDict
+
+
+# ISO4 abbreviation of journal and book titles in batches, with a persistent cache.
+#
+# Titles are abbreviated with iso4.abbreviate and limited to nine words, like Workflow::Utils.abbrev_iso4 always did.
+# Every batch is deduplicated, the titles that are not cached yet are abbreviated in a pool of worker processes, and
+# the new abbreviations are appended to an SQLite database in a single transaction instead of rewriting a JSON file
+# after every title. The most recently used abbreviations are also kept in a bounded in-memory cache.
+#
+#   abbreviator = Abbreviator('tmp/cache/iso4_title_abbreviations.sqlite')
+#   abbreviator.abbreviate_batch(['Journal of the American Academy of Dermatology', ...], ['eng', 'ger'])
+
+default_path = os.path.join('tmp', 'cache', 'iso4_title_abbreviations.sqlite')
+
+# number of words an abbreviation is truncated to
+max_words = 9
+
+# batches with fewer titles to abbreviate are processed without a process pool
+min_pool_batch = 64
+
+
+# abbreviate a single title, this is what the worker processes run
+def abbreviate_title(title, disambiguation_langs=()):
+    import iso4  # slow to import, only needed when a title is not cached
+    abbreviation = iso4.abbreviate(title, disambiguation_langs=set(disambiguation_langs))
+    return ' '.join(abbreviation.split()[:max_words])
+
+
+def _abbreviate_task(task):
+    return abbreviate_title(*task)
+
+
+class Abbreviator:
+
+    # path: SQLite database storing the abbreviations, None to keep them only in memory
+    # memo_size: maximum number of abbreviations kept in memory
+    # jobs: number of worker processes for batches, None for the number of processors, 1 to abbreviate in-process
+    def __init__(self, path=default_path, memo_size=100000, jobs=None):
+        self.memo_size = memo_size
+        self.jobs = jobs if jobs is not None else (os.cpu_count() or 1)
+        self._memo = OrderedDict()  # (title, languages) -> abbreviation, in the order of use
+        if path is not None and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path if path is not None else ':memory:')
+        self._db.execute('CREATE TABLE IF NOT EXISTS abbreviations '
+                         '(title TEXT NOT NULL, languages TEXT NOT NULL, abbreviation TEXT NOT NULL, '
+                         'PRIMARY KEY (title, languages))')
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # the abbreviation of a single title
+    def abbreviate(self, title, disambiguation_langs=()):
+        return self.abbreviate_batch([title], disambiguation_langs)[0]
+
+    # the abbreviations of a list of titles, in the same order. None and empty titles are returned as ''.
+    def abbreviate_batch(self, titles, disambiguation_langs=()):
+        languages = _languages(disambiguation_langs)
+        found = {}
+        missing = []
+        for title in dict.fromkeys(titles):  # unique titles in order
+            if not title:
+                found[title] = ''
+                continue
+            abbreviation = self._recall(title, languages)
+            if abbreviation is None:
+                missing.append(title)
+            else:
+                found[title] = abbreviation
+        if missing:
+            stored = self._load(missing, languages)
+            found.update(stored)
+            missing = [title for title in missing if title not in stored]
+        if missing:
+            new = dict(zip(missing, self._compute(missing, languages)))
+            self._store(new, languages)
+            found.update(new)
+        for title, abbreviation in found.items():
+            if title:
+                self._remember(title, languages, abbreviation)
+        return [found[title] for title in titles]
+
+    # add the abbreviations of a JSON cache file of the form {title: abbreviation}, as written by the previous
+    # implementation of Workflow::Utils.abbrev_iso4, for the given disambiguation languages. Existing entries are kept.
+    # Returns the number of abbreviations read.
+    def import_json(self, path, disambiguation_langs=()):
+        with open(path, encoding='utf8') as f:
+            data = json.load(f)
+        self._store(data, _languages(disambiguation_langs), replace=False)
+        return len(data)
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM abbreviations').fetchone()[0]
+
+    def _recall(self, title, languages):
+        key = (title, languages)
+        abbreviation = self._memo.get(key)
+        if abbreviation is not None:
+            self._memo.move_to_end(key)
+        return abbreviation
+
+    def _remember(self, title, languages, abbreviation):
+        key = (title, languages)
+        self._memo[key] = abbreviation
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+    # the stored abbreviations of the titles, queried in chunks that stay below SQLite's limit of parameters
+    def _load(self, titles, languages):
+        stored = {}
+        for start in range(0, len(titles), 500):
+            chunk = titles[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT title, abbreviation FROM abbreviations WHERE languages = ? "
+                f"AND title IN ({', '.join('?' * len(chunk))})", [languages] + chunk)
+            stored.update(rows)
+        return stored
+
+    def _store(self, abbreviations, languages, replace=True):
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        with self._db:
+            self._db.executemany(f'{verb} INTO abbreviations (title, languages, abbreviation) VALUES (?, ?, ?)',
+                                 [(title, languages, abbreviation) for title, abbreviation in abbreviations.items()])
+
+    def _compute(self, titles, languages):
+        langs = languages.split(',') if languages else []
+        tasks = [(title, langs) for title in titles]
+        if self.jobs <= 1 or len(tasks) < min_pool_batch:
+            return [_abbreviate_task(task) for task in tasks]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=self.jobs, mp_context=_pool_context()) as executor:
+            return list(executor.map(_abbreviate_task, tasks, chunksize=max(1, len(tasks) // (self.jobs * 4))))
+
+
+# the workers are spawned rather than forked, so that the pool also works when python is embedded in another process,
+# such as the ruby workflow. There sys.executable is the host program, the workers are started with the interpreter of
+# the embedded python instead.
+def _pool_context():
+    context = multiprocessing.get_context('spawn')
+    if not os.path.basename(sys.executable or '').startswith('python'):
+        context.set_executable(os.path.join(sys.exec_prefix, 'bin', f'python{sys.version_info[0]}'))
+    return context
+
+
+# the disambiguation languages as part of the cache key
+def _languages(disambiguation_langs):
+    return ','.join(sorted(set(disambiguation_langs or ())))